@@ -0,0 +1,201 @@
+"""Asyncio variants of the read endpoints, enabled with ``DB_ASYNC=true``.
+
+Each handler opens an ``AsyncSession`` and runs the same session-level helper
+as the sync route through :meth:`AsyncSession.run_sync`.  Queries therefore go
+through aiosqlite / asyncpg without occupying a threadpool worker, while the
+statements, caching and response shapes stay identical to :mod:`.routes`.
+
+``run_sync`` executes the helper on the event-loop thread, so CPU-bound
+handlers go through :func:`_in_worker_thread` instead; otherwise one long
+computation would stall every other request and the SSE stream.
+"""
+from collections.abc import Callable
+from datetime import date
+from typing import Annotated, Any, List, TypeVar
+
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC, SUMMARY_TOP_N
+from ..db.session import SessionLocal, get_async_sessionmaker
+from ..models.var import (
+    BacktestResponse,
+    HierarchyResponse,
+    Methodology,
+    MonteCarloVaRResponse,
+    NewsItem,
+    ScenarioDistributionResponse,
+    ScenarioHistogramResponse,
+    StressRequest,
+    StressResponse,
+    VaRSummaryResponse,
+    VaRTimeSeriesBatchResponse,
+    VaRTimeSeriesResponse,
+    WhatIfRequest,
+    WhatIfResponse,
+)
+from . import routes
+from .encoding import FAST_RESPONSES, negotiate
+
+router = APIRouter()
+
+T = TypeVar("T")
+
+
+async def _in_worker_thread(handler: Callable[..., T], *args: Any) -> T:
+    """Run a CPU-bound sync helper with its own sync session on the threadpool."""
+
+    def call() -> T:
+        with SessionLocal() as session:
+            return handler(session, *args)
+
+    return await run_in_threadpool(call)
+
+
+@router.get("/var/summary", response_model=VaRSummaryResponse)
+async def get_var_summary(
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    top: Annotated[
+        int | None, Query(ge=1, le=SUMMARY_TOP_N, description="VaR上位N資産のみ返す (未指定時は全資産)")
+    ] = None,
+    methodology: Annotated[Methodology, Query(description=routes.METHODOLOGY_DESCRIPTION)] = "historical",
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    if methodology == "fhs":
+        # EWMA filtering and revaluation are CPU-bound.
+        return await _in_worker_thread(routes.var_summary_response, as_of, if_none_match, top, methodology)
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(routes.var_summary_response, as_of, if_none_match, top, methodology)
+
+
+@router.get("/var/timeseries", response_model=VaRTimeSeriesResponse, responses=FAST_RESPONSES)
+async def get_var_timeseries(
+    ric: Annotated[str, Query(description="Asset identifier to retrieve")] = PORTFOLIO_AGGREGATE_RIC,
+    days: Annotated[int, Query(ge=5, le=90)] = 30,
+    accept: Annotated[str | None, Header()] = None,
+) -> VaRTimeSeriesResponse | Response:
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(routes.timeseries_response, ric, days, negotiate(accept))
+
+
+@router.get("/var/timeseries/batch", response_model=VaRTimeSeriesBatchResponse, responses=FAST_RESPONSES)
+async def get_var_timeseries_batch(
+    rics: Annotated[str, Query(description="カンマ区切りのRIC一覧 (例: JP_EQ_LARGE,US_RATES_CORE)")],
+    days: Annotated[int, Query(ge=5, le=90)] = 30,
+    accept: Annotated[str | None, Header()] = None,
+) -> VaRTimeSeriesBatchResponse | Response:
+    requested = routes.parse_ric_list(rics)
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(routes.timeseries_batch_response, requested, days, negotiate(accept))
+
+
+@router.get("/var/backtest", response_model=BacktestResponse)
+async def get_var_backtest(
+    rics: Annotated[str | None, Query(description="カンマ区切りのRIC一覧 (未指定時は全RIC)")] = None,
+    days: Annotated[int, Query(ge=20, le=2000, description="検証する実現損益の日数")] = 250,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    requested = routes.parse_ric_list(rics) if rics is not None else None
+    return await _in_worker_thread(routes.backtest_response, requested, days, if_none_match)
+
+
+@router.get("/news", response_model=List[NewsItem])
+async def get_news(limit: Annotated[int, Query(ge=1, le=20)] = 5) -> List[NewsItem]:
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(routes.news_items, limit)
+
+
+@router.get("/var/dates", response_model=List[date])
+async def list_snapshot_dates() -> List[date]:
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(routes.snapshot_dates)
+
+
+@router.get(
+    "/var/scenario-distribution", response_model=ScenarioDistributionResponse, responses=FAST_RESPONSES
+)
+async def get_scenario_distribution(
+    ric: Annotated[str, Query(description="対象資産のRIC (全資産は ALL_ASSETS)")] = PORTFOLIO_AGGREGATE_RIC,
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    methodology: Annotated[Methodology, Query(description=routes.METHODOLOGY_DESCRIPTION)] = "historical",
+    accept: Annotated[str | None, Header()] = None,
+) -> ScenarioDistributionResponse | Response:
+    if methodology == "fhs":
+        return await _in_worker_thread(
+            routes.scenario_distribution_response, ric, as_of, negotiate(accept), methodology
+        )
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(
+            routes.scenario_distribution_response, ric, as_of, negotiate(accept), methodology
+        )
+
+
+@router.get("/var/scenario-distribution/histogram", response_model=ScenarioHistogramResponse)
+async def get_scenario_histogram(
+    ric: Annotated[str, Query(description="対象資産のRIC (全資産は ALL_ASSETS)")] = PORTFOLIO_AGGREGATE_RIC,
+    bins: Annotated[int, Query(ge=1, le=200, description="ビン数")] = 24,
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    methodology: Annotated[Methodology, Query(description=routes.METHODOLOGY_DESCRIPTION)] = "historical",
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    if methodology == "fhs":
+        return await _in_worker_thread(
+            routes.scenario_histogram_response, ric, bins, as_of, if_none_match, methodology
+        )
+    async with get_async_sessionmaker()() as session:
+        return await session.run_sync(
+            routes.scenario_histogram_response, ric, bins, as_of, if_none_match, methodology
+        )
+
+
+@router.post("/var/what-if", response_model=WhatIfResponse)
+async def post_var_what_if(request: WhatIfRequest) -> WhatIfResponse:
+    return await _in_worker_thread(routes.what_if_response, request)
+
+
+@router.get("/var/hierarchy", response_model=HierarchyResponse)
+async def get_var_hierarchy(
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    path: Annotated[
+        List[str] | None, Query(description="表示するノード。上位階層から順に繰り返し指定 (例: path=マクロ&path=金利)")
+    ] = None,
+    levels: Annotated[str, Query(description="集計階層 (カンマ区切り、desk / category、空欄でRICのみ)")] = "desk,category",
+) -> HierarchyResponse:
+    requested = routes.parse_hierarchy_levels(levels)
+    return await _in_worker_thread(routes.hierarchy_response, as_of, path or [], requested)
+
+
+@router.get("/var/monte-carlo", response_model=MonteCarloVaRResponse)
+async def get_var_monte_carlo(
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    paths: Annotated[int, Query(ge=1_000, le=5_000_000, description="シミュレーションのパス数")] = 100_000,
+    seed: Annotated[int, Query(ge=0, description="乱数シード")] = 0,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    return await _in_worker_thread(routes.monte_carlo_response, as_of, paths, seed, if_none_match)
+
+
+@router.post("/var/stress", response_model=StressResponse)
+async def post_var_stress(request: StressRequest) -> StressResponse:
+    return await _in_worker_thread(routes.stress_response, request)
+
+
+def with_async_overrides(sync_router: APIRouter) -> APIRouter:
+    """Combine the async handlers with every sync route they do not replace."""
+
+    combined = APIRouter()
+    combined.routes.extend(router.routes)
+    overridden = {
+        (route.path, method)
+        for route in router.routes
+        if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    for route in sync_router.routes:
+        if isinstance(route, APIRoute) and all(
+            (route.path, method) in overridden for method in route.methods
+        ):
+            continue
+        combined.routes.append(route)
+    return combined
@@ -0,0 +1,135 @@
+"""In-process LRU caches for serialised API responses and scenario matrices."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from datetime import date
+from typing import Generic, TypeVar
+
+from ..core.config import settings
+from ..db.notifications import SnapshotCommit, on_snapshot_commit, on_snapshots_committed
+from ..engine.hierarchy import AggregationTree
+from ..engine.stress import StressBook
+from ..engine.whatif import BookScenarios
+
+V = TypeVar("V")
+
+HIERARCHY_COMMIT_HISTORY = 64
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Serialised body plus the strong ETag that identifies it."""
+
+    body: bytes
+    etag: str
+
+
+class LRUCache(Generic[V]):
+    """Thread-safe LRU mapping; ``maxsize <= 0`` disables storage."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: V) -> V:
+        if self.maxsize <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def items(self) -> list[tuple[Hashable, V]]:
+        """Return a snapshot of the entries, least recently used first."""
+
+        with self._lock:
+            return list(self._entries.items())
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches ``predicate``; return the count."""
+
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ResponseCache(LRUCache[CachedResponse]):
+    """LRU of serialised responses keyed by snapshot identity."""
+
+    def put(self, key: Hashable, body: bytes, etag: str) -> CachedResponse:
+        return self.set(key, CachedResponse(body=body, etag=etag))
+
+
+def etag_for(*parts: object) -> str:
+    """Return a strong ETag built from snapshot identity (e.g. as_of + data version)."""
+
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Evaluate an ``If-None-Match`` header against ``etag``."""
+
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+# Keys embed the as_of and data version; past dates never change so entries stay
+# valid until a writer touches that date or bumps the data version.
+summary_cache = ResponseCache(maxsize=settings.summary_cache_size)  # (as_of, version)
+histogram_cache = ResponseCache(maxsize=settings.histogram_cache_size)  # (ric, as_of, bins, version)
+scenario_cache: LRUCache[BookScenarios] = LRUCache(maxsize=settings.scenario_cache_size)  # (as_of, version)
+stress_cache: LRUCache[StressBook] = LRUCache(maxsize=settings.stress_cache_size)  # (as_of, version)
+hierarchy_cache: LRUCache[AggregationTree] = LRUCache(maxsize=settings.hierarchy_cache_size)  # (as_of, version, levels)
+# Commits seen by this process, so a tree can be carried forward over versions that only replaced leaves.
+hierarchy_commits: LRUCache[SnapshotCommit] = LRUCache(maxsize=HIERARCHY_COMMIT_HISTORY)  # data version
+monte_carlo_cache = ResponseCache(maxsize=settings.monte_carlo_cache_size)  # (as_of, paths, seed, version)
+backtest_cache = ResponseCache(maxsize=settings.backtest_cache_size)  # (end, days, rics, version)
+
+
+@on_snapshots_committed
+def _invalidate_written_dates(dates: frozenset[date]) -> None:
+    summary_cache.invalidate(lambda key: key[0] in dates)
+    histogram_cache.invalidate(lambda key: key[1] in dates)
+    scenario_cache.invalidate(lambda key: key[0] in dates)
+    stress_cache.invalidate(lambda key: key[0] in dates)
+    monte_carlo_cache.invalidate(lambda key: key[0] in dates)
+    # A backtest window reaches back from its end date, so any earlier write can fall inside it.
+    earliest = min(dates)
+    backtest_cache.invalidate(lambda key: key[0] is None or key[0] >= earliest)
+
+
+@on_snapshot_commit
+def _record_hierarchy_commit(commit: SnapshotCommit) -> None:
+    """Keep the commit for :func:`routes.hierarchy_tree`; evict trees it cannot carry forward."""
+
+    if commit.data_version is None:
+        # The keys do not change, so every tree of a written date is stale.
+        hierarchy_cache.invalidate(lambda key: key[0] in commit.dates)
+        return
+    hierarchy_commits.set(commit.data_version, commit)
+    rewritten = commit.dates - commit.scenario_rics.keys()
+    hierarchy_cache.invalidate(lambda key: key[0] in rewritten)
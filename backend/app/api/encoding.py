@@ -0,0 +1,87 @@
+"""Accept-header negotiated encodings for large numeric payloads.
+
+The default ``application/json`` responses go through the Pydantic models as
+before. Clients that send ``Accept: application/vnd.var.columns+json`` or
+``Accept: application/msgpack`` instead receive column arrays serialised
+straight from the query rows / NumPy vectors, with no model per element.
+The column layouts are described by the ``*Columns`` models in
+:mod:`app.models.var`, which the tests validate decoded payloads against.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi import Response
+
+try:  # optional "fast" extra
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+try:  # optional "fast" extra
+    import msgpack
+except ImportError:  # pragma: no cover - exercised only without msgpack
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNS_MEDIA_TYPE = "application/vnd.var.columns+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ALIASES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+FAST_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {
+        "content": {
+            COLUMNS_MEDIA_TYPE: {},
+            MSGPACK_MEDIA_TYPE: {},
+        },
+        "description": "Column arrays when requested through the Accept header",
+    }
+}
+
+
+def negotiate(accept: str | None) -> str:
+    """Return the preferred supported media type in ``accept`` (JSON when none match)."""
+
+    if not accept:
+        return JSON_MEDIA_TYPE
+    ranked: list[tuple[float, int, str]] = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = (piece.strip() for piece in part.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(ranked):
+        if media_type == COLUMNS_MEDIA_TYPE:
+            return COLUMNS_MEDIA_TYPE
+        if media_type in _MSGPACK_ALIASES and msgpack is not None:
+            return MSGPACK_MEDIA_TYPE
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def columns_response(payload: dict[str, Any], media_type: str) -> Response:
+    """Encode a dict of plain lists / NumPy arrays as ``media_type``.
+
+    Dates must already be ISO strings so every encoding produces the same values.
+    """
+
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = msgpack.packb({key: _plain(value) for key, value in payload.items()}, use_bin_type=True)
+    elif orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps({key: _plain(value) for key, value in payload.items()}, separators=(",", ":")).encode()
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def _plain(value: Any) -> Any:
+    return value.tolist() if hasattr(value, "tolist") else value
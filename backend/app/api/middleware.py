@@ -0,0 +1,189 @@
+"""ASGI middleware for conditional GETs and response compression.
+
+``ConditionalGetMiddleware`` gives every complete ``200`` GET response a strong
+ETag. A tag set by the route, usually from snapshot identity such as ``as_of``
+plus the data version, is kept. Otherwise a hash of the body is used. The
+middleware then answers a matching ``If-None-Match`` with a bodiless ``304``.
+
+``CompressionMiddleware`` sits outside it and encodes bodies of at least
+``minimum_size`` bytes with Brotli (when the optional ``brotli`` package is
+installed) or gzip. Each encoding is a different representation, so its ETag
+gets an ``-br`` / ``-gzip`` suffix. The suffix is removed from incoming
+``If-None-Match`` headers, so the routes and the inner middleware only see
+the tags they issued. Encoded bodies are cached by ETag, so an unchanged
+snapshot is compressed once.
+
+Streaming responses (more than one body message, e.g. ``/stream``) pass through
+both middlewares untouched.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+from collections.abc import Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .cache import LRUCache, etag_matches
+
+try:  # optional "fast" extra
+    import brotli
+except ImportError:  # pragma: no cover - exercised only without brotli
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_ENCODERS: dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0)}
+if brotli is not None:
+    _ENCODERS = {"br": lambda body: brotli.compress(body, quality=BROTLI_QUALITY), **_ENCODERS}
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Return the preferred available content coding in ``accept_encoding``, if any."""
+
+    if not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = (piece.strip() for piece in part.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    ranked = [
+        (accepted.get(coding, wildcard), -position, coding) for position, coding in enumerate(_ENCODERS)
+    ]
+    quality, _, coding = max(ranked)
+    return coding if quality > 0 else None
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """Return the representation-specific form of a strong ``etag``."""
+
+    return f'{etag[:-1]}-{coding}"' if etag.endswith('"') else etag
+
+
+class _BufferedResponse:
+    """Holds back ``http.response.start`` until the body is known to be complete."""
+
+    def __init__(self, send: Send, finish: Callable[[Message, bytes], Message | None]) -> None:
+        self._send = send
+        self._finish = finish
+        self._start: Message | None = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if self._start is None or message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        start, self._start = self._start, None
+        if message.get("more_body", False):
+            await self._send(start)
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        replaced = self._finish(start, body)
+        if replaced is None:
+            await self._send(start)
+            await self._send(message)
+        else:
+            body = replaced.pop("body", b"")
+            await self._send(replaced)
+            await self._send({"type": "http.response.body", "body": body})
+
+
+class ConditionalGetMiddleware:
+    """Adds strong ETags to complete GET responses and answers revalidations with ``304``."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match")
+
+        def finish(start: Message, body: bytes) -> Message | None:
+            if start["status"] != 200:
+                return None
+            headers = MutableHeaders(scope=start)
+            etag = headers.get("etag")
+            if etag is None:
+                etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+                headers["ETag"] = etag
+            if not etag_matches(if_none_match, etag):
+                return None
+            kept = [(key, value) for key, value in start["headers"] if key.lower() not in _ENTITY_HEADERS]
+            return {"type": "http.response.start", "status": 304, "headers": kept, "body": b""}
+
+        await self.app(scope, receive, _BufferedResponse(send, finish))
+
+
+class CompressionMiddleware:
+    """Compresses complete responses of at least ``minimum_size`` bytes with Brotli or gzip."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, cache_size: int = 64) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache: LRUCache[bytes] = LRUCache(maxsize=cache_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        scope = dict(scope, headers=_strip_etag_suffix(scope["headers"], coding))
+
+        def finish(start: Message, body: bytes) -> Message | None:
+            headers = MutableHeaders(scope=start)
+            headers.add_vary_header("Accept-Encoding")
+            if start["status"] == 304:
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], coding)
+                return None
+            if len(body) < self.minimum_size or "content-encoding" in headers:
+                return None
+            etag = headers.get("etag")
+            key = (etag, coding)
+            encoded = self.cache.get(key) if etag else None
+            if encoded is None:
+                encoded = _ENCODERS[coding](body)
+                if etag:
+                    self.cache.set(key, encoded)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(encoded))
+            if etag:
+                headers["ETag"] = encoded_etag(etag, coding)
+            return {**start, "body": encoded}
+
+        await self.app(scope, receive, _BufferedResponse(send, finish))
+
+
+_ENTITY_HEADERS = {b"content-length", b"content-type", b"content-encoding"}
+
+
+def _strip_etag_suffix(headers: list[tuple[bytes, bytes]], coding: str) -> list[tuple[bytes, bytes]]:
+    suffix = f'-{coding}"'.encode()
+    stripped = []
+    for key, value in headers:
+        if key == b"if-none-match":
+            value = b",".join(
+                tag.strip()[: -len(suffix)] + b'"' if tag.strip().endswith(suffix) else tag.strip()
+                for tag in value.split(b",")
+            )
+        stripped.append((key, value))
+    return stripped
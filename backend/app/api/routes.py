@@ -1,138 +1,438 @@
 """API endpoints exposed by the Value at Risk prototype."""
+import hashlib
+from collections.abc import Callable, Hashable
 from datetime import date
-from typing import List
+from typing import Annotated, List
 
-from fastapi import APIRouter, HTTPException, Query
-from sqlalchemy import desc, select
+import numpy as np
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session, lazyload
 
-from ..core.constants import PORTFOLIO_AGGREGATE_RIC
+from ..core.config import settings
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC, SUMMARY_TOP_N, VAR_CONFIDENCE
 from ..db.models import (
     DriverCommentaryRecord,
     MarketSignalRecord,
     NewsRecord,
-    ScenarioDistributionRecord,
     VaRSnapshot,
     VaRTimeSeriesRecord,
 )
+from ..db.aggregates import top_rics
+from ..db.backtest_store import load_backtest_window
+from ..db.ewma_store import latest_ewma_date, load_ewma_state, load_filtered_vector
+from ..db.queries import (
+    realized_dates_stmt,
+    risk_measures_stmt,
+    snapshot_assets_stmt,
+    snapshot_categories_stmt,
+    snapshot_positions_stmt,
+    snapshot_rics_stmt,
+    timeseries_batch_stmt,
+    timeseries_window_stmt,
+)
+from ..db.risk_measures import risk_measure_rows
+from ..db.scenario_store import latest_scenario_date, load_scenario_matrix, load_scenario_vector
+from ..engine import (
+    HIERARCHY_LEVELS,
+    NO_DATA_ZONE,
+    STRESS_FACTORS,
+    ZONES,
+    AggregationTree,
+    BookScenarios,
+    MonteCarloModel,
+    StressBook,
+    StressScenario,
+    TailMeasures,
+    backtest_var,
+    compute_historical_var,
+    compute_tail_measures,
+    euler_allocation,
+    group_labels,
+    monte_carlo_var,
+    round_to_total,
+    run_stress,
+    summarise_distribution,
+    what_if,
+)
+from ..db.schema import get_data_version
 from ..db.session import SessionLocal
 from ..models.var import (
     AssetVaR,
+    BacktestResponse,
+    BacktestRicResult,
     DriverBreakdown,
     DriverCommentary,
+    HierarchyNode,
+    HierarchyResponse,
     MarketSignal,
+    Methodology,
+    MonteCarloAsset,
+    MonteCarloVaRResponse,
     NewsItem,
     PortfolioVaR,
+    RiskMeasure,
     ScenarioDistributionResponse,
+    ScenarioHistogramResponse,
+    StressAssetPnL,
+    StressRequest,
+    StressResponse,
+    StressScenarioResult,
+    TailMeasure,
     VaRSummaryResponse,
+    VaRTimeSeriesBatchResponse,
     VaRTimeSeriesPoint,
     VaRTimeSeriesResponse,
+    WhatIfAsset,
+    WhatIfRequest,
+    WhatIfResponse,
+)
+from .encoding import FAST_RESPONSES, JSON_MEDIA_TYPE, columns_response, negotiate
+from .cache import (
+    ResponseCache,
+    backtest_cache,
+    etag_for,
+    etag_matches,
+    hierarchy_cache,
+    hierarchy_commits,
+    histogram_cache,
+    monte_carlo_cache,
+    scenario_cache,
+    stress_cache,
+    summary_cache,
 )
 
 router = APIRouter()
 
+METHODOLOGY_DESCRIPTION = "VaR手法 (historical: ヒストリカル法, fhs: EWMAボラティリティ調整済みヒストリカル法)"
+
 
 @router.get("/var/summary", response_model=VaRSummaryResponse)
 def get_var_summary(
-    as_of: date | None = Query(None, description="基準日を指定 (未指定時は最新)"),
-) -> VaRSummaryResponse:
-    """Return headline VaR figures for the latest valuation date."""
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    top: Annotated[
+        int | None, Query(ge=1, le=SUMMARY_TOP_N, description="VaR上位N資産のみ返す (未指定時は全資産)")
+    ] = None,
+    methodology: Annotated[Methodology, Query(description=METHODOLOGY_DESCRIPTION)] = "historical",
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Return headline VaR figures for the latest valuation date.
+
+    Serialised payloads are cached per ``(as_of, data_version, top, methodology)``
+    and tagged with a strong ETag, so repeated polls skip the snapshot queries
+    entirely and unchanged polls receive ``304 Not Modified``. Driver totals,
+    category counts and the VaR ranking are read from the snapshot row; with
+    ``top`` only the ranked assets are loaded, so the cost no longer grows with
+    the book. ``methodology=fhs`` recomputes the VaR figures from the stored
+    EWMA filter state instead.
+    """
 
     with SessionLocal() as session:
-        stmt = select(VaRSnapshot)
-        if as_of:
-            stmt = stmt.where(VaRSnapshot.as_of == as_of)
-        stmt = stmt.order_by(desc(VaRSnapshot.as_of)).limit(1)
-        snapshot = session.scalars(stmt).unique().first()
-        if snapshot is None:
-            raise HTTPException(status_code=404, detail="VaR snapshot not found")
+        return var_summary_response(session, as_of, if_none_match, top, methodology)
 
-        signal_stmt = select(MarketSignalRecord).where(MarketSignalRecord.as_of == snapshot.as_of)
-        signal_record = session.scalars(signal_stmt).first()
-        commentary_stmt = select(DriverCommentaryRecord).where(
-            DriverCommentaryRecord.as_of == snapshot.as_of
-        )
-        commentary_record = session.scalars(commentary_stmt).first()
-        if signal_record is None or commentary_record is None:
-            raise HTTPException(status_code=404, detail="Market context not found for snapshot")
-
-        portfolio = PortfolioVaR(
-            total=snapshot.portfolio_total,
-            change_amount=snapshot.portfolio_change_amount,
-            change_pct=snapshot.portfolio_change_pct,
-            diversification_effect=snapshot.diversification_effect,
-        )
-        assets = [
-            AssetVaR(
-                ric=asset.ric,
-                name=asset.name,
-                category=asset.category,
-                amount=asset.amount,
-                change_amount=asset.change_amount,
-                change_pct=asset.change_pct,
-                contributions=DriverBreakdown(
-                    window_drop=asset.window_drop_contribution,
-                    window_add=asset.window_add_contribution,
-                    position_change=asset.position_change_contribution,
-                    ranking_shift=asset.ranking_shift_contribution,
-                ),
+
+def var_summary_response(
+    session: Session,
+    as_of: date | None,
+    if_none_match: str | None,
+    top: int | None = None,
+    methodology: Methodology = "historical",
+) -> Response:
+    """Resolve ``as_of`` and serve the cached summary payload from ``session``."""
+
+    data_version = get_data_version(session)
+    target = as_of or session.scalar(select(func.max(VaRSnapshot.as_of)))
+    filtered = methodology == "fhs"
+    build = _build_filtered_summary if filtered else _build_var_summary
+    return _cached_json_response(
+        summary_cache,
+        (target, data_version, top, methodology),
+        etag_for("summary", target, data_version, *([top] if top else []), *([methodology] if filtered else [])),
+        lambda: build(session, target, top),
+        if_none_match,
+    )
+
+
+def _cached_json_response(
+    cache: ResponseCache,
+    key: Hashable,
+    etag: str,
+    build: Callable[[], BaseModel],
+    if_none_match: str | None,
+) -> Response:
+    """Serve ``build()`` serialised through ``cache`` with ETag revalidation."""
+
+    cached = cache.get(key)
+    if cached is None:
+        cached = cache.put(key, build().model_dump_json().encode(), etag=etag)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def _build_var_summary(session: Session, as_of: date | None, top: int | None = None) -> VaRSummaryResponse:
+    stmt = select(VaRSnapshot).options(lazyload(VaRSnapshot.assets)).where(VaRSnapshot.as_of == as_of)
+    snapshot = session.scalars(stmt).first() if as_of else None
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="VaR snapshot not found")
+
+    signal_stmt = select(MarketSignalRecord).where(MarketSignalRecord.as_of == snapshot.as_of)
+    signal_record = session.scalars(signal_stmt).first()
+    commentary_stmt = select(DriverCommentaryRecord).where(
+        DriverCommentaryRecord.as_of == snapshot.as_of
+    )
+    commentary_record = session.scalars(commentary_stmt).first()
+    if signal_record is None or commentary_record is None:
+        raise HTTPException(status_code=404, detail="Market context not found for snapshot")
+
+    ranked = snapshot.top_rics[:top] if top else None
+    records = list(session.scalars(snapshot_assets_stmt(snapshot.id, ranked)))
+    if ranked is not None:
+        rank = {ric: position for position, ric in enumerate(ranked)}
+        records.sort(key=lambda record: rank[record.ric])
+
+    risk_measures: dict[str, list[RiskMeasure]] = {}
+    measure_rics = None if ranked is None else [*ranked, PORTFOLIO_AGGREGATE_RIC]
+    for record in session.scalars(risk_measures_stmt(snapshot.id, measure_rics)):
+        risk_measures.setdefault(record.ric, []).append(
+            RiskMeasure(
+                confidence=record.confidence,
+                horizon_days=record.horizon_days,
+                var=record.var,
+                expected_shortfall=record.expected_shortfall,
             )
-            for asset in snapshot.assets
-        ]
-
-        driver_totals = DriverBreakdown(
-            window_drop=round(sum(asset.window_drop_contribution for asset in snapshot.assets), 3),
-            window_add=round(sum(asset.window_add_contribution for asset in snapshot.assets), 3),
-            position_change=round(sum(asset.position_change_contribution for asset in snapshot.assets), 3),
-            ranking_shift=round(sum(asset.ranking_shift_contribution for asset in snapshot.assets), 3),
         )
 
-        market_signal = MarketSignal(
-            as_of=signal_record.as_of,
-            score=signal_record.gauge_value,
-            label=signal_record.label,
-            narrative=signal_record.narrative,
+    portfolio = PortfolioVaR(
+        total=snapshot.portfolio_total,
+        change_amount=snapshot.portfolio_change_amount,
+        change_pct=snapshot.portfolio_change_pct,
+        diversification_effect=snapshot.diversification_effect,
+        risk_measures=risk_measures.get(PORTFOLIO_AGGREGATE_RIC, []),
+    )
+    assets = [
+        AssetVaR(
+            ric=asset.ric,
+            name=asset.name,
+            category=asset.category,
+            amount=asset.amount,
+            change_amount=asset.change_amount,
+            change_pct=asset.change_pct,
+            contributions=DriverBreakdown(
+                window_drop=asset.window_drop_contribution,
+                window_add=asset.window_add_contribution,
+                position_change=asset.position_change_contribution,
+                ranking_shift=asset.ranking_shift_contribution,
+            ),
+            component_var=asset.component_var,
+            marginal_var=asset.marginal_var,
+            diversification_benefit=asset.diversification_benefit,
+            risk_measures=risk_measures.get(asset.ric, []),
         )
-        driver_commentary = DriverCommentary(
-            as_of=commentary_record.as_of,
-            technical_summary=commentary_record.technical_summary,
-            news_summary=commentary_record.news_summary,
-            driver_totals=driver_totals,
+        for asset in records
+    ]
+
+    driver_totals = DriverBreakdown(
+        window_drop=snapshot.driver_window_drop,
+        window_add=snapshot.driver_window_add,
+        position_change=snapshot.driver_position_change,
+        ranking_shift=snapshot.driver_ranking_shift,
+    )
+
+    market_signal = MarketSignal(
+        as_of=signal_record.as_of,
+        score=signal_record.gauge_value,
+        label=signal_record.label,
+        narrative=signal_record.narrative,
+    )
+    driver_commentary = DriverCommentary(
+        as_of=commentary_record.as_of,
+        technical_summary=commentary_record.technical_summary,
+        news_summary=commentary_record.news_summary,
+        driver_totals=driver_totals,
+    )
+
+    return VaRSummaryResponse(
+        as_of=snapshot.as_of,
+        portfolio=portfolio,
+        assets=assets,
+        asset_count=snapshot.asset_count,
+        category_counts=snapshot.category_counts,
+        top_rics=snapshot.top_rics,
+        market_signal=market_signal,
+        driver_commentary=driver_commentary,
+    )
+
+
+def _build_filtered_summary(session: Session, as_of: date | None, top: int | None = None) -> VaRSummaryResponse:
+    """Recompute the asset and portfolio VaR figures of a summary from FHS scenarios.
+
+    Changes compare against the previous snapshot's filtered scenarios. Driver
+    contributions, market signal and commentary still describe the historical
+    snapshot.
+    """
+
+    summary = _build_var_summary(session, as_of)
+    rics = [asset.ric for asset in summary.assets]
+    try:
+        pnl = load_ewma_state(session, rics, summary.as_of).filtered()
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Filtered scenarios not found") from None
+
+    measures = compute_tail_measures(np.vstack([pnl, pnl.sum(axis=0)]))
+    var, _ = measures.at(VAR_CONFIDENCE)
+    amounts = var[:-1].round(2)
+    components = round_to_total(euler_allocation(pnl).component_var)
+    previous_var, previous_total = _previous_filtered_var(session, summary.as_of, rics)
+    positions = dict(session.execute(snapshot_positions_stmt(summary.as_of)).all())
+    risk_measures = _risk_measures([*rics, PORTFOLIO_AGGREGATE_RIC], measures)
+
+    assets = {}
+    for row, asset in enumerate(summary.assets):
+        amount, component = float(amounts[row]), float(components[row])
+        prior = previous_var[row] if previous_var is not None else amount
+        assets[asset.ric] = asset.model_copy(
+            update={
+                "amount": amount,
+                "change_amount": round(amount - prior, 2),
+                "change_pct": round((amount - prior) / prior * 100, 2) if prior else 0.0,
+                "component_var": component,
+                "marginal_var": round(component / positions[asset.ric], 4) if positions[asset.ric] else 0.0,
+                "diversification_benefit": round(amount - component, 2),
+                "risk_measures": risk_measures[asset.ric],
+            }
         )
+    ranking = top_rics(rics, amounts)
+    total = round(float(var[-1]), 2)
+    prior_total = previous_total if previous_total is not None else total
+    portfolio = PortfolioVaR(
+        total=total,
+        change_amount=round(total - prior_total, 2),
+        change_pct=round((total - prior_total) / prior_total * 100, 2) if prior_total else 0.0,
+        diversification_effect=round(total - float(amounts.sum()), 2),
+        risk_measures=risk_measures[PORTFOLIO_AGGREGATE_RIC],
+    )
+    return summary.model_copy(
+        update={
+            "portfolio": portfolio,
+            "assets": [assets[ric] for ric in ranking[:top]] if top else list(assets.values()),
+            "top_rics": ranking,
+            "methodology": "fhs",
+        }
+    )
 
-        return VaRSummaryResponse(
-            as_of=snapshot.as_of,
-            portfolio=portfolio,
-            assets=assets,
-            market_signal=market_signal,
-            driver_commentary=driver_commentary,
+
+def _previous_filtered_var(
+    session: Session, as_of: date, rics: list[str]
+) -> tuple[np.ndarray | None, float | None]:
+    """Asset and portfolio FHS VaR of the previous snapshot, or ``(None, None)`` without its state."""
+
+    previous = session.scalar(select(func.max(VaRSnapshot.as_of)).where(VaRSnapshot.as_of < as_of))
+    if previous is None:
+        return None, None
+    try:
+        result = compute_historical_var(load_ewma_state(session, rics, previous).filtered())
+    except KeyError:
+        return None, None
+    return result.asset_var.round(2), round(result.portfolio_var, 2)
+
+
+def _risk_measures(rics: list[str], measures: TailMeasures) -> dict[str, list[RiskMeasure]]:
+    grouped: dict[str, list[RiskMeasure]] = {}
+    for row in risk_measure_rows(0, rics, measures):
+        grouped.setdefault(row["ric"], []).append(
+            RiskMeasure(
+                confidence=row["confidence"],
+                horizon_days=row["horizon_days"],
+                var=row["var"],
+                expected_shortfall=row["expected_shortfall"],
+            )
         )
+    return grouped
 
 
-@router.get("/var/timeseries", response_model=VaRTimeSeriesResponse)
+@router.get("/var/timeseries", response_model=VaRTimeSeriesResponse, responses=FAST_RESPONSES)
 def get_var_timeseries(
-    ric: str = Query(PORTFOLIO_AGGREGATE_RIC, description="Asset identifier to retrieve"),
-    days: int = Query(30, ge=5, le=90),
-) -> VaRTimeSeriesResponse:
-    """Return a rolling window of VaR observations for an asset."""
+    ric: Annotated[str, Query(description="Asset identifier to retrieve")] = PORTFOLIO_AGGREGATE_RIC,
+    days: Annotated[int, Query(ge=5, le=90)] = 30,
+    accept: Annotated[str | None, Header()] = None,
+) -> VaRTimeSeriesResponse | Response:
+    """Return a rolling window of VaR observations for an asset.
+
+    ``Accept: application/vnd.var.columns+json`` (or ``application/msgpack``)
+    returns :class:`VaRTimeSeriesColumns` without building a model per point.
+    """
 
     with SessionLocal() as session:
-        stmt = (
-            select(VaRTimeSeriesRecord)
-            .where(VaRTimeSeriesRecord.ric == ric)
-            .order_by(desc(VaRTimeSeriesRecord.point_date))
-            .limit(days)
-        )
-        records = list(session.scalars(stmt))
-        if not records:
-            raise HTTPException(status_code=404, detail=f"No time series found for {ric}")
+        return timeseries_response(session, ric, days, negotiate(accept))
+
+
+def timeseries_response(
+    session: Session, ric: str, days: int, media_type: str = JSON_MEDIA_TYPE
+) -> VaRTimeSeriesResponse | Response:
+    stmt = timeseries_window_stmt(ric, days).with_only_columns(
+        VaRTimeSeriesRecord.point_date, VaRTimeSeriesRecord.value, VaRTimeSeriesRecord.change
+    )
+    rows = session.execute(stmt).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No time series found for {ric}")
+    rows.reverse()
 
-        points = [
-            VaRTimeSeriesPoint(date=record.point_date, value=record.value, change=record.change)
-            for record in reversed(records)
-        ]
-        if points:
-            points[0].change = None
-        return VaRTimeSeriesResponse(ric=ric, points=points)
+    if media_type != JSON_MEDIA_TYPE:
+        dates, values, changes = (list(column) for column in zip(*rows))
+        changes[0] = None
+        payload = {"ric": ric, "dates": [day.isoformat() for day in dates], "values": values, "changes": changes}
+        return columns_response(payload, media_type)
+
+    points = [VaRTimeSeriesPoint(date=point_date, value=value, change=change) for point_date, value, change in rows]
+    points[0].change = None
+    return VaRTimeSeriesResponse(ric=ric, points=points)
+
+
+@router.get("/var/timeseries/batch", response_model=VaRTimeSeriesBatchResponse, responses=FAST_RESPONSES)
+def get_var_timeseries_batch(
+    rics: Annotated[str, Query(description="カンマ区切りのRIC一覧 (例: JP_EQ_LARGE,US_RATES_CORE)")],
+    days: Annotated[int, Query(ge=5, le=90)] = 30,
+    accept: Annotated[str | None, Header()] = None,
+) -> VaRTimeSeriesBatchResponse | Response:
+    """Return the latest ``days`` points for every requested RIC in one query.
+
+    ``ROW_NUMBER()`` over ``(ric ORDER BY point_date DESC)`` trims each series
+    server-side, and the result is returned column-wise on a shared date axis.
+    """
+
+    requested = parse_ric_list(rics)
+    with SessionLocal() as session:
+        return timeseries_batch_response(session, requested, days, negotiate(accept))
+
+
+def parse_ric_list(rics: str) -> list[str]:
+    """Split a comma separated RIC list, dropping blanks and duplicates."""
+
+    requested = list(dict.fromkeys(ric.strip() for ric in rics.split(",") if ric.strip()))
+    if not requested:
+        raise HTTPException(status_code=422, detail="At least one RIC is required")
+    return requested
+
+
+def timeseries_batch_response(
+    session: Session, requested: list[str], days: int, media_type: str = JSON_MEDIA_TYPE
+) -> VaRTimeSeriesBatchResponse | Response:
+    rows = session.execute(timeseries_batch_stmt(requested, days)).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No time series found for requested RICs")
+
+    dates = sorted({point_date for _, point_date, _ in rows})
+    positions = {point_date: idx for idx, point_date in enumerate(dates)}
+    found = {ric for ric, _, _ in rows}
+    series: dict[str, list[float | None]] = {ric: [None] * len(dates) for ric in requested if ric in found}
+    for ric, point_date, value in rows:
+        series[ric][positions[point_date]] = value
+    if media_type != JSON_MEDIA_TYPE:
+        return columns_response({"dates": [day.isoformat() for day in dates], "series": series}, media_type)
+    return VaRTimeSeriesBatchResponse(dates=dates, series=series)
 
 
 @router.get("/news", response_model=List[NewsItem])
@@ -140,17 +440,22 @@ def get_news(limit: int = Query(5, ge=1, le=20)) -> List[NewsItem]:
     """Return mocked list of news items related to VaR movements."""
 
     with SessionLocal() as session:
-        stmt = select(NewsRecord).order_by(desc(NewsRecord.published_at)).limit(limit)
-        return [
-            NewsItem(
-                id=str(record.id),
-                headline=record.headline,
-                published_at=record.published_at.isoformat(),
-                source=record.source,
-                summary=record.summary,
-            )
-            for record in session.scalars(stmt)
-        ]
+        return news_items(session, limit)
+
+
+def news_items(session: Session, limit: int) -> List[NewsItem]:
+    stmt = select(NewsRecord).order_by(desc(NewsRecord.published_at)).limit(limit)
+    return [news_item(record) for record in session.scalars(stmt)]
+
+
+def news_item(record: NewsRecord) -> NewsItem:
+    return NewsItem(
+        id=str(record.id),
+        headline=record.headline,
+        published_at=record.published_at.isoformat(),
+        source=record.source,
+        summary=record.summary,
+    )
 
 
 @router.get("/var/dates", response_model=List[date])
@@ -158,23 +463,493 @@ def list_snapshot_dates() -> List[date]:
     """Return available snapshot dates sorted descending."""
 
     with SessionLocal() as session:
-        stmt = select(VaRSnapshot.as_of).order_by(desc(VaRSnapshot.as_of))
-        return [row[0] for row in session.execute(stmt)]
+        return snapshot_dates(session)
+
 
+def snapshot_dates(session: Session) -> List[date]:
+    stmt = select(VaRSnapshot.as_of).order_by(desc(VaRSnapshot.as_of))
+    return [row[0] for row in session.execute(stmt)]
 
-@router.get("/var/scenario-distribution", response_model=ScenarioDistributionResponse)
+
+@router.get("/var/scenario-distribution", response_model=ScenarioDistributionResponse, responses=FAST_RESPONSES)
 def get_scenario_distribution(
+    ric: Annotated[str, Query(description="対象資産のRIC (全資産は ALL_ASSETS)")] = PORTFOLIO_AGGREGATE_RIC,
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    methodology: Annotated[Methodology, Query(description=METHODOLOGY_DESCRIPTION)] = "historical",
+    accept: Annotated[str | None, Header()] = None,
+) -> ScenarioDistributionResponse | Response:
+    """Return histogram-ready scenario P/L samples for the requested asset.
+
+    Column encodings serialise the NumPy vector directly instead of via a list.
+    """
+
+    with SessionLocal() as session:
+        return scenario_distribution_response(session, ric, as_of, negotiate(accept), methodology)
+
+
+def scenario_distribution_response(
+    session: Session,
+    ric: str,
+    as_of: date | None,
+    media_type: str = JSON_MEDIA_TYPE,
+    methodology: Methodology = "historical",
+) -> ScenarioDistributionResponse | Response:
+    values = scenario_values(session, ric, as_of, methodology)
+    if values is None:
+        raise HTTPException(status_code=404, detail="Scenario distribution not found")
+    if media_type != JSON_MEDIA_TYPE:
+        return columns_response({"ric": ric, "values": values}, media_type)
+    return ScenarioDistributionResponse(ric=ric, values=values.tolist(), methodology=methodology)
+
+
+def scenario_values(session: Session, ric: str, as_of: date | None, methodology: Methodology) -> np.ndarray | None:
+    """Stored scenario vector, or its EWMA-filtered counterpart for ``fhs``."""
+
+    if methodology == "fhs":
+        return load_filtered_vector(session, ric, as_of)
+    return load_scenario_vector(session, ric, as_of)
+
+
+@router.get("/var/scenario-distribution/histogram", response_model=ScenarioHistogramResponse)
+def get_scenario_histogram(
     ric: str = Query(PORTFOLIO_AGGREGATE_RIC, description="対象資産のRIC (全資産は ALL_ASSETS)"),
-) -> ScenarioDistributionResponse:
-    """Return histogram-ready scenario P/L samples for the requested asset."""
+    bins: int = Query(24, ge=1, le=200, description="ビン数"),
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    methodology: Annotated[Methodology, Query(description=METHODOLOGY_DESCRIPTION)] = "historical",
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Return pre-binned scenario P/L counts with quartiles and VaR/ES lines.
+
+    Results are cached per ``(ric, as_of, bins, data_version, methodology)``.
+    """
 
     with SessionLocal() as session:
-        stmt = (
-            select(ScenarioDistributionRecord.value)
-            .where(ScenarioDistributionRecord.ric == ric)
-            .order_by(ScenarioDistributionRecord.scenario_index)
-        )
-        values = [row[0] for row in session.execute(stmt)]
-        if not values:
+        return scenario_histogram_response(session, ric, bins, as_of, if_none_match, methodology)
+
+
+def scenario_histogram_response(
+    session: Session,
+    ric: str,
+    bins: int,
+    as_of: date | None,
+    if_none_match: str | None,
+    methodology: Methodology = "historical",
+) -> Response:
+    data_version = get_data_version(session)
+    filtered = methodology == "fhs"
+    target = as_of or (latest_ewma_date(session) if filtered else latest_scenario_date(session))
+
+    def build() -> ScenarioHistogramResponse:
+        values = scenario_values(session, ric, target, methodology)
+        if values is None:
             raise HTTPException(status_code=404, detail="Scenario distribution not found")
-        return ScenarioDistributionResponse(ric=ric, values=values)
+        summary = summarise_distribution(values, bins)
+        return ScenarioHistogramResponse(
+            ric=ric,
+            as_of=target,
+            sample_count=int(values.size),
+            edges=summary.edges.round(4).tolist(),
+            counts=summary.counts.tolist(),
+            minimum=summary.minimum,
+            maximum=summary.maximum,
+            quartiles=summary.quartiles.round(4).tolist(),
+            tail_measures=[
+                TailMeasure(confidence=confidence, var=float(var), expected_shortfall=float(es))
+                for confidence, var, es in zip(
+                    summary.tail.confidences, summary.tail.var[0], summary.tail.es[0]
+                )
+            ],
+            methodology=methodology,
+        )
+
+    return _cached_json_response(
+        histogram_cache,
+        (ric, target, bins, data_version, methodology),
+        etag_for("histogram", ric, target, bins, data_version, *([methodology] if filtered else [])),
+        build,
+        if_none_match,
+    )
+
+
+@router.get("/var/backtest", response_model=BacktestResponse)
+def get_var_backtest(
+    rics: Annotated[str | None, Query(description="カンマ区切りのRIC一覧 (未指定時は全RIC)")] = None,
+    days: Annotated[int, Query(ge=20, le=2000, description="検証する実現損益の日数")] = 250,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Backtest stored 99% VaR against realised P/L for every RIC at once.
+
+    Each RIC gets its exception dates, Basel traffic-light zone and the
+    Kupiec / Christoffersen likelihood ratios. Results are cached per
+    ``(end, days, rics, data_version)``.
+    """
+
+    requested = parse_ric_list(rics) if rics is not None else None
+    with SessionLocal() as session:
+        return backtest_response(session, requested, days, if_none_match)
+
+
+def backtest_response(
+    session: Session, requested: list[str] | None, days: int, if_none_match: str | None
+) -> Response:
+    data_version = get_data_version(session)
+    end = session.scalar(realized_dates_stmt(1))
+    scope = tuple(requested) if requested is not None else None
+    scope_tag = hashlib.blake2b(",".join(scope).encode(), digest_size=8).hexdigest() if scope else "all"
+
+    def build() -> BacktestResponse:
+        window = load_backtest_window(session, days, requested)
+        if window is None:
+            raise HTTPException(status_code=404, detail="No realised P/L found for backtesting")
+        result = backtest_var(window.forecasts, window.realized)
+        # Worst first: zone, then exception count; the stable sort keeps RIC order within ties.
+        order = np.lexsort((-result.exception_counts, -result.zones))
+        dates = np.array(window.dates)
+        return BacktestResponse(
+            confidence=result.confidence,
+            start=window.dates[0],
+            end=window.dates[-1],
+            days=len(window.dates),
+            zone_counts={zone: int((result.zones == index).sum()) for index, zone in enumerate(ZONES)},
+            results=[
+                BacktestRicResult(
+                    ric=window.rics[row],
+                    observations=int(result.observations[row]),
+                    exceptions=int(result.exception_counts[row]),
+                    exception_rate=round(float(result.exception_rates[row]), 6),
+                    zone=None if result.zones[row] == NO_DATA_ZONE else ZONES[result.zones[row]],
+                    kupiec_lr=_rounded(result.kupiec_lr[row], 4),
+                    kupiec_pvalue=_rounded(result.kupiec_pvalue[row], 6),
+                    independence_lr=_rounded(result.independence_lr[row], 4),
+                    independence_pvalue=_rounded(result.independence_pvalue[row], 6),
+                    conditional_coverage_lr=_rounded(result.conditional_coverage_lr[row], 4),
+                    conditional_coverage_pvalue=_rounded(result.conditional_coverage_pvalue[row], 6),
+                    exception_dates=dates[result.exceptions[row]].tolist(),
+                )
+                for row in order.tolist()
+            ],
+        )
+
+    return _cached_json_response(
+        backtest_cache,
+        (end, days, scope, data_version),
+        etag_for("backtest", end, days, scope_tag, data_version),
+        build,
+        if_none_match,
+    )
+
+
+def _rounded(value: float, digits: int) -> float | None:
+    """Round a statistic for the response; NaN (not enough data) becomes ``None``."""
+
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+@router.post("/var/what-if", response_model=WhatIfResponse)
+def post_var_what_if(request: WhatIfRequest) -> WhatIfResponse:
+    """Revalue portfolio VaR for hypothetical position changes.
+
+    The book's scenario matrix is cached per ``(as_of, data_version)``; each
+    request only applies rank-1 updates for the touched RICs.
+    """
+
+    with SessionLocal() as session:
+        return what_if_response(session, request)
+
+
+def what_if_response(session: Session, request: WhatIfRequest) -> WhatIfResponse:
+    target = request.as_of or session.scalar(select(func.max(VaRSnapshot.as_of)))
+    book = book_scenarios(session, target)
+    if book is None:
+        raise HTTPException(status_code=404, detail="VaR snapshot not found")
+    unknown = sorted(set(request.deltas) - set(book.index))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown RICs: {', '.join(unknown)}")
+
+    result = what_if(book, request.deltas)
+    return WhatIfResponse(
+        as_of=target,
+        base_var=result.base_var,
+        new_var=result.new_var,
+        incremental_var=result.incremental_var,
+        assets=[
+            WhatIfAsset(ric=ric, position_scale=scale, base_component_var=base, component_var=component)
+            for ric, scale, base, component in zip(
+                book.rics,
+                result.position_scale.tolist(),
+                book.base_component_var.tolist(),
+                result.component_var.tolist(),
+            )
+        ],
+    )
+
+
+@router.post("/var/stress", response_model=StressResponse)
+def post_var_stress(request: StressRequest) -> StressResponse:
+    """Revalue every RIC under each stress scenario and rank the scenarios by book P/L.
+
+    Sensitivities are cached per ``(as_of, data_version)``; each request is one
+    sensitivity x shock matrix product however many scenarios it carries.
+    """
+
+    with SessionLocal() as session:
+        return stress_response(session, request)
+
+
+def stress_response(session: Session, request: StressRequest) -> StressResponse:
+    target = request.as_of or session.scalar(select(func.max(VaRSnapshot.as_of)))
+    book = stress_book(session, target)
+    if book is None:
+        raise HTTPException(status_code=404, detail="VaR snapshot not found")
+    unknown = sorted({factor for scenario in request.scenarios for factor in scenario.shocks} - set(book.factors))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown stress factors: {', '.join(unknown)}")
+
+    result = run_stress(book, [StressScenario(scenario.name, scenario.shocks) for scenario in request.scenarios])
+    worst = result.worst_assets(request.top)
+    results = []
+    for rank, column in enumerate(result.ranking().tolist(), start=1):
+        rows = worst[:, column].tolist()
+        results.append(
+            StressScenarioResult(
+                name=result.scenarios[column],
+                rank=rank,
+                total_pnl=round(float(result.totals[column]), 6),
+                factor_pnl=dict(zip(book.factors, result.factor_pnl[:, column].round(6).tolist())),
+                worst_assets=[
+                    StressAssetPnL(ric=book.rics[row], pnl=pnl)
+                    for row, pnl in zip(rows, result.pnl[rows, column].round(6).tolist())
+                ],
+            )
+        )
+    return StressResponse(
+        as_of=target,
+        asset_count=len(book.rics),
+        factor_units={factor: unit for factor, (unit, _, _) in STRESS_FACTORS.items()},
+        scenarios=results,
+    )
+
+
+def stress_book(session: Session, as_of: date | None) -> StressBook | None:
+    """Return the cached stress sensitivities of the snapshot, deriving them on a miss."""
+
+    if as_of is None:
+        return None
+    key = (as_of, get_data_version(session))
+    book = stress_cache.get(key)
+    if book is not None:
+        return book
+
+    scenarios = book_scenarios(session, as_of)
+    if scenarios is None:
+        return None
+    categories = dict(session.execute(snapshot_categories_stmt(as_of)).all())
+    return stress_cache.set(
+        key, StressBook.from_scenarios(scenarios.rics, [categories[ric] for ric in scenarios.rics], scenarios.pnl)
+    )
+
+
+@router.get("/var/hierarchy", response_model=HierarchyResponse)
+def get_var_hierarchy(
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    path: Annotated[
+        List[str] | None, Query(description="表示するノード。上位階層から順に繰り返し指定 (例: path=マクロ&path=金利)")
+    ] = None,
+    levels: Annotated[str, Query(description="集計階層 (カンマ区切り、desk / category、空欄でRICのみ)")] = "desk,category",
+) -> HierarchyResponse:
+    """Return one level of the desk -> category -> RIC VaR tree.
+
+    Each node's VaR comes from the sum of its children's scenario vectors, so
+    diversification inside a desk or category is captured. The tree is built
+    once per ``(as_of, data_version, levels)`` from the cached scenario matrix;
+    node tail measures are computed on first visit.
+    """
+
+    with SessionLocal() as session:
+        return hierarchy_response(session, as_of, path or [], parse_hierarchy_levels(levels))
+
+
+def parse_hierarchy_levels(levels: str) -> tuple[str, ...]:
+    """Split a comma separated level list; unknown levels give ``422``."""
+
+    requested = tuple(dict.fromkeys(level.strip() for level in levels.split(",") if level.strip()))
+    unknown = [level for level in requested if level not in HIERARCHY_LEVELS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown hierarchy levels: {', '.join(unknown)}")
+    return requested
+
+
+def hierarchy_response(
+    session: Session, as_of: date | None, path: list[str], levels: tuple[str, ...]
+) -> HierarchyResponse:
+    target = as_of or session.scalar(select(func.max(VaRSnapshot.as_of)))
+    tree = hierarchy_tree(session, target, levels)
+    if tree is None:
+        raise HTTPException(status_code=404, detail="VaR snapshot not found")
+    try:
+        drill = tree.drill_down(path)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Hierarchy node not found") from None
+
+    child_level = (*levels, "ric")[min(len(drill.path), len(levels))]
+    children = [
+        HierarchyNode(
+            label=drill.labels[row],
+            path=[*drill.path, drill.labels[row]],
+            level=child_level,
+            leaf_count=int(drill.leaf_counts[row]),
+            var=round(float(drill.child_var[row]), 6),
+            expected_shortfall=round(float(drill.child_es[row]), 6),
+            component_var=round(float(drill.component_var[row]), 6),
+            has_children=not drill.leaf[row],
+        )
+        for row in np.argsort(-drill.child_var, kind="stable").tolist()
+    ]
+    return HierarchyResponse(
+        as_of=target,
+        levels=list(levels),
+        path=list(drill.path),
+        var=round(drill.var, 6),
+        expected_shortfall=round(drill.es, 6),
+        standalone_var=round(drill.standalone_var, 6),
+        diversification_effect=round(drill.diversification_effect, 6),
+        children=children,
+    )
+
+
+def hierarchy_tree(session: Session, as_of: date | None, levels: tuple[str, ...]) -> AggregationTree | None:
+    """Return the cached aggregation tree of the snapshot, building it on a miss."""
+
+    if as_of is None:
+        return None
+    version = get_data_version(session)
+    key = (as_of, version, levels)
+    tree = hierarchy_cache.get(key) or derived_hierarchy_trees(session, as_of, version).get(levels)
+    if tree is not None:
+        return tree
+
+    book = book_scenarios(session, as_of)
+    if book is None:
+        return None
+    categories = dict(session.execute(snapshot_categories_stmt(as_of)).all())
+    labels = [group_labels(level, [categories[ric] for ric in book.rics]) for level in levels]
+    groups = list(zip(*labels)) if labels else [()] * len(book.rics)
+    return hierarchy_cache.set(key, AggregationTree.from_leaves(book.rics, groups, book.pnl, levels))
+
+
+def derived_hierarchy_trees(session: Session, as_of: date, version: int) -> dict[tuple[str, ...], AggregationTree]:
+    """Carry the cached trees of ``as_of`` forward to ``version``, keyed by levels; empty if they cannot be.
+
+    Walks back through the commits this process saw until a version with
+    cached trees. That only works if every commit in between left ``as_of``
+    alone or just replaced scenario vectors. The replaced vectors are loaded
+    with one query and applied to every levels variant with
+    :meth:`AggregationTree.replace_leaves`. Writes from other processes break
+    the chain, and the caller rebuilds the tree.
+    """
+
+    rics: set[str] = set()
+    for base in range(version - 1, -1, -1):
+        commit = hierarchy_commits.get(base + 1)
+        if commit is None:
+            return {}
+        if as_of in commit.dates:
+            if as_of not in commit.scenario_rics:
+                return {}
+            rics |= commit.scenario_rics[as_of]
+        bases = {key[2]: tree for key, tree in hierarchy_cache.items() if key[:2] == (as_of, base)}
+        if bases:
+            break
+    else:
+        return {}
+    # Vectors of RICs outside the snapshot (the aggregate row) do not feed the trees.
+    leaves = sorted(rics.intersection(*(tree.leaf_paths.keys() for tree in bases.values())))
+    try:
+        vectors = dict(zip(leaves, load_scenario_matrix(session, leaves, as_of))) if leaves else {}
+        return {
+            levels: hierarchy_cache.set((as_of, version, levels), tree.replace_leaves(vectors))
+            for levels, tree in bases.items()
+        }
+    except (KeyError, ValueError):
+        return {}
+
+
+@router.get("/var/monte-carlo", response_model=MonteCarloVaRResponse)
+def get_var_monte_carlo(
+    as_of: Annotated[date | None, Query(description="基準日を指定 (未指定時は最新)")] = None,
+    paths: Annotated[int, Query(ge=1_000, le=5_000_000, description="シミュレーションのパス数")] = 100_000,
+    seed: Annotated[int, Query(ge=0, description="乱数シード")] = 0,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Monte Carlo VaR/ES: each RIC's scenario P/L distribution joined by correlated normal shocks.
+
+    Paths are simulated in fixed-size chunks on a thread pool; only the tail
+    paths are kept between chunks. Results are cached per ``(as_of, paths, seed, data_version)``.
+    """
+
+    with SessionLocal() as session:
+        return monte_carlo_response(session, as_of, paths, seed, if_none_match)
+
+
+def monte_carlo_response(
+    session: Session, as_of: date | None, paths: int, seed: int, if_none_match: str | None
+) -> Response:
+    data_version = get_data_version(session)
+    target = as_of or session.scalar(select(func.max(VaRSnapshot.as_of)))
+
+    def build() -> MonteCarloVaRResponse:
+        book = book_scenarios(session, target)
+        if book is None:
+            raise HTTPException(status_code=404, detail="VaR snapshot not found")
+        model = MonteCarloModel.from_scenarios(book.pnl)
+        result = monte_carlo_var(
+            model,
+            paths,
+            seed=seed,
+            chunk_size=settings.monte_carlo_chunk_size,
+            workers=settings.monte_carlo_workers,
+        )
+        return MonteCarloVaRResponse(
+            as_of=target,
+            paths=result.paths,
+            seed=seed,
+            method=model.method,
+            factor_rank=model.rank,
+            confidence=result.confidence,
+            tail_measures=[
+                TailMeasure(confidence=confidence, var=float(var), expected_shortfall=float(es))
+                for confidence, var, es in zip(result.confidences, result.var, result.es)
+            ],
+            assets=[
+                MonteCarloAsset(ric=ric, component_var=component)
+                for ric, component in zip(book.rics, result.component_var.tolist())
+            ],
+        )
+
+    return _cached_json_response(
+        monte_carlo_cache,
+        (target, paths, seed, data_version),
+        etag_for("monte-carlo", target, paths, seed, data_version),
+        build,
+        if_none_match,
+    )
+
+
+def book_scenarios(session: Session, as_of: date | None) -> BookScenarios | None:
+    """Return the cached scenario matrix of the snapshot's RICs, loading it on a miss."""
+
+    if as_of is None:
+        return None
+    key = (as_of, get_data_version(session))
+    book = scenario_cache.get(key)
+    if book is not None:
+        return book
+
+    rics = session.scalars(snapshot_rics_stmt(as_of)).all()
+    if not rics:
+        return None
+    try:
+        matrix = load_scenario_matrix(session, rics, as_of)
+    except KeyError:
+        return None
+    return scenario_cache.set(key, BookScenarios.from_matrix(rics, matrix))
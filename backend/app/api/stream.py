@@ -0,0 +1,227 @@
+"""Server-Sent Events channel that pushes snapshot and news commits to dashboards.
+
+Clients subscribe to ``GET /api/v1/stream`` instead of polling every endpoint.
+Commits made through ``SessionLocal`` in this process are pushed as they
+happen. Writes from other processes (loaders, backfills, other uvicorn
+workers) are caught by a single ``data_version`` check per process every
+``STREAM_POLL_SECONDS``. Database load therefore follows data changes, not
+the number of connected clients.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import date
+from typing import Annotated
+
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.models import NewsRecord, VaRSnapshot
+from ..db.notifications import on_news_committed, on_snapshots_committed
+from ..db.schema import get_data_version
+from ..db.session import SessionLocal
+from ..models.var import NewsEvent, PortfolioVaR, SnapshotEvent
+from .routes import news_item
+
+RETRY_MILLISECONDS = 5_000
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """One SSE message; ``id`` is the data version so reconnects can detect missed changes."""
+
+    event: str
+    data: BaseModel
+    id: int | None = None
+
+    def encode(self) -> bytes:
+        lines = [f"event: {self.event}"]
+        if self.id is not None:
+            lines.append(f"id: {self.id}")
+        lines.append(f"data: {self.data.model_dump_json()}")
+        return ("\n".join(lines) + "\n\n").encode()
+
+
+class StreamHub:
+    """Fans commit events out to subscriber queues from one dispatcher task per process."""
+
+    def __init__(self, poll_seconds: float, queue_size: int) -> None:
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.version = 0
+        self._subscribers: set[asyncio.Queue[StreamEvent]] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inbox: asyncio.Queue[tuple[str, frozenset]] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue[StreamEvent]:
+        """Register a client queue; must be called on the serving event loop."""
+
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._subscribers.clear()
+            self._loop, self._inbox = loop, asyncio.Queue()
+            self._task = loop.create_task(self._dispatch())
+        queue: asyncio.Queue[StreamEvent] = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[StreamEvent]) -> None:
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def notify(self, kind: str, keys: frozenset) -> None:
+        """Queue a commit for the dispatcher; safe to call from any thread."""
+
+        loop, inbox = self._loop, self._inbox
+        if self._task is None or loop is None or inbox is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(inbox.put_nowait, (kind, keys))
+
+    async def _dispatch(self) -> None:
+        assert self._inbox is not None
+        self.version = await asyncio.to_thread(_read_version)
+        while True:
+            try:
+                kind, keys = await asyncio.wait_for(self._inbox.get(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                kind, keys = "poll", frozenset()
+            try:
+                event = await asyncio.to_thread(self._build_event, kind, keys)
+            except Exception:
+                logger.exception("failed to build %s stream event", kind)
+                continue
+            if event is not None:
+                self._publish(event)
+
+    def _build_event(self, kind: str, keys: frozenset) -> StreamEvent | None:
+        # Runs once per change in a worker thread, never once per client.
+        with SessionLocal() as session:
+            version = get_data_version(session)
+            if kind == "news":
+                records = session.scalars(
+                    select(NewsRecord).where(NewsRecord.id.in_(keys)).order_by(NewsRecord.published_at.desc())
+                )
+                items = [news_item(record) for record in records]
+                return StreamEvent("news", NewsEvent(data_version=version, items=items), version)
+            if kind == "poll" and version == self.version:
+                return None
+            self.version = version
+            dates = sorted(keys)
+            latest = dates[-1] if dates else None
+            return StreamEvent(
+                "snapshot",
+                SnapshotEvent(
+                    data_version=version, dates=dates, latest=latest, portfolio=_portfolio(session, latest)
+                ),
+                version,
+            )
+
+    def _publish(self, event: StreamEvent) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled client is told to refetch everything instead of buffering without bound.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_resync(self.version))
+
+
+def _resync(version: int) -> StreamEvent:
+    return StreamEvent("resync", SnapshotEvent(data_version=version), version)
+
+
+def _read_version() -> int:
+    with SessionLocal() as session:
+        return get_data_version(session)
+
+
+def _portfolio(session: Session, as_of: date | None) -> PortfolioVaR | None:
+    if as_of is None:
+        return None
+    row = session.execute(
+        select(
+            VaRSnapshot.portfolio_total,
+            VaRSnapshot.portfolio_change_amount,
+            VaRSnapshot.portfolio_change_pct,
+            VaRSnapshot.diversification_effect,
+        ).where(VaRSnapshot.as_of == as_of)
+    ).first()
+    if row is None:
+        return None
+    return PortfolioVaR(
+        total=row.portfolio_total,
+        change_amount=row.portfolio_change_amount,
+        change_pct=row.portfolio_change_pct,
+        diversification_effect=row.diversification_effect,
+    )
+
+
+hub = StreamHub(poll_seconds=settings.stream_poll_seconds, queue_size=settings.stream_queue_size)
+
+
+@on_snapshots_committed
+def _push_snapshots(dates: frozenset[date]) -> None:
+    hub.notify("snapshot", dates)
+
+
+@on_news_committed
+def _push_news(ids: frozenset[int]) -> None:
+    hub.notify("news", ids)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """Push ``snapshot``, ``news`` and ``resync`` events as ``text/event-stream``.
+
+    The first event is ``ready`` with the current data version. A reconnect
+    whose ``Last-Event-ID`` is behind that version first receives ``resync``.
+    """
+
+    queue = hub.subscribe()
+    return StreamingResponse(
+        _event_stream(request, queue, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _event_stream(
+    request: Request, queue: asyncio.Queue[StreamEvent], last_event_id: str | None
+) -> AsyncIterator[bytes]:
+    try:
+        version = await asyncio.to_thread(_read_version)
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        if last_event_id is not None and last_event_id != str(version):
+            yield _resync(version).encode()
+        yield StreamEvent("ready", SnapshotEvent(data_version=version), version).encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.stream_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield b": keep-alive\n\n"
+                continue
+            yield event.encode()
+    finally:
+        hub.unsubscribe(queue)
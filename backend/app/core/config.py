@@ -1,6 +1,6 @@
 """Application settings and configuration helpers."""
 from functools import lru_cache
-from typing import Annotated, List, Optional
+from typing import Annotated, List, Literal, Optional
 
 from pydantic import BeforeValidator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -26,6 +26,25 @@ class Settings(BaseSettings):
     proxy_url: Optional[str] = None
     no_proxy: Optional[str] = None
     database_url: str = "sqlite:///./var_demo.db"
+    db_async: bool = False
+    async_database_url: Optional[str] = None
+    scenario_storage: Literal["columnar", "rows"] = "columnar"
+    seed_on_startup: bool = True
+    reset_schema_on_mismatch: bool = False
+    summary_cache_size: int = 256
+    histogram_cache_size: int = 1024
+    scenario_cache_size: int = 4
+    stress_cache_size: int = 4
+    hierarchy_cache_size: int = 8
+    backtest_cache_size: int = 32
+    monte_carlo_cache_size: int = 32
+    monte_carlo_chunk_size: int = 4096
+    monte_carlo_workers: int = 4
+    stream_poll_seconds: float = 5.0
+    stream_heartbeat_seconds: float = 15.0
+    stream_queue_size: int = 32
+    compression_minimum_size: int = 1024
+    compression_cache_size: int = 64
 
 
 @lru_cache
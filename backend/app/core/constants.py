@@ -2,3 +2,10 @@
 
 PORTFOLIO_AGGREGATE_RIC = "ALL_ASSETS"
 SCENARIO_WINDOW = 800
+VAR_CONFIDENCE = 0.99
+REPORTED_CONFIDENCE_LEVELS = (0.95, 0.975, 0.99)
+REPORTED_HORIZON_DAYS = (1, 10)
+# Length of the per-snapshot VaR ranking persisted in ``VaRSnapshot.top_rics``.
+SUMMARY_TOP_N = 20
+# RiskMetrics daily decay of the EWMA volatility used by filtered historical simulation.
+EWMA_DECAY = 0.94
@@ -0,0 +1,72 @@
+"""Snapshot-level aggregates materialised at load time for cheap summary reads."""
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ..core.constants import SUMMARY_TOP_N
+
+# Column order of the ``drivers`` arrays passed to :meth:`SnapshotAggregates.add`.
+DRIVER_FIELDS = ("window_drop", "window_add", "position_change", "ranking_shift")
+
+
+def top_rics(rics: Sequence[str], amounts: ArrayLike, n: int = SUMMARY_TOP_N) -> list[str]:
+    """Return up to ``n`` RICs ordered by descending VaR amount."""
+
+    return SnapshotAggregates(top_n=n).add_ranking(rics, amounts).ranking()
+
+
+@dataclass
+class SnapshotAggregates:
+    """Driver totals, per-category counts and top-N ranking of one snapshot's assets.
+
+    Loaders that write assets in chunks call :meth:`add` once per chunk; only
+    the ``top_n`` best candidates are kept between calls.
+    """
+
+    top_n: int = SUMMARY_TOP_N
+    driver_totals: np.ndarray = field(default_factory=lambda: np.zeros(len(DRIVER_FIELDS)))
+    category_counts: Counter[str] = field(default_factory=Counter)
+    _leaders: list[tuple[float, str]] = field(default_factory=list)
+
+    def add(
+        self, rics: Sequence[str], categories: Sequence[str], amounts: ArrayLike, drivers: ArrayLike
+    ) -> SnapshotAggregates:
+        self.driver_totals += np.asarray(drivers, dtype=np.float64).reshape(-1, len(DRIVER_FIELDS)).sum(axis=0)
+        self.category_counts.update(categories)
+        return self.add_ranking(rics, amounts)
+
+    def add_ranking(self, rics: Sequence[str], amounts: ArrayLike) -> SnapshotAggregates:
+        values = np.asarray(amounts, dtype=np.float64)
+        count = min(self.top_n, values.size)
+        if count:
+            # Sorted candidates plus a stable nlargest keep ties in load order.
+            candidates = np.sort(np.argpartition(-values, count - 1)[:count])
+            self._leaders = heapq.nlargest(
+                self.top_n,
+                [*self._leaders, *((float(values[i]), rics[i]) for i in candidates.tolist())],
+                key=lambda leader: leader[0],
+            )
+        return self
+
+    def ranking(self) -> list[str]:
+        return [ric for _, ric in self._leaders]
+
+    def driver_dict(self) -> dict[str, float]:
+        return dict(zip(DRIVER_FIELDS, self.driver_totals.round(3).tolist()))
+
+    def columns(self) -> dict[str, object]:
+        """Return the ``VaRSnapshot`` column values for these aggregates."""
+
+        drivers = self.driver_dict()
+        return {
+            "asset_count": sum(self.category_counts.values()),
+            **{f"driver_{name}": value for name, value in drivers.items()},
+            "category_counts": dict(sorted(self.category_counts.items())),
+            "top_rics": self.ranking(),
+        }
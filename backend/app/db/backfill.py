@@ -0,0 +1,343 @@
+"""Multi-process backfill of VaR snapshots from stored scenario vectors.
+
+``python -m app.db.backfill --start 2024-01-01 --end 2024-12-31 --workers 8``
+recomputes every figure the engine derives from a snapshot's scenario matrix,
+for example after a methodology change. This covers asset VaR, risk measures,
+component/marginal VaR and the portfolio totals.
+
+Each date is staged once by a worker into ``--workdir`` as a ``.npy`` file.
+Its RIC partitions are then computed by any worker over a read-only memory
+map of that file, so the matrix is never pickled between processes. The
+parent writes dates back in order (bulk insert / bulk update, one transaction
+per date) and records them in ``progress.json``. After a failure, rerunning
+with the same ``--workdir`` resumes after the last committed date.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from sqlalchemy import create_engine, delete, desc, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC, VAR_CONFIDENCE
+from ..engine import TailMeasures, compute_tail_measures, euler_allocation, round_to_total, var_tail_weights
+from .aggregates import top_rics
+from .bulk import bulk_insert
+from .models import AssetVaRRecord, RiskMeasureRecord, ScenarioVectorRecord, VaRSnapshot
+from .queries import snapshot_rics_stmt
+from .risk_measures import risk_measure_rows
+from .scenario_store import load_scenario_matrix, uses_columnar_storage
+from .schema import bump_data_version
+
+PROGRESS_FILE = "progress.json"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BackfillConfig:
+    """Date range, parallelism and scratch space of a backfill run."""
+
+    start: date | None = None
+    end: date | None = None
+    workers: int = os.cpu_count() or 1
+    partition_size: int = 2_000
+    workdir: Path = Path("backfill-work")
+    database_url: str | None = None
+
+
+@dataclass(frozen=True)
+class BackfillSummary:
+    """Dates rewritten by :func:`run_backfill` (``skipped`` were already done)."""
+
+    dates: tuple[date, ...]
+    skipped: int
+    seconds: float
+
+
+@dataclass(frozen=True)
+class StagedDate:
+    """A date whose scenario matrix sits in ``path`` as RICs x scenarios ``.npy``."""
+
+    as_of: date
+    rics: tuple[str, ...]
+    portfolio_pnl: np.ndarray
+    path: Path
+
+
+@dataclass(frozen=True)
+class PartitionResult:
+    """Risk figures for rows ``[start, start + len)`` of a staged matrix."""
+
+    start: int
+    measures: TailMeasures
+    component_var: np.ndarray
+
+
+_worker_sessions: sessionmaker[Session] | None = None
+
+
+def _init_worker(database_url: str) -> None:
+    # Each process opens its own engine; connections must not cross a fork.
+    global _worker_sessions
+    _worker_sessions = sessionmaker(bind=create_engine(database_url))
+
+
+def stage_date(workdir: Path, as_of: date) -> StagedDate:
+    """Write ``as_of``'s scenario matrix to ``workdir`` unless a previous attempt already did."""
+
+    path = workdir / f"{as_of.isoformat()}.npy"
+    with _worker_sessions() as session:
+        rics = tuple(session.scalars(snapshot_rics_stmt(as_of)))
+        if not path.exists():
+            partial = path.with_suffix(".partial.npy")
+            np.save(partial, load_scenario_matrix(session, rics, as_of))
+            os.replace(partial, path)
+    matrix = np.load(path, mmap_mode="r")
+    return StagedDate(as_of=as_of, rics=rics, portfolio_pnl=np.asarray(matrix.sum(axis=0)), path=path)
+
+
+def compute_partition(path: Path, start: int, stop: int, portfolio_pnl: np.ndarray) -> PartitionResult:
+    """Compute tail measures and component VaR for rows ``[start, stop)`` of a staged matrix."""
+
+    pnl = np.load(path, mmap_mode="r")[start:stop]
+    allocation = euler_allocation(pnl, tail=var_tail_weights(portfolio_pnl))
+    return PartitionResult(start=start, measures=compute_tail_measures(pnl), component_var=allocation.component_var)
+
+
+def run_backfill(config: BackfillConfig = BackfillConfig()) -> BackfillSummary:
+    """Recompute every snapshot in ``[config.start, config.end]`` across a process pool."""
+
+    if not uses_columnar_storage():
+        raise ValueError("backfill needs per-date scenario vectors (SCENARIO_STORAGE=columnar)")
+    if config.workers < 1 or config.partition_size < 1:
+        raise ValueError("workers and partition_size must be positive")
+    started = perf_counter()
+    database_url = config.database_url or settings.database_url
+    config.workdir.mkdir(parents=True, exist_ok=True)
+    progress_path = config.workdir / PROGRESS_FILE
+    completed = _read_progress(progress_path)
+
+    engine = create_engine(database_url)
+    try:
+        with Session(engine) as session:
+            dates = _backfill_dates(session, config.start, config.end)
+            pending = [as_of for as_of in dates if as_of not in completed]
+            if len(pending) < len(dates):
+                logger.info("resuming: %d of %d dates already written", len(dates) - len(pending), len(dates))
+            written = _run_pool(session, config, database_url, pending, completed, progress_path)
+    finally:
+        engine.dispose()
+
+    progress_path.unlink(missing_ok=True)
+    summary = BackfillSummary(
+        dates=tuple(written), skipped=len(dates) - len(pending), seconds=perf_counter() - started
+    )
+    logger.info("backfill: %d dates in %.1fs (%d skipped)", len(summary.dates), summary.seconds, summary.skipped)
+    return summary
+
+
+def _run_pool(
+    session: Session,
+    config: BackfillConfig,
+    database_url: str,
+    pending: list[date],
+    completed: set[date],
+    progress_path: Path,
+) -> list[date]:
+    """Stage, compute and write ``pending`` dates; returns the dates written."""
+
+    queue = deque(pending)
+    write_order = deque(pending)
+    staged: dict[date, StagedDate] = {}
+    results: dict[date, list[PartitionResult]] = {}
+    outstanding: dict[date, int] = {}
+    futures: dict[Future, date] = {}
+    written: list[date] = []
+    # Bounds the staged .npy files on disk and the results waiting for an earlier date.
+    max_open_dates = config.workers + 1
+    pool = ProcessPoolExecutor(max_workers=config.workers, initializer=_init_worker, initargs=(database_url,))
+    try:
+        while write_order:
+            while queue and len(outstanding) < max_open_dates:
+                as_of = queue.popleft()
+                outstanding[as_of] = -1
+                futures[pool.submit(stage_date, config.workdir, as_of)] = as_of
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                as_of = futures.pop(future)
+                result = future.result()
+                if isinstance(result, StagedDate):
+                    staged[as_of] = result
+                    results[as_of] = []
+                    starts = range(0, len(result.rics), config.partition_size)
+                    outstanding[as_of] = len(starts)
+                    for start in starts:
+                        stop = start + config.partition_size
+                        futures[pool.submit(compute_partition, result.path, start, stop, result.portfolio_pnl)] = as_of
+                else:
+                    results[as_of].append(result)
+                    outstanding[as_of] -= 1
+
+            while write_order and outstanding.get(write_order[0]) == 0:
+                as_of = write_order.popleft()
+                _write_date(session, staged.pop(as_of), results.pop(as_of))
+                del outstanding[as_of]
+                completed.add(as_of)
+                _write_progress(progress_path, completed)
+                (config.workdir / f"{as_of.isoformat()}.npy").unlink(missing_ok=True)
+                written.append(as_of)
+                logger.info("backfill %s written (%d/%d dates)", as_of, len(written), len(pending))
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        logger.error("backfill stopped after %d dates; rerun with the same --workdir to resume", len(written))
+        raise
+    pool.shutdown()
+    return written
+
+
+def _write_date(session: Session, staged: StagedDate, parts: list[PartitionResult]) -> None:
+    """Write one date's recomputed figures in a single transaction."""
+
+    parts.sort(key=lambda part: part.start)
+    confidences = parts[0].measures.confidences
+    portfolio = compute_tail_measures(staged.portfolio_pnl, confidences)
+    measures = TailMeasures(
+        confidences,
+        np.vstack([*(part.measures.var for part in parts), portfolio.var]),
+        np.vstack([*(part.measures.es for part in parts), portfolio.es]),
+    )
+    var_at_confidence, _ = measures.at(VAR_CONFIDENCE)
+    amounts = var_at_confidence[:-1].round(2)
+    components = round_to_total(np.concatenate([part.component_var for part in parts]))
+
+    # Plain column reads keep the single writer cheap; it bounds how far the pool scales.
+    snapshot = session.execute(
+        select(VaRSnapshot.id, VaRSnapshot.portfolio_change_amount, VaRSnapshot.portfolio_change_pct).where(
+            VaRSnapshot.as_of == staged.as_of
+        )
+    ).one()
+    previous = session.execute(
+        select(VaRSnapshot.id, VaRSnapshot.portfolio_total)
+        .where(VaRSnapshot.as_of < staged.as_of)
+        .order_by(desc(VaRSnapshot.as_of))
+        .limit(1)
+    ).first()
+    previous_amounts: dict[str, float] = {}
+    if previous is not None:
+        previous_amounts = dict(
+            session.execute(
+                select(AssetVaRRecord.ric, AssetVaRRecord.amount).where(AssetVaRRecord.snapshot_id == previous.id)
+            ).all()
+        )
+    records = {
+        row.ric: row
+        for row in session.execute(
+            select(
+                AssetVaRRecord.id,
+                AssetVaRRecord.ric,
+                AssetVaRRecord.change_amount,
+                AssetVaRRecord.change_pct,
+                AssetVaRRecord.position,
+            ).where(AssetVaRRecord.snapshot_id == snapshot.id)
+        )
+    }
+
+    updates = []
+    for ric, amount, component in zip(staged.rics, amounts.tolist(), components.tolist()):
+        record = records[ric]
+        prior = previous_amounts.get(ric)
+        change = round(amount - prior, 2) if prior is not None else record.change_amount
+        updates.append(
+            {
+                "id": record.id,
+                "amount": amount,
+                "change_amount": change,
+                "change_pct": round(change / prior * 100, 2) if prior else record.change_pct,
+                "component_var": component,
+                "marginal_var": round(component / record.position, 4) if record.position else 0.0,
+                "diversification_benefit": round(amount - component, 2),
+            }
+        )
+    session.execute(update(AssetVaRRecord), updates)
+
+    session.execute(delete(RiskMeasureRecord).where(RiskMeasureRecord.snapshot_id == snapshot.id))
+    bulk_insert(session, RiskMeasureRecord, risk_measure_rows(snapshot.id, [*staged.rics, PORTFOLIO_AGGREGATE_RIC], measures))
+
+    total = round(float(var_at_confidence[-1]), 2)
+    change_amount, change_pct = snapshot.portfolio_change_amount, snapshot.portfolio_change_pct
+    if previous is not None:
+        change_amount = round(total - previous.portfolio_total, 2)
+        change_pct = round(change_amount / previous.portfolio_total * 100, 2) if previous.portfolio_total else 0.0
+    session.execute(
+        update(VaRSnapshot)
+        .where(VaRSnapshot.id == snapshot.id)
+        .values(
+            portfolio_total=total,
+            portfolio_change_amount=change_amount,
+            portfolio_change_pct=change_pct,
+            diversification_effect=round(total - float(amounts.sum()), 2),
+            top_rics=top_rics(staged.rics, amounts),
+        )
+    )
+    bump_data_version(session)
+    session.commit()
+
+
+def _backfill_dates(session: Session, start: date | None, end: date | None) -> list[date]:
+    """Snapshot dates in ``[start, end]`` with assets and stored scenario vectors, oldest first."""
+
+    stmt = (
+        select(VaRSnapshot.as_of)
+        .where(
+            VaRSnapshot.as_of.in_(select(ScenarioVectorRecord.as_of).distinct()),
+            VaRSnapshot.assets.any(),
+        )
+        .order_by(VaRSnapshot.as_of)
+    )
+    if start is not None:
+        stmt = stmt.where(VaRSnapshot.as_of >= start)
+    if end is not None:
+        stmt = stmt.where(VaRSnapshot.as_of <= end)
+    return list(session.scalars(stmt))
+
+
+def _read_progress(path: Path) -> set[date]:
+    if not path.exists():
+        return set()
+    return {date.fromisoformat(value) for value in json.loads(path.read_text(encoding="utf-8"))["completed"]}
+
+
+def _write_progress(path: Path, completed: set[date]) -> None:
+    partial = path.with_suffix(".partial")
+    partial.write_text(json.dumps({"completed": sorted(day.isoformat() for day in completed)}), encoding="utf-8")
+    os.replace(partial, path)
+
+
+def main(argv: list[str] | None = None) -> BackfillSummary:
+    defaults = BackfillConfig()
+    parser = argparse.ArgumentParser(description="Recompute VaR snapshots from stored scenario vectors.")
+    parser.add_argument("--start", type=date.fromisoformat, help="first as_of (default: oldest snapshot)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last as_of (default: latest snapshot)")
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument("--partition-size", type=int, default=defaults.partition_size, help="RICs per task")
+    parser.add_argument("--workdir", type=Path, default=defaults.workdir, help="staged matrices and progress")
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    args = parser.parse_args(argv)
+    return run_backfill(BackfillConfig(**vars(args)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    main()
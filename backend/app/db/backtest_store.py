@@ -0,0 +1,72 @@
+"""Load aligned VaR forecast and realised P/L matrices for backtesting."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date
+from itertools import repeat
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .queries import realized_dates_stmt, realized_pnl_stmt, var_forecasts_stmt
+
+
+@dataclass(frozen=True)
+class BacktestWindow:
+    """RICs x days matrices where ``forecasts[:, t]`` is the VaR stored on the day before ``dates[t]``.
+
+    Missing rows are NaN, so the engine skips them as non-observations.
+    """
+
+    rics: tuple[str, ...]
+    dates: tuple[date, ...]
+    forecasts: np.ndarray
+    realized: np.ndarray
+
+
+def load_backtest_window(session: Session, days: int, rics: Sequence[str] | None = None) -> BacktestWindow | None:
+    """Return the latest ``days`` realised P/L dates with the prior day's VaR, or ``None`` without data.
+
+    Each table is read with one Core query on the session's connection, which
+    skips ORM result processing. The matrices are then filled column-wise by
+    integer indexing, so no Python object is built per observation beyond the
+    driver's row tuple.
+    """
+
+    calendar = list(reversed(session.scalars(realized_dates_stmt(days + 1)).all()))
+    if len(calendar) < 2:
+        return None
+    dates = calendar[1:]
+    connection = session.connection()
+    realized_rows = connection.execute(realized_pnl_stmt(dates[0], dates[-1], rics)).all()
+    forecast_rows = connection.execute(var_forecasts_stmt(calendar[0], calendar[-2], rics)).all()
+    if not realized_rows:
+        return None
+
+    found = set(next(zip(*realized_rows)))
+    ordered = [ric for ric in rics if ric in found] if rics is not None else sorted(found)
+    row_index = {ric: row for row, ric in enumerate(ordered)}
+    # Forecast on calendar[t] applies to the P/L on calendar[t + 1] = dates[t].
+    realized_columns = {day: column for column, day in enumerate(dates)}
+    forecast_columns = {day: column for column, day in enumerate(calendar[:-1])}
+    return BacktestWindow(
+        rics=tuple(ordered),
+        dates=tuple(dates),
+        forecasts=_fill(forecast_rows, row_index, forecast_columns, len(dates)),
+        realized=_fill(realized_rows, row_index, realized_columns, len(dates)),
+    )
+
+
+def _fill(
+    rows: Sequence[tuple[str, date, float]], row_index: dict[str, int], columns: dict[date, int], width: int
+) -> np.ndarray:
+    matrix = np.full((len(row_index), width), np.nan)
+    if not rows:
+        return matrix
+    rics, days, values = zip(*rows)
+    row = np.fromiter(map(row_index.get, rics, repeat(-1)), dtype=np.int64, count=len(rows))
+    column = np.fromiter(map(columns.get, days, repeat(-1)), dtype=np.int64, count=len(rows))
+    kept = (row >= 0) & (column >= 0)
+    matrix[row[kept], column[kept]] = np.asarray(values, dtype=np.float64)[kept]
+    return matrix
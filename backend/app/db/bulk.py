@@ -0,0 +1,93 @@
+"""Chunked bulk ingestion that bypasses per-object ORM inserts."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from itertools import islice
+from time import perf_counter
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .base import Base
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BulkLoadReport:
+    """Row count and throughput of a single bulk load."""
+
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+
+def _chunked(rows: Iterable[Mapping[str, Any]], size: int) -> Iterator[list[Mapping[str, Any]]]:
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _supports_copy(session: Session) -> bool:
+    bind = session.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg"
+
+
+def _copy_chunk(session: Session, table_name: str, columns: list[str], chunk: list[Mapping[str, Any]]) -> None:
+    """Stream a chunk through PostgreSQL ``COPY ... FROM STDIN`` (psycopg 3)."""
+
+    raw = session.connection().connection.driver_connection
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    with raw.cursor() as cursor:
+        with cursor.copy(f'COPY "{table_name}" ({column_list}) FROM STDIN') as copy:
+            for row in chunk:
+                copy.write_row([row.get(column) for column in columns])
+
+
+def bulk_insert(
+    session: Session,
+    model: type[Base],
+    rows: Iterable[Mapping[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> BulkLoadReport:
+    """Insert ``rows`` into ``model``'s table in chunks within the session's transaction.
+
+    Each chunk is sent as a single Core ``executemany`` (``COPY`` on PostgreSQL
+    with psycopg 3), so no ORM objects are built and memory stays bounded by
+    ``chunk_size`` even when ``rows`` is a generator. Committing is left to the
+    caller.
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+
+    table = model.__table__
+    use_copy = _supports_copy(session)
+    started = perf_counter()
+    total = 0
+    for chunk in _chunked(rows, chunk_size):
+        if use_copy:
+            columns = [column.name for column in table.columns if column.name in chunk[0]]
+            _copy_chunk(session, table.name, columns, chunk)
+        else:
+            session.execute(insert(table), chunk)
+        total += len(chunk)
+
+    report = BulkLoadReport(table=table.name, rows=total, seconds=perf_counter() - started)
+    logger.info(
+        "bulk loaded %d rows into %s in %.3fs (%.0f rows/s)",
+        report.rows,
+        report.table,
+        report.seconds,
+        report.rows_per_second,
+    )
+    return report
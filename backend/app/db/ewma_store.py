@@ -0,0 +1,146 @@
+"""Persisted EWMA filter state per (RIC, as_of) for filtered historical simulation."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import date
+
+import numpy as np
+from numpy.typing import ArrayLike
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC
+from ..engine.ewma import EwmaState
+from .bulk import BulkLoadReport, bulk_insert
+from .models import EwmaStateRecord
+from .scenario_store import decode_vector, encode_vector
+
+# Newest scenarios of the previous window that must reappear, one day older, in a rolled window.
+SHIFT_CHECK_SCENARIOS = 3
+
+
+def save_ewma_states(session: Session, as_of: date, vectors: Mapping[str, ArrayLike]) -> BulkLoadReport:
+    """Store the filter state of each RIC's ``as_of`` scenario window, replacing existing rows.
+
+    A RIC whose window is the previous stored date's window shifted by one
+    scenario is rolled forward with its newest scenario, an O(1) update per
+    RIC. The shift is recognised from the last ``SHIFT_CHECK_SCENARIOS``
+    scenarios recovered from the previous state, so no scenario vectors are
+    read. Windows are scaled by each day's position, so the previous state is
+    first rescaled by the position ratio fitted on those scenarios. Other RICs
+    (first load, new listings, gaps between dates, changed window length) are
+    filtered over their whole window. The portfolio aggregate is skipped: its
+    filtered vector is the sum of the filtered asset vectors.
+    """
+
+    rics = [ric for ric in vectors if ric != PORTFOLIO_AGGREGATE_RIC]
+    windows = {ric: np.asarray(vectors[ric], dtype=np.float64) for ric in rics}
+    rolled, scales, state = _rollable_states(session, as_of, windows)
+    fresh = [ric for ric in rics if ric not in set(rolled)]
+    states: list[tuple[list[str], EwmaState]] = []
+    if rolled:
+        states.append((rolled, state.rescaled(scales).roll([windows[ric][-1] for ric in rolled])))
+    for length in sorted({windows[ric].size for ric in fresh}):
+        group = [ric for ric in fresh if windows[ric].size == length]
+        states.append((group, EwmaState.from_window(np.vstack([windows[ric] for ric in group]))))
+
+    session.execute(delete(EwmaStateRecord).where(EwmaStateRecord.as_of == as_of, EwmaStateRecord.ric.in_(rics)))
+    return bulk_insert(
+        session,
+        EwmaStateRecord,
+        (
+            {
+                "ric": ric,
+                "as_of": as_of,
+                "variance": variance,
+                "length": residuals.size,
+                "payload": encode_vector(residuals),
+            }
+            for group, state in states
+            for ric, variance, residuals in zip(group, state.variance.tolist(), state.residuals)
+        ),
+    )
+
+
+def _rollable_states(
+    session: Session, as_of: date, windows: Mapping[str, np.ndarray]
+) -> tuple[list[str], np.ndarray, EwmaState | None]:
+    """Return the RICs whose previous state can be rolled, their position ratios and that state.
+
+    Only the stored states are read: the newest scenarios of the previous
+    window are recovered from them and matched against the new window.
+    """
+
+    previous_date = session.scalar(select(func.max(EwmaStateRecord.as_of)).where(EwmaStateRecord.as_of < as_of))
+    if previous_date is None or not windows:
+        return [], np.empty(0), None
+    previous = _state_rows(session, previous_date, list(windows))
+    candidates = [
+        ric
+        for ric in windows
+        if ric in previous and previous[ric][1].size == windows[ric].size > SHIFT_CHECK_SCENARIOS
+    ]
+    if not candidates:
+        return [], np.empty(0), None
+    state = EwmaState(
+        variance=np.array([previous[ric][0] for ric in candidates]),
+        residuals=np.vstack([previous[ric][1] for ric in candidates]),
+    )
+    before = state.latest_observations(SHIFT_CHECK_SCENARIOS)
+    after = np.vstack([windows[ric][-1 - SHIFT_CHECK_SCENARIOS : -1] for ric in candidates])
+    norms = np.einsum("ij,ij->i", before, before)
+    scales = np.divide(np.einsum("ij,ij->i", after, before), norms, out=np.ones(len(candidates)), where=norms > 0)
+    # Vectors are stored rounded to 3 decimals, so allow that much noise on both sides.
+    error = np.abs(after - scales[:, None] * before).max(axis=1, initial=0.0)
+    shifted = error <= 1e-3 * (1.0 + np.abs(scales)) + 1e-9
+    rolled = [ric for ric, keep in zip(candidates, shifted.tolist()) if keep]
+    return rolled, scales[shifted], EwmaState(variance=state.variance[shifted], residuals=state.residuals[shifted])
+
+
+def latest_ewma_date(session: Session) -> date | None:
+    return session.scalar(select(func.max(EwmaStateRecord.as_of)))
+
+
+def load_ewma_state(session: Session, rics: Iterable[str], as_of: date | None = None) -> EwmaState:
+    """Load the stored states of ``rics`` in order; raises ``KeyError`` naming the first missing RIC."""
+
+    rics = list(rics)
+    rows = _state_rows(session, as_of or latest_ewma_date(session), rics)
+    missing = [ric for ric in rics if ric not in rows]
+    if missing:
+        raise KeyError(missing[0])
+    if not rics:
+        return EwmaState(variance=np.empty(0), residuals=np.empty((0, 0)))
+    return EwmaState(
+        variance=np.array([rows[ric][0] for ric in rics]),
+        residuals=np.vstack([rows[ric][1] for ric in rics]),
+    )
+
+
+def load_filtered_vector(session: Session, ric: str, as_of: date | None = None) -> np.ndarray | None:
+    """Return one RIC's FHS scenario vector (ALL_ASSETS sums every asset); ``None`` when missing."""
+
+    as_of = as_of or latest_ewma_date(session)
+    if as_of is None:
+        return None
+    if ric != PORTFOLIO_AGGREGATE_RIC:
+        try:
+            return load_ewma_state(session, [ric], as_of).filtered()[0]
+        except KeyError:
+            return None
+    rows = _state_rows(session, as_of)
+    if not rows:
+        return None
+    variance, residuals = zip(*rows.values())
+    return EwmaState(variance=np.array(variance), residuals=np.vstack(residuals)).filtered().sum(axis=0)
+
+
+def _state_rows(
+    session: Session, as_of: date | None, rics: list[str] | None = None
+) -> dict[str, tuple[float, np.ndarray]]:
+    stmt = select(EwmaStateRecord.ric, EwmaStateRecord.variance, EwmaStateRecord.payload).where(
+        EwmaStateRecord.as_of == as_of
+    )
+    if rics is not None:
+        stmt = stmt.where(EwmaStateRecord.ric.in_(rics))
+    return {ric: (variance, decode_vector(payload)) for ric, variance, payload in session.execute(stmt)}
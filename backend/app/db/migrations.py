@@ -0,0 +1,170 @@
+"""Additive schema migrations applied on startup, one step per SCHEMA_VERSION bump.
+
+Each step only creates tables, indexes or columns (with defaults) and fills
+derived values from rows already stored, so upgrading never discards
+snapshots, realised P/L or filter state. The version is stamped after every
+step, so an interrupted upgrade resumes where it stopped.
+"""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+
+import numpy as np
+from sqlalchemy import Table, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from .aggregates import DRIVER_FIELDS, SnapshotAggregates
+from .base import Base
+from .ewma_store import save_ewma_states
+from .models import (
+    AssetVaRRecord,
+    EwmaStateRecord,
+    RealizedPnLRecord,
+    RiskMeasureRecord,
+    ScenarioDistributionRecord,
+    ScenarioVectorRecord,
+    VaRSnapshot,
+    VaRTimeSeriesRecord,
+)
+from .scenario_store import decode_vector, uses_columnar_storage
+from .schema import SCHEMA_VERSION, SCHEMA_VERSION_KEY, bump_data_version, write_meta
+from .session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaMigrationError(RuntimeError):
+    """The stored schema cannot be upgraded in place."""
+
+
+def migrate_schema(current: int) -> None:
+    """Upgrade the schema from version ``current`` to :data:`SCHEMA_VERSION` step by step.
+
+    Raises :class:`SchemaMigrationError` for versions this build has no path
+    from (older than 1, or newer than the code).
+    """
+
+    if current < min(MIGRATIONS) - 1 or current > SCHEMA_VERSION:
+        raise SchemaMigrationError(f"no migration from schema version {current} to {SCHEMA_VERSION}")
+    for version in range(current + 1, SCHEMA_VERSION + 1):
+        logger.info("migrating schema to version %d", version)
+        with SessionLocal.begin() as session:
+            MIGRATIONS[version](session)
+            write_meta(session, SCHEMA_VERSION_KEY, str(version))
+            bump_data_version(session)
+
+
+def _create_tables(session: Session, *tables: Table) -> None:
+    Base.metadata.create_all(bind=session.connection(), tables=list(tables), checkfirst=True)
+
+
+def _create_indexes(session: Session, table: Table, drop: tuple[str, ...] = ()) -> None:
+    """Create ``table``'s model indexes that are missing and drop the superseded ones in ``drop``."""
+
+    connection = session.connection()
+    existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+    for name in drop:
+        if name in existing:
+            connection.execute(text(f"DROP INDEX {name}"))
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(bind=connection)
+
+
+def _add_columns(session: Session, table: Table, defaults: dict[str, str]) -> None:
+    """Add missing model columns as ``NOT NULL DEFAULT <sql literal>``."""
+
+    connection = session.connection()
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for name, default in defaults.items():
+        if name in existing:
+            continue
+        column_type = table.c[name].type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type} NOT NULL DEFAULT {default}"))
+
+
+def _to_v2(session: Session) -> None:
+    _create_indexes(session, VaRTimeSeriesRecord.__table__, drop=("ix_var_timeseries_records_ric",))
+    _create_indexes(session, ScenarioDistributionRecord.__table__, drop=("ix_scenario_distribution_records_ric",))
+
+
+def _to_v3(session: Session) -> None:
+    # Existing snapshots get their risk measures from ``python -m app.db.backfill``.
+    _create_tables(session, RiskMeasureRecord.__table__)
+
+
+def _to_v4(session: Session) -> None:
+    _add_columns(
+        session,
+        AssetVaRRecord.__table__,
+        {"component_var": "0", "marginal_var": "0", "diversification_benefit": "0"},
+    )
+
+
+def _to_v5(session: Session) -> None:
+    """Add the materialised snapshot aggregates and fill them from the stored asset rows."""
+
+    _add_columns(
+        session,
+        VaRSnapshot.__table__,
+        {
+            "asset_count": "0",
+            **{f"driver_{name}": "0" for name in DRIVER_FIELDS},
+            "category_counts": "'{}'",
+            "top_rics": "'[]'",
+        },
+    )
+    _create_indexes(session, AssetVaRRecord.__table__)
+    columns = [getattr(AssetVaRRecord, f"{name}_contribution") for name in DRIVER_FIELDS]
+    for snapshot_id in session.scalars(select(VaRSnapshot.id)).all():
+        rows = session.execute(
+            select(AssetVaRRecord.ric, AssetVaRRecord.category, AssetVaRRecord.amount, *columns).where(
+                AssetVaRRecord.snapshot_id == snapshot_id
+            )
+        ).all()
+        aggregates = SnapshotAggregates()
+        if rows:
+            rics, categories, amounts, *drivers = zip(*rows)
+            aggregates.add(rics, categories, amounts, np.column_stack(drivers))
+        session.execute(update(VaRSnapshot).where(VaRSnapshot.id == snapshot_id).values(**aggregates.columns()))
+
+
+def _to_v6(session: Session) -> None:
+    _create_tables(session, RealizedPnLRecord.__table__)
+
+
+def _to_v7(session: Session) -> None:
+    """Create the EWMA state table and filter every stored scenario window, oldest date first."""
+
+    _create_tables(session, EwmaStateRecord.__table__)
+    if not uses_columnar_storage():
+        logger.info("row scenario storage: EWMA state is written on the next scenario load")
+        return
+    dates = session.scalars(select(ScenarioVectorRecord.as_of).distinct().order_by(ScenarioVectorRecord.as_of))
+    for as_of in dates.all():
+        stmt = select(ScenarioVectorRecord.ric, ScenarioVectorRecord.payload).where(ScenarioVectorRecord.as_of == as_of)
+        save_ewma_states(session, as_of, {ric: decode_vector(payload) for ric, payload in session.execute(stmt)})
+
+
+def _to_v8(session: Session) -> None:
+    """Add the stored position; older rows get the one the allocation implied (component / marginal VaR)."""
+
+    _add_columns(session, AssetVaRRecord.__table__, {"position": "1"})
+    session.execute(
+        update(AssetVaRRecord)
+        .where(AssetVaRRecord.marginal_var != 0, AssetVaRRecord.component_var != 0)
+        .values(position=AssetVaRRecord.component_var / AssetVaRRecord.marginal_var)
+    )
+
+
+# Step that upgrades the previous version to the key's version.
+MIGRATIONS: dict[int, Callable[[Session], None]] = {
+    2: _to_v2,
+    3: _to_v3,
+    4: _to_v4,
+    5: _to_v5,
+    6: _to_v6,
+    7: _to_v7,
+    8: _to_v8,
+}
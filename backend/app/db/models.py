@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from datetime import date, datetime
 
-from sqlalchemy import Date, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import JSON, Date, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -18,6 +18,14 @@ class VaRSnapshot(Base):
     portfolio_change_amount: Mapped[float] = mapped_column(Float, nullable=False)
     portfolio_change_pct: Mapped[float] = mapped_column(Float, nullable=False)
     diversification_effect: Mapped[float] = mapped_column(Float, nullable=False)
+    # Materialised at load time (see app.db.aggregates) so summary reads need not scan the assets.
+    asset_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    driver_window_drop: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    driver_window_add: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    driver_position_change: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    driver_ranking_shift: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    category_counts: Mapped[dict[str, int]] = mapped_column(JSON, nullable=False, default=dict)
+    top_rics: Mapped[list[str]] = mapped_column(JSON, nullable=False, default=list)
 
     assets: Mapped[list[AssetVaRRecord]] = relationship(
         "AssetVaRRecord",
@@ -29,6 +37,8 @@ class VaRSnapshot(Base):
 
 class AssetVaRRecord(Base):
     __tablename__ = "asset_var_records"
+    # Serves both the full snapshot load and the top-N "ric IN (...)" summary lookup.
+    __table_args__ = (Index("ix_asset_var_snapshot_ric", "snapshot_id", "ric"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     snapshot_id: Mapped[int] = mapped_column(ForeignKey("var_snapshots.id", ondelete="CASCADE"), nullable=False)
@@ -42,20 +52,56 @@ class AssetVaRRecord(Base):
     window_add_contribution: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     position_change_contribution: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     ranking_shift_contribution: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    component_var: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    marginal_var: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    # Multiplier applied to the RIC's unit scenario P/L on this date; marginal VaR is per unit of it.
+    position: Mapped[float] = mapped_column(Float, nullable=False, default=1.0)
+    diversification_benefit: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
 
     snapshot: Mapped[VaRSnapshot] = relationship("VaRSnapshot", back_populates="assets")
 
 
+class RiskMeasureRecord(Base):
+    """VaR and ES of one RIC (or ALL_ASSETS) at one confidence level and horizon."""
+
+    __tablename__ = "risk_measure_records"
+    __table_args__ = (
+        Index("ix_risk_measure_snapshot_ric", "snapshot_id", "ric", "horizon_days", "confidence", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    snapshot_id: Mapped[int] = mapped_column(ForeignKey("var_snapshots.id", ondelete="CASCADE"), nullable=False)
+    ric: Mapped[str] = mapped_column(String(32), nullable=False)
+    confidence: Mapped[float] = mapped_column(Float, nullable=False)
+    horizon_days: Mapped[int] = mapped_column(Integer, nullable=False)
+    var: Mapped[float] = mapped_column(Float, nullable=False)
+    expected_shortfall: Mapped[float] = mapped_column(Float, nullable=False)
+
+
 class VaRTimeSeriesRecord(Base):
     __tablename__ = "var_timeseries_records"
+    # Serves "WHERE ric = ? ORDER BY point_date DESC LIMIT n" as an index range scan.
+    __table_args__ = (Index("ix_var_timeseries_ric_point_date", "ric", "point_date", unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    ric: Mapped[str] = mapped_column(String(32), index=True)
+    ric: Mapped[str] = mapped_column(String(32), nullable=False)
     point_date: Mapped[date] = mapped_column(Date, index=True)
     value: Mapped[float] = mapped_column(Float, nullable=False)
     change: Mapped[float | None] = mapped_column(Float, nullable=True)
 
 
+class RealizedPnLRecord(Base):
+    """Realised daily P/L of one RIC (or ALL_ASSETS), backtested against the prior day's VaR."""
+
+    __tablename__ = "realized_pnl_records"
+    __table_args__ = (Index("ix_realized_pnl_ric_date", "ric", "pnl_date", unique=True),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ric: Mapped[str] = mapped_column(String(32), nullable=False)
+    pnl_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    pnl: Mapped[float] = mapped_column(Float, nullable=False)
+
+
 class NewsRecord(Base):
     __tablename__ = "news_records"
 
@@ -68,13 +114,41 @@ class NewsRecord(Base):
 
 class ScenarioDistributionRecord(Base):
     __tablename__ = "scenario_distribution_records"
+    __table_args__ = (Index("ix_scenario_distribution_ric_index", "ric", "scenario_index", unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    ric: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    ric: Mapped[str] = mapped_column(String(32), nullable=False)
     scenario_index: Mapped[int] = mapped_column(Integer, nullable=False)
     value: Mapped[float] = mapped_column(Float, nullable=False)
 
 
+class ScenarioVectorRecord(Base):
+    """Scenario P/L window for one RIC stored as a contiguous little-endian float64 blob."""
+
+    __tablename__ = "scenario_vector_records"
+    __table_args__ = (UniqueConstraint("ric", "as_of", name="uq_scenario_vector_ric_as_of"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ric: Mapped[str] = mapped_column(String(32), nullable=False)
+    as_of: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class EwmaStateRecord(Base):
+    """EWMA filter state of one RIC's scenario window: forecast variance plus standardised residuals blob."""
+
+    __tablename__ = "ewma_state_records"
+    __table_args__ = (UniqueConstraint("ric", "as_of", name="uq_ewma_state_ric_as_of"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ric: Mapped[str] = mapped_column(String(32), nullable=False)
+    as_of: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    variance: Mapped[float] = mapped_column(Float, nullable=False)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
 class MarketSignalRecord(Base):
     __tablename__ = "market_signal_records"
 
@@ -92,3 +166,12 @@ class DriverCommentaryRecord(Base):
     as_of: Mapped[date] = mapped_column(Date, unique=True, nullable=False, index=True)
     technical_summary: Mapped[str] = mapped_column(String(512), nullable=False)
     news_summary: Mapped[str] = mapped_column(String(512), nullable=False)
+
+
+class SchemaMetaRecord(Base):
+    """Key/value bookkeeping for schema version, data version and the init lock."""
+
+    __tablename__ = "schema_meta"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(String(256), nullable=False)
@@ -0,0 +1,127 @@
+"""Commit-time notifications about snapshot and news data written through ``SessionLocal``."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import DriverCommentaryRecord, MarketSignalRecord, NewsRecord, VaRSnapshot
+from .session import SessionLocal
+
+
+@dataclass(frozen=True)
+class SnapshotCommit:
+    """What one commit wrote to snapshot data.
+
+    ``scenario_rics`` lists, per date, the RICs whose scenario vectors were
+    replaced when nothing else was written for that date. ``data_version``
+    is the version the commit stamped, or ``None`` if it did not bump it.
+    """
+
+    dates: frozenset[date]
+    scenario_rics: Mapping[date, frozenset[str]] = field(default_factory=dict)
+    data_version: int | None = None
+
+
+SnapshotListener = Callable[[frozenset[date]], None]
+SnapshotCommitListener = Callable[[SnapshotCommit], None]
+NewsListener = Callable[[frozenset[int]], None]
+
+_PENDING_KEY = "written_snapshot_dates"
+_SCENARIOS_KEY = "written_scenario_rics"
+_VERSION_KEY = "committed_data_version"
+_NEWS_KEY = "inserted_news_ids"
+_SNAPSHOT_MODELS = (VaRSnapshot, MarketSignalRecord, DriverCommentaryRecord)
+_listeners: list[SnapshotListener] = []
+_commit_listeners: list[SnapshotCommitListener] = []
+_news_listeners: list[NewsListener] = []
+
+logger = logging.getLogger(__name__)
+
+
+def on_snapshots_committed(listener: SnapshotListener) -> SnapshotListener:
+    """Register ``listener`` to receive the as_of dates written by each commit."""
+
+    _listeners.append(listener)
+    return listener
+
+
+def on_snapshot_commit(listener: SnapshotCommitListener) -> SnapshotCommitListener:
+    """Register ``listener`` to receive a :class:`SnapshotCommit` for each commit that wrote snapshot data.
+
+    These listeners run before the :func:`on_snapshots_committed` ones.
+    """
+
+    _commit_listeners.append(listener)
+    return listener
+
+
+def on_news_committed(listener: NewsListener) -> NewsListener:
+    """Register ``listener`` to receive the ids of news items inserted by each commit."""
+
+    _news_listeners.append(listener)
+    return listener
+
+
+def mark_snapshot_written(session: Session, as_of: date) -> None:
+    """Flag ``as_of`` as changed by a Core/bulk write the ORM hooks cannot see."""
+
+    session.info.setdefault(_PENDING_KEY, set()).add(as_of)
+
+
+def mark_scenarios_written(session: Session, as_of: date, rics: Iterable[str]) -> None:
+    """Flag the scenario vectors of ``rics`` on ``as_of`` as replaced."""
+
+    session.info.setdefault(_SCENARIOS_KEY, {}).setdefault(as_of, set()).update(rics)
+
+
+def mark_data_version(session: Session, version: int) -> None:
+    """Record the data version the pending transaction will commit."""
+
+    session.info[_VERSION_KEY] = version
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_written_snapshots(session: Session, _flush_context: object) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, _SNAPSHOT_MODELS) and instance.as_of is not None:
+            mark_snapshot_written(session, instance.as_of)
+    for instance in session.new:
+        if isinstance(instance, NewsRecord):
+            session.info.setdefault(_NEWS_KEY, set()).add(instance.id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _dispatch_written_snapshots(session: Session) -> None:
+    written = session.info.pop(_PENDING_KEY, set())
+    scenarios = session.info.pop(_SCENARIOS_KEY, {})
+    version = session.info.pop(_VERSION_KEY, None)
+    if written or scenarios:
+        dates = frozenset(written | scenarios.keys())
+        scenario_rics = {as_of: frozenset(rics) for as_of, rics in scenarios.items() if as_of not in written}
+        _notify(_commit_listeners, SnapshotCommit(dates, scenario_rics, version))
+        _notify(_listeners, dates)
+    news_ids = session.info.pop(_NEWS_KEY, None)
+    if news_ids:
+        _notify(_news_listeners, frozenset(news_ids))
+
+
+def _notify(listeners: list[Callable[[Any], None]], payload: object) -> None:
+    for listener in list(listeners):
+        try:
+            listener(payload)
+        except Exception:  # a failing listener must not break the writer
+            logger.exception("commit listener %r failed", listener)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_written_snapshots(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_SCENARIOS_KEY, None)
+    session.info.pop(_VERSION_KEY, None)
+    session.info.pop(_NEWS_KEY, None)
@@ -0,0 +1,150 @@
+"""Reusable SELECT statements for the read endpoints."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import date
+
+from sqlalchemy import Select, desc, func, select
+
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC
+
+from .models import (
+    AssetVaRRecord,
+    RealizedPnLRecord,
+    RiskMeasureRecord,
+    ScenarioDistributionRecord,
+    ScenarioVectorRecord,
+    VaRSnapshot,
+    VaRTimeSeriesRecord,
+)
+
+
+def timeseries_window_stmt(ric: str, days: int) -> Select[tuple[VaRTimeSeriesRecord]]:
+    """Latest ``days`` points for ``ric``, newest first (index range scan on ric, point_date)."""
+
+    return (
+        select(VaRTimeSeriesRecord)
+        .where(VaRTimeSeriesRecord.ric == ric)
+        .order_by(desc(VaRTimeSeriesRecord.point_date))
+        .limit(days)
+    )
+
+
+def timeseries_batch_stmt(rics: Sequence[str], days: int) -> Select[tuple[str, date, float]]:
+    """Latest ``days`` points per RIC via ``ROW_NUMBER()`` in a single statement."""
+
+    ranked = (
+        select(
+            VaRTimeSeriesRecord.ric,
+            VaRTimeSeriesRecord.point_date,
+            VaRTimeSeriesRecord.value,
+            func.row_number()
+            .over(partition_by=VaRTimeSeriesRecord.ric, order_by=desc(VaRTimeSeriesRecord.point_date))
+            .label("rank"),
+        )
+        .where(VaRTimeSeriesRecord.ric.in_(rics))
+        .subquery()
+    )
+    return select(ranked.c.ric, ranked.c.point_date, ranked.c.value).where(ranked.c.rank <= days)
+
+
+def risk_measures_stmt(snapshot_id: int, rics: Sequence[str] | None = None) -> Select[tuple[RiskMeasureRecord]]:
+    """VaR/ES levels and horizons of a snapshot (optionally only ``rics``), in index order."""
+
+    stmt = select(RiskMeasureRecord).where(RiskMeasureRecord.snapshot_id == snapshot_id)
+    if rics is not None:
+        stmt = stmt.where(RiskMeasureRecord.ric.in_(rics))
+    return stmt.order_by(RiskMeasureRecord.ric, RiskMeasureRecord.horizon_days, RiskMeasureRecord.confidence)
+
+
+def snapshot_assets_stmt(snapshot_id: int, rics: Sequence[str] | None = None) -> Select[tuple[AssetVaRRecord]]:
+    """Asset rows of a snapshot via the (snapshot_id, ric) index.
+
+    All rows come back in load order; a ``rics`` subset is unordered (callers rank it).
+    """
+
+    stmt = select(AssetVaRRecord).where(AssetVaRRecord.snapshot_id == snapshot_id)
+    if rics is not None:
+        return stmt.where(AssetVaRRecord.ric.in_(rics))
+    return stmt.order_by(AssetVaRRecord.id)
+
+
+def snapshot_rics_stmt(as_of: date) -> Select[tuple[str]]:
+    """RICs held in the ``as_of`` snapshot, in RIC order."""
+
+    return (
+        select(AssetVaRRecord.ric)
+        .join(VaRSnapshot, AssetVaRRecord.snapshot_id == VaRSnapshot.id)
+        .where(VaRSnapshot.as_of == as_of)
+        .order_by(AssetVaRRecord.ric)
+    )
+
+
+def snapshot_categories_stmt(as_of: date) -> Select[tuple[str, str]]:
+    """``(ric, category)`` of the ``as_of`` snapshot, in the same RIC order as :func:`snapshot_rics_stmt`."""
+
+    return (
+        select(AssetVaRRecord.ric, AssetVaRRecord.category)
+        .join(VaRSnapshot, AssetVaRRecord.snapshot_id == VaRSnapshot.id)
+        .where(VaRSnapshot.as_of == as_of)
+        .order_by(AssetVaRRecord.ric)
+    )
+
+
+def snapshot_positions_stmt(as_of: date) -> Select[tuple[str, float]]:
+    """``(ric, position)`` of the ``as_of`` snapshot, in the same RIC order as :func:`snapshot_rics_stmt`."""
+
+    return (
+        select(AssetVaRRecord.ric, AssetVaRRecord.position)
+        .join(VaRSnapshot, AssetVaRRecord.snapshot_id == VaRSnapshot.id)
+        .where(VaRSnapshot.as_of == as_of)
+        .order_by(AssetVaRRecord.ric)
+    )
+
+
+def realized_dates_stmt(days: int) -> Select[tuple[date]]:
+    """Latest ``days`` realised P/L dates, newest first, read from the portfolio series' index range."""
+
+    return (
+        select(RealizedPnLRecord.pnl_date)
+        .where(RealizedPnLRecord.ric == PORTFOLIO_AGGREGATE_RIC)
+        .order_by(desc(RealizedPnLRecord.pnl_date))
+        .limit(days)
+    )
+
+
+def realized_pnl_stmt(start: date, end: date, rics: Sequence[str] | None = None) -> Select[tuple[str, date, float]]:
+    """Realised P/L rows between ``start`` and ``end`` (inclusive), optionally for ``rics`` only."""
+
+    stmt = select(RealizedPnLRecord.ric, RealizedPnLRecord.pnl_date, RealizedPnLRecord.pnl).where(
+        RealizedPnLRecord.pnl_date.between(start, end)
+    )
+    return stmt.where(RealizedPnLRecord.ric.in_(rics)) if rics is not None else stmt
+
+
+def var_forecasts_stmt(start: date, end: date, rics: Sequence[str] | None = None) -> Select[tuple[str, date, float]]:
+    """Stored VaR series values between ``start`` and ``end`` (inclusive), optionally for ``rics`` only."""
+
+    stmt = select(VaRTimeSeriesRecord.ric, VaRTimeSeriesRecord.point_date, VaRTimeSeriesRecord.value).where(
+        VaRTimeSeriesRecord.point_date.between(start, end)
+    )
+    return stmt.where(VaRTimeSeriesRecord.ric.in_(rics)) if rics is not None else stmt
+
+
+def scenario_rows_stmt(ric: str) -> Select[tuple[float]]:
+    """Row-mode lookup, served by the (ric, scenario_index) index without a sort."""
+
+    return (
+        select(ScenarioDistributionRecord.value)
+        .where(ScenarioDistributionRecord.ric == ric)
+        .order_by(ScenarioDistributionRecord.scenario_index)
+    )
+
+
+def scenario_vector_stmt(ric: str, as_of: date) -> Select[tuple[bytes]]:
+    """Columnar lookup, served by the (ric, as_of) unique constraint."""
+
+    return select(ScenarioVectorRecord.payload).where(
+        ScenarioVectorRecord.ric == ric,
+        ScenarioVectorRecord.as_of == as_of,
+    )
@@ -0,0 +1,31 @@
+"""``RiskMeasureRecord`` rows shared by the loaders, the backfill and the API."""
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+from ..core.constants import REPORTED_HORIZON_DAYS
+from ..engine import TailMeasures
+
+
+def risk_measure_rows(
+    snapshot_id: int, rics: Sequence[str], measures: TailMeasures
+) -> Iterator[dict[str, Any]]:
+    """Yield ``RiskMeasureRecord`` rows for every RIC, level and reported horizon.
+
+    ``measures`` holds one-day figures whose rows follow ``rics``; longer
+    horizons are square-root-of-time scaled.
+    """
+
+    for horizon_days in REPORTED_HORIZON_DAYS:
+        scaled = measures.scaled_to(horizon_days)
+        for ric, var_row, es_row in zip(rics, scaled.var.round(3).tolist(), scaled.es.round(3).tolist()):
+            for confidence, var, es in zip(scaled.confidences, var_row, es_row):
+                yield {
+                    "snapshot_id": snapshot_id,
+                    "ric": ric,
+                    "confidence": confidence,
+                    "horizon_days": horizon_days,
+                    "var": var,
+                    "expected_shortfall": es,
+                }
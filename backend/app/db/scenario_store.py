@@ -0,0 +1,147 @@
+"""Scenario P/L vector storage in columnar (blob) or legacy row-per-scenario form."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import date
+
+import numpy as np
+from numpy.typing import ArrayLike
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from .bulk import BulkLoadReport, bulk_insert
+from .models import ScenarioDistributionRecord, ScenarioVectorRecord, VaRSnapshot
+from .notifications import mark_scenarios_written
+from .queries import scenario_rows_stmt, scenario_vector_stmt
+
+SCENARIO_DTYPE = np.dtype("<f8")
+
+
+def encode_vector(values: ArrayLike) -> bytes:
+    """Serialise a scenario vector into a contiguous float64 blob."""
+
+    return np.ascontiguousarray(values, dtype=SCENARIO_DTYPE).tobytes()
+
+
+def decode_vector(payload: bytes) -> np.ndarray:
+    """Return a read-only float64 view over a stored blob (no copy)."""
+
+    return np.frombuffer(payload, dtype=SCENARIO_DTYPE)
+
+
+def uses_columnar_storage() -> bool:
+    """Return whether scenario vectors are stored as blobs (``SCENARIO_STORAGE``)."""
+
+    return settings.scenario_storage == "columnar"
+
+
+def save_scenario_vectors(session: Session, as_of: date, vectors: Mapping[str, ArrayLike]) -> BulkLoadReport:
+    """Persist one scenario vector per RIC for ``as_of``, replacing existing data."""
+
+    mark_scenarios_written(session, as_of, vectors)
+    if uses_columnar_storage():
+        session.execute(
+            delete(ScenarioVectorRecord).where(
+                ScenarioVectorRecord.as_of == as_of,
+                ScenarioVectorRecord.ric.in_(list(vectors)),
+            )
+        )
+        return bulk_insert(
+            session,
+            ScenarioVectorRecord,
+            (
+                {"ric": ric, "as_of": as_of, "length": len(values), "payload": encode_vector(values)}
+                for ric, values in vectors.items()
+            ),
+        )
+
+    session.execute(delete(ScenarioDistributionRecord).where(ScenarioDistributionRecord.ric.in_(list(vectors))))
+    return bulk_insert(
+        session,
+        ScenarioDistributionRecord,
+        (
+            {"ric": ric, "scenario_index": idx, "value": value}
+            for ric, values in vectors.items()
+            for idx, value in enumerate(np.asarray(values, dtype=SCENARIO_DTYPE).tolist())
+        ),
+    )
+
+
+def latest_scenario_date(session: Session) -> date | None:
+    """Return the most recent as_of with stored scenario vectors.
+
+    Row storage keeps a single window, that of the latest snapshot.
+    """
+
+    if not uses_columnar_storage():
+        if session.scalar(select(ScenarioDistributionRecord.id).limit(1)) is None:
+            return None
+        return session.scalar(select(func.max(VaRSnapshot.as_of)))
+    return session.scalar(select(func.max(ScenarioVectorRecord.as_of)))
+
+
+def _is_stored_row_window(session: Session, as_of: date | None) -> bool:
+    """Whether row storage holds the window of ``as_of`` (``None`` means the latest)."""
+
+    return as_of is None or as_of == latest_scenario_date(session)
+
+
+def load_scenario_vector(session: Session, ric: str, as_of: date | None = None) -> np.ndarray | None:
+    """Load one RIC's scenario vector with a single read; ``None`` when missing.
+
+    Row storage only has the latest snapshot's window, so any other ``as_of``
+    is missing in that mode.
+    """
+
+    if not uses_columnar_storage():
+        if not _is_stored_row_window(session, as_of):
+            return None
+        values = session.scalars(scenario_rows_stmt(ric)).all()
+        return np.asarray(values, dtype=SCENARIO_DTYPE) if values else None
+
+    as_of = as_of or latest_scenario_date(session)
+    if as_of is None:
+        return None
+    payload = session.scalar(scenario_vector_stmt(ric, as_of))
+    return None if payload is None else decode_vector(payload)
+
+
+def load_scenario_matrix(
+    session: Session,
+    rics: Iterable[str],
+    as_of: date | None = None,
+) -> np.ndarray:
+    """Load the RICs x scenarios matrix in the requested RIC order.
+
+    Raises ``KeyError`` naming the first RIC without stored scenarios (every
+    RIC for a past ``as_of`` in row storage, which keeps only the latest window).
+    """
+
+    rics = list(rics)
+    vectors: dict[str, np.ndarray] = {}
+    if not uses_columnar_storage():
+        if _is_stored_row_window(session, as_of):
+            stmt = (
+                select(ScenarioDistributionRecord.ric, ScenarioDistributionRecord.value)
+                .where(ScenarioDistributionRecord.ric.in_(rics))
+                .order_by(ScenarioDistributionRecord.ric, ScenarioDistributionRecord.scenario_index)
+            )
+            grouped: dict[str, list[float]] = {}
+            for ric, value in session.execute(stmt):
+                grouped.setdefault(ric, []).append(value)
+            vectors = {ric: np.asarray(values, dtype=SCENARIO_DTYPE) for ric, values in grouped.items()}
+    else:
+        as_of = as_of or latest_scenario_date(session)
+        stmt = select(ScenarioVectorRecord.ric, ScenarioVectorRecord.payload).where(
+            ScenarioVectorRecord.as_of == as_of,
+            ScenarioVectorRecord.ric.in_(rics),
+        )
+        vectors = {ric: decode_vector(payload) for ric, payload in session.execute(stmt)}
+
+    missing = [ric for ric in rics if ric not in vectors]
+    if missing:
+        raise KeyError(missing[0])
+    if not rics:
+        return np.empty((0, 0), dtype=SCENARIO_DTYPE)
+    return np.vstack([vectors[ric] for ric in rics])
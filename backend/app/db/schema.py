@@ -0,0 +1,185 @@
+"""Schema and data version bookkeeping used for fast warm starts."""
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from threading import Event, Thread
+from time import sleep, time
+from uuid import uuid4
+
+from sqlalchemy import ColumnElement, delete, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from .base import Base
+from .models import SchemaMetaRecord, VaRSnapshot
+from .notifications import mark_data_version
+from .session import SessionLocal, engine
+
+# Bump whenever the ORM models change and add the matching step to app.db.migrations.
+SCHEMA_VERSION = 8
+
+SCHEMA_VERSION_KEY = "schema_version"
+DATA_VERSION_KEY = "data_version"
+INIT_LOCK_KEY = "init_lock"
+# Key of the PostgreSQL advisory lock that stands in for the lock row there.
+INIT_ADVISORY_LOCK_ID = 0x7661725F696E6974
+
+logger = logging.getLogger(__name__)
+
+
+def read_meta(session: Session, key: str) -> str | None:
+    record = session.get(SchemaMetaRecord, key)
+    return record.value if record else None
+
+
+def write_meta(session: Session, key: str, value: str) -> None:
+    session.merge(SchemaMetaRecord(key=key, value=value))
+
+
+def get_data_version(session: Session) -> int:
+    """Return the data version (0 when nothing has been loaded yet)."""
+
+    value = read_meta(session, DATA_VERSION_KEY)
+    return int(value) if value else 0
+
+
+def bump_data_version(session: Session) -> int:
+    """Increment the data version inside the caller's transaction.
+
+    Loaders call this whenever they write snapshot data so readers (and other
+    processes) can tell cached results apart from fresh ones.
+    """
+
+    version = get_data_version(session) + 1
+    write_meta(session, DATA_VERSION_KEY, str(version))
+    mark_data_version(session, version)
+    return version
+
+
+def database_state() -> tuple[int | None, bool]:
+    """Return ``(schema_version, has_snapshot_data)`` using a single connection."""
+
+    with SessionLocal() as session:
+        inspector = inspect(session.connection())
+        value = read_meta(session, SCHEMA_VERSION_KEY) if inspector.has_table(SchemaMetaRecord.__tablename__) else None
+        has_data = inspector.has_table(VaRSnapshot.__tablename__) and (
+            session.scalar(select(VaRSnapshot.id).limit(1)) is not None
+        )
+        return (int(value) if value else None), has_data
+
+
+def reset_schema() -> None:
+    """Drop and recreate every application table, then stamp SCHEMA_VERSION.
+
+    ``schema_meta`` survives so a held initialisation lock is not lost and the
+    data version keeps increasing across rebuilds (cache keys never repeat).
+    """
+
+    data_tables = [table for table in Base.metadata.sorted_tables if table.name != SchemaMetaRecord.__tablename__]
+    Base.metadata.drop_all(bind=engine, tables=data_tables)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal.begin() as session:
+        write_meta(session, SCHEMA_VERSION_KEY, str(SCHEMA_VERSION))
+        bump_data_version(session)
+
+
+def _create_meta_table() -> None:
+    try:
+        SchemaMetaRecord.__table__.create(bind=engine, checkfirst=True)
+    except (OperationalError, ProgrammingError):
+        # Another worker created it between the existence check and CREATE TABLE.
+        if not inspect(engine).has_table(SchemaMetaRecord.__tablename__):
+            raise
+
+
+@contextmanager
+def initialisation_lock(timeout: float = 120.0, poll_interval: float = 0.25) -> Iterator[None]:
+    """Serialise schema/seed work across workers.
+
+    PostgreSQL uses a session-level advisory lock, which the server releases
+    when the holder's connection dies. Other backends insert a lock row into
+    ``schema_meta`` (the primary key makes the insert atomic) stamped with its
+    acquisition time. The holder refreshes the stamp every ``timeout / 4``
+    seconds, and waiters take the lock over only once the stamp is older than
+    ``timeout`` (e.g. left by a crashed worker).
+    """
+
+    if engine.dialect.name == "postgresql":
+        with _advisory_lock():
+            yield
+        return
+
+    _create_meta_table()
+    token = f"{os.getpid()}-{uuid4().hex}"
+    while not _try_lock_row(token, timeout):
+        sleep(poll_interval)
+    stop = Event()
+    heartbeat = Thread(target=_refresh_lock_row, args=(token, timeout / 4, stop), daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        heartbeat.join()
+        with SessionLocal.begin() as session:
+            session.execute(delete(SchemaMetaRecord).where(_lock_row_of(token)))
+
+
+@contextmanager
+def _advisory_lock() -> Iterator[None]:
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INIT_ADVISORY_LOCK_ID})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_ADVISORY_LOCK_ID})
+            connection.commit()
+
+
+def _lock_value(token: str) -> str:
+    return f"{token} {time():.3f}"
+
+
+def _lock_row_of(token: str) -> ColumnElement[bool]:
+    return (SchemaMetaRecord.key == INIT_LOCK_KEY) & SchemaMetaRecord.value.startswith(f"{token} ", autoescape=True)
+
+
+def _try_lock_row(token: str, timeout: float) -> bool:
+    """Insert the lock row, first deleting it if its stamp is older than ``timeout``."""
+
+    try:
+        with SessionLocal.begin() as session:
+            session.add(SchemaMetaRecord(key=INIT_LOCK_KEY, value=_lock_value(token)))
+        return True
+    except IntegrityError:
+        pass
+    with SessionLocal.begin() as session:
+        held = read_meta(session, INIT_LOCK_KEY)
+        if held is None:
+            return False
+        try:
+            acquired = float(held.rsplit(" ", 1)[-1])
+        except ValueError:
+            # Rows written before stamps were stored are from a finished or dead worker.
+            acquired = 0.0
+        if time() - acquired <= timeout:
+            return False
+        logger.warning("initialisation lock %r is older than %.0fs; taking it over", held, timeout)
+        # Delete only the row we judged stale, in case its holder refreshed it meanwhile.
+        session.execute(
+            delete(SchemaMetaRecord).where(SchemaMetaRecord.key == INIT_LOCK_KEY, SchemaMetaRecord.value == held)
+        )
+    return False
+
+
+def _refresh_lock_row(token: str, interval: float, stop: Event) -> None:
+    while not stop.wait(interval):
+        try:
+            with SessionLocal.begin() as session:
+                session.execute(update(SchemaMetaRecord).where(_lock_row_of(token)).values(value=_lock_value(token)))
+        except OperationalError:
+            logger.warning("could not refresh the initialisation lock; retrying", exc_info=True)
@@ -1,26 +1,41 @@
 """Database initialisation and demo seed data."""
 from __future__ import annotations
 
+import logging
 from datetime import date, datetime, timedelta
 from math import sin
-from random import Random
-from typing import Any
+from typing import Any, Sequence
 
-from sqlalchemy import select
+import numpy as np
 from sqlalchemy.orm import Session
 
-from ..core.constants import PORTFOLIO_AGGREGATE_RIC, SCENARIO_WINDOW
-from .base import Base
+from ..core.config import settings
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC, SCENARIO_WINDOW, VAR_CONFIDENCE
+from ..engine import IncrementalVaREngine, compute_tail_measures, euler_allocation, round_to_total
+from .aggregates import DRIVER_FIELDS, SnapshotAggregates
+from .bulk import bulk_insert
+from .ewma_store import save_ewma_states
+from .migrations import SchemaMigrationError, migrate_schema
 from .models import (
     AssetVaRRecord,
     DriverCommentaryRecord,
     MarketSignalRecord,
     NewsRecord,
-    ScenarioDistributionRecord,
+    RealizedPnLRecord,
+    RiskMeasureRecord,
     VaRSnapshot,
     VaRTimeSeriesRecord,
 )
-from .session import SessionLocal, engine
+from .risk_measures import risk_measure_rows
+from .scenario_store import save_scenario_vectors, uses_columnar_storage
+from .schema import (
+    SCHEMA_VERSION,
+    bump_data_version,
+    database_state,
+    initialisation_lock,
+    reset_schema,
+)
+from .session import SessionLocal
 
 ASSET_DEFINITIONS = [
     {"ric": "JP_EQ_LARGE", "name": "日本株式（大型）", "category": "株式", "base_amount": 10.8, "volatility": 0.35},
@@ -45,15 +60,18 @@ ASSET_DEFINITIONS = [
     {"ric": "GOLD", "name": "金（ロング）", "category": "コモディティ", "base_amount": 2.8, "volatility": 0.2},
 ]
 
-CONTRIBUTION_PROFILES = {
-    "株式": {"window_drop": 0.28, "window_add": 0.12, "position_change": 0.35, "ranking_shift": 0.25},
-    "金利": {"window_drop": 0.22, "window_add": 0.25, "position_change": 0.28, "ranking_shift": 0.25},
-    "クレジット": {"window_drop": 0.26, "window_add": 0.14, "position_change": 0.30, "ranking_shift": 0.30},
-    "モーゲージ": {"window_drop": 0.24, "window_add": 0.16, "position_change": 0.32, "ranking_shift": 0.28},
-    "コモディティ": {"window_drop": 0.25, "window_add": 0.20, "position_change": 0.25, "ranking_shift": 0.30},
-}
+logger = logging.getLogger(__name__)
 
 SNAPSHOT_DAYS = 5
+TIMESERIES_DAYS = 121
+
+SCENARIO_SEED = 20240401
+# Student-t degrees of freedom of simulated realised P/L; fat tails give a few more 99% VaR breaches.
+REALIZED_PNL_DF = 5
+MARKET_FACTOR_LOADING = 0.8
+CATEGORY_FACTOR_LOADING = 0.45
+# 99% one-sided normal quantile; scales unit shocks so standalone VaR sits near base_amount.
+STANDARD_NORMAL_Q99 = 2.326
 
 DRIVER_LABELS = {
     "window_drop": "離脱要因",
@@ -127,51 +145,143 @@ NEWS_TEMPLATES = [
 
 
 def init_db() -> None:
-    """Reset schema and seed demo data."""
+    """Reset schema and seed demo data (the explicit ``python -m app.db.seed`` command)."""
 
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    reset_schema()
     with SessionLocal() as session:
         seed_demo_data(session)
 
 
-def seed_demo_data(session: Session) -> None:
+def ensure_db(seed_if_empty: bool | None = None) -> None:
+    """Prepare the database for serving without discarding current data.
+
+    A warm start only reads the schema/data versions. A stale schema is
+    upgraded in place by :func:`~app.db.migrations.migrate_schema`; a schema
+    it cannot upgrade stops startup unless ``RESET_SCHEMA_ON_MISMATCH`` is set.
+    Demo data is seeded only into a database that never held snapshots
+    (``SEED_ON_STARTUP``). Concurrent workers serialise on
+    :func:`initialisation_lock` and re-check once they hold it.
+    """
+
+    if seed_if_empty is None:
+        seed_if_empty = settings.seed_on_startup
+
+    def is_ready() -> bool:
+        schema_version, has_data = database_state()
+        return schema_version == SCHEMA_VERSION and (has_data or not seed_if_empty)
+
+    if is_ready():
+        return
+    with initialisation_lock():
+        if is_ready():
+            return
+        schema_version, has_data = database_state()
+        if schema_version is None and not has_data:
+            reset_schema()
+        elif schema_version != SCHEMA_VERSION:
+            _upgrade_schema(schema_version)
+        if seed_if_empty and not has_data:
+            with SessionLocal() as session:
+                seed_demo_data(session)
+
+
+def _upgrade_schema(schema_version: int | None) -> None:
+    try:
+        if schema_version is None:
+            raise SchemaMigrationError("database holds snapshots but has no schema version")
+        migrate_schema(schema_version)
+    except SchemaMigrationError as exc:
+        if not settings.reset_schema_on_mismatch:
+            raise SchemaMigrationError(
+                f"{exc}; set RESET_SCHEMA_ON_MISMATCH=true to drop every table (stored data is lost)"
+            ) from exc
+        logger.warning("%s; dropping every table (RESET_SCHEMA_ON_MISMATCH)", exc)
+        reset_schema()
+
+
+def seed_demo_data(
+    session: Session,
+    assets: Sequence[dict[str, Any]] = ASSET_DEFINITIONS,
+    snapshot_days: int = SNAPSHOT_DAYS,
+    window: int = SCENARIO_WINDOW,
+    timeseries_days: int = TIMESERIES_DAYS,
+) -> None:
+    """Seed snapshots, market context, time series and scenario windows.
+
+    The defaults reproduce the demo dataset; production-sized data comes from
+    :mod:`app.db.synthetic` instead.
+    """
+
     today = date.today()
-    as_of_dates = sorted({today - timedelta(days=offset) for offset in range(SNAPSHOT_DAYS)}, reverse=False)
+    series_days = max(timeseries_days, snapshot_days)
+    series_dates = [today - timedelta(days=offset) for offset in range(series_days - 1, -1, -1)]
+    as_of_dates = series_dates[len(series_dates) - snapshot_days :]
+    # Column ``c`` of the history closes the window of ``series_dates[c]``; one
+    # extra leading day gives the first date a previous window to explain against.
+    scenario_history = _build_scenario_history(window + len(series_dates), assets)
+    first = len(series_dates) - len(as_of_dates)
+    rics = [definition["ric"] for definition in assets]
+    opening_positions = _position_scales(as_of_dates[0] - timedelta(days=1), assets)
+    trackers = IncrementalVaREngine(
+        dict(zip(rics, scenario_history[:, first : first + window])),
+        positions=dict(zip(rics, opening_positions.tolist())),
+    )
 
-    prev_amounts = {definition["ric"]: definition["base_amount"] for definition in ASSET_DEFINITIONS}
+    prev_amounts = trackers.current_var()
     prev_portfolio_total = None
     daily_contexts: list[dict[str, Any]] = []
-
-    for as_of in as_of_dates:
-        asset_records: list[AssetVaRRecord] = []
+    scenario_windows: dict[date, np.ndarray] = {}
+    asset_rows: list[dict[str, Any]] = []
+    measure_rows: list[dict[str, Any]] = []
+
+    for day_index, as_of in enumerate(as_of_dates):
+        positions = _position_scales(as_of, assets)
+        column = first + day_index
+        attributions = trackers.roll(
+            dict(zip(rics, scenario_history[:, window + column].tolist())),
+            dict(zip(rics, positions.tolist())),
+        )
+        pnl = scenario_history[:, column + 1 : column + 1 + window] * positions[:, None]
+        # Every level and the portfolio row come out of a single partition.
+        measures = compute_tail_measures(np.vstack([pnl, pnl.sum(axis=0)]))
+        var_at_confidence, _ = measures.at(VAR_CONFIDENCE)
+        allocation = euler_allocation(pnl, positions)
+        components = round_to_total(allocation.component_var)
+        scenario_windows[as_of] = pnl
+
+        snapshot_rows: list[dict[str, Any]] = []
         sum_amount = 0.0
-        for idx, definition in enumerate(ASSET_DEFINITIONS):
-            drift = sin((as_of.toordinal() + idx * 13) / 5) * definition["volatility"]
-            amount = round(definition["base_amount"] + drift, 2)
-            prev_amount = prev_amounts.get(definition["ric"], amount)
-            change_amount = round(amount - prev_amount, 2)
-            change_pct = round((change_amount / prev_amount * 100) if prev_amount else 0.0, 2)
-            prev_amounts[definition["ric"]] = amount
-
-            contributions = _build_contributions(definition["category"], change_amount)
-            record = AssetVaRRecord(
-                ric=definition["ric"],
-                name=definition["name"],
-                category=definition["category"],
-                amount=amount,
-                change_amount=change_amount,
-                change_pct=change_pct,
-                window_drop_contribution=contributions["window_drop"],
-                window_add_contribution=contributions["window_add"],
-                position_change_contribution=contributions["position_change"],
-                ranking_shift_contribution=contributions["ranking_shift"],
+        for idx, definition in enumerate(assets):
+            var = float(var_at_confidence[idx])
+            prev_var = prev_amounts[definition["ric"]]
+            amount = round(var, 2)
+            change_amount = round(var - prev_var, 2)
+            change_pct = round(((var - prev_var) / prev_var * 100) if prev_var else 0.0, 2)
+            prev_amounts[definition["ric"]] = var
+
+            attribution = attributions[definition["ric"]]
+            snapshot_rows.append(
+                {
+                    "ric": definition["ric"],
+                    "name": definition["name"],
+                    "category": definition["category"],
+                    "amount": amount,
+                    "change_amount": change_amount,
+                    "change_pct": change_pct,
+                    "window_drop_contribution": round(attribution.window_drop, 3),
+                    "window_add_contribution": round(attribution.window_add, 3),
+                    "position_change_contribution": round(attribution.position_change, 3),
+                    "ranking_shift_contribution": round(attribution.ranking_shift, 3),
+                    "component_var": float(components[idx]),
+                    "marginal_var": round(float(allocation.marginal_var[idx]), 4),
+                    "position": float(positions[idx]),
+                    "diversification_benefit": round(amount - float(components[idx]), 2),
+                }
             )
-            asset_records.append(record)
             sum_amount += amount
 
-        diversification_effect = round(sum_amount * -0.18, 2)
-        portfolio_total = round(sum_amount + diversification_effect, 2)
+        portfolio_total = round(float(var_at_confidence[-1]), 2)
+        diversification_effect = round(portfolio_total - sum_amount, 2)
         if prev_portfolio_total is None:
             portfolio_change_amount = 0.0
             portfolio_change_pct = 0.0
@@ -183,53 +293,99 @@ def seed_demo_data(session: Session) -> None:
             )
         prev_portfolio_total = portfolio_total
 
+        aggregates = SnapshotAggregates().add(
+            rics,
+            [row["category"] for row in snapshot_rows],
+            [row["amount"] for row in snapshot_rows],
+            [[row[f"{name}_contribution"] for name in DRIVER_FIELDS] for row in snapshot_rows],
+        )
         snapshot = VaRSnapshot(
             as_of=as_of,
             portfolio_total=portfolio_total,
             portfolio_change_amount=portfolio_change_amount,
             portfolio_change_pct=portfolio_change_pct,
             diversification_effect=diversification_effect,
+            **aggregates.columns(),
         )
-        snapshot.assets = asset_records
         session.add(snapshot)
-        driver_totals = _aggregate_driver_totals(asset_records)
-        leading_asset_record = max(asset_records, key=lambda record: record.amount, default=None)
+        session.flush()
+        for row in snapshot_rows:
+            row["snapshot_id"] = snapshot.id
+        asset_rows.extend(snapshot_rows)
+        measure_rows.extend(risk_measure_rows(snapshot.id, [*rics, PORTFOLIO_AGGREGATE_RIC], measures))
+        driver_totals = aggregates.driver_dict()
+        leading_asset_row = max(snapshot_rows, key=lambda row: row["amount"], default=None)
         daily_contexts.append(
             {
                 "as_of": as_of,
                 "driver_totals": driver_totals,
-                "leading_asset": leading_asset_record.name if leading_asset_record else "主要資産",
-                "leading_category": leading_asset_record.category if leading_asset_record else "ポートフォリオ",
+                "leading_asset": leading_asset_row["name"] if leading_asset_row else "主要資産",
+                "leading_category": leading_asset_row["category"] if leading_asset_row else "ポートフォリオ",
                 "portfolio_change_pct": portfolio_change_pct,
                 "portfolio_total": portfolio_total,
                 "diversification_effect": diversification_effect,
             }
         )
 
-    session.flush()
-    news_map = _seed_news(session, as_of_dates)
-    _seed_market_signals(session, daily_contexts)
-    _seed_driver_commentaries(session, daily_contexts, news_map)
-    _seed_timeseries(session, today)
-    _seed_scenario_distribution(session)
+    bulk_insert(session, AssetVaRRecord, asset_rows)
+    bulk_insert(session, RiskMeasureRecord, measure_rows)
+    seed_market_context(session, daily_contexts)
+    levels = _var_levels(scenario_history, series_dates, assets, window)
+    _seed_timeseries(session, series_dates[-timeseries_days:], rics, levels[:, -timeseries_days:])
+    _seed_scenario_vectors(session, scenario_windows, assets)
+    bump_data_version(session)
     session.commit()
 
 
-def _build_contributions(category: str, change_amount: float) -> dict[str, float]:
-    profile = CONTRIBUTION_PROFILES.get(category, CONTRIBUTION_PROFILES["株式"])
-    if change_amount == 0:
-        return {key: 0.0 for key in profile}
-    return {key: round(change_amount * weight, 3) for key, weight in profile.items()}
+def seed_market_context(session: Session, contexts: list[dict[str, Any]]) -> None:
+    """Write news, market signals and driver commentary for each snapshot context.
+
+    A context carries ``as_of``, ``driver_totals``, ``leading_asset``,
+    ``leading_category``, ``portfolio_change_pct``, ``portfolio_total`` and
+    ``diversification_effect``.
+    """
 
+    news_map = _seed_news(session, [context["as_of"] for context in contexts])
+    _seed_market_signals(session, contexts)
+    _seed_driver_commentaries(session, contexts, news_map)
 
-def _aggregate_driver_totals(records: list[AssetVaRRecord]) -> dict[str, float]:
-    totals = {key: 0.0 for key in DRIVER_LABELS}
-    for record in records:
-        totals["window_drop"] += record.window_drop_contribution
-        totals["window_add"] += record.window_add_contribution
-        totals["position_change"] += record.position_change_contribution
-        totals["ranking_shift"] += record.ranking_shift_contribution
-    return {key: round(value, 3) for key, value in totals.items()}
+
+def _build_scenario_history(length: int, assets: Sequence[dict[str, Any]]) -> np.ndarray:
+    """Return an assets x days P/L history driven by market and category factors.
+
+    Each snapshot reads a SCENARIO_WINDOW slice of this history, so consecutive
+    snapshots share all but one scenario like a real rolling window.
+    """
+
+    rng = np.random.default_rng(SCENARIO_SEED)
+    base = np.array([definition["base_amount"] for definition in assets])
+    volatility = np.array([definition["volatility"] for definition in assets])
+    categories = sorted({definition["category"] for definition in assets})
+    category_index = np.array([categories.index(definition["category"]) for definition in assets])
+
+    market = rng.standard_normal(length)
+    category_factors = rng.standard_normal((len(categories), length))
+    idiosyncratic = rng.standard_normal((len(assets), length))
+    idiosyncratic_loading = np.sqrt(1.0 - MARKET_FACTOR_LOADING**2 - CATEGORY_FACTOR_LOADING**2)
+    shocks = (
+        MARKET_FACTOR_LOADING * market
+        + CATEGORY_FACTOR_LOADING * category_factors[category_index]
+        + idiosyncratic_loading * idiosyncratic
+    )
+
+    drift_amplitude = np.maximum(0.2, volatility * 0.35)
+    seasonal = np.sin((np.arange(length) + base[:, None]) / 32) * drift_amplitude[:, None]
+    scale = base / STANDARD_NORMAL_Q99
+    return np.round(scale[:, None] * (shocks - seasonal * 0.1), 3)
+
+
+def _position_scales(as_of: date, assets: Sequence[dict[str, Any]]) -> np.ndarray:
+    """Return per-asset position multipliers that drift smoothly day to day."""
+
+    offsets = np.arange(len(assets)) * 13
+    base = np.array([definition["base_amount"] for definition in assets])
+    volatility = np.array([definition["volatility"] for definition in assets])
+    return 1.0 + np.sin((as_of.toordinal() + offsets) / 5) * volatility / base
 
 
 def _seed_market_signals(session: Session, contexts: list[dict[str, Any]]) -> None:
@@ -365,98 +521,70 @@ def _seed_news(session: Session, as_of_dates: list[date]) -> dict[date, list[dic
     return grouped
 
 
-def _seed_timeseries(session: Session, today: date) -> None:
-    offsets = list(range(120, -1, -1))
-    portfolio_buckets = {offset: 0.0 for offset in offsets}
-
-    for definition in ASSET_DEFINITIONS:
-        points: list[VaRTimeSeriesRecord] = []
-        base = definition["base_amount"]
-        for offset in offsets:
-            point_date = today - timedelta(days=offset)
-            value = round(base + sin((offset + len(definition["ric"])) / 4) * definition["volatility"] * 3, 3)
-            change = None
-            if points:
-                change = round(value - points[-1].value, 3)
-            points.append(
-                VaRTimeSeriesRecord(
-                    ric=definition["ric"],
-                    point_date=point_date,
-                    value=value,
-                    change=change,
-                )
-            )
-            portfolio_buckets[offset] += value
-        session.add_all(points)
-
-    portfolio_points: list[VaRTimeSeriesRecord] = []
-    prev_value = None
-    for offset in offsets:
-        point_date = today - timedelta(days=offset)
-        standalone = portfolio_buckets[offset]
-        portfolio_value = round(standalone * 0.82, 3)
-        change = None if prev_value is None else round(portfolio_value - prev_value, 3)
-        portfolio_points.append(
-            VaRTimeSeriesRecord(
-                ric=PORTFOLIO_AGGREGATE_RIC,
-                point_date=point_date,
-                value=portfolio_value,
-                change=change,
-            )
-        )
-        prev_value = portfolio_value
+def _var_levels(
+    history: np.ndarray, dates: Sequence[date], assets: Sequence[dict[str, Any]], window: int
+) -> np.ndarray:
+    """Return the (assets + portfolio) x dates VaR of each date's window, computed like the snapshots."""
 
-    session.add_all(portfolio_points)
+    levels = np.empty((len(assets) + 1, len(dates)))
+    for column, as_of in enumerate(dates):
+        pnl = history[:, column + 1 : column + 1 + window] * _position_scales(as_of, assets)[:, None]
+        levels[:, column] = compute_tail_measures(np.vstack([pnl, pnl.sum(axis=0)])).at(VAR_CONFIDENCE)[0]
+    return levels
 
 
-def _seed_scenario_distribution(session: Session) -> None:
-    rng_cache: dict[str, Random] = {}
-    portfolio_accumulator = [0.0 for _ in range(SCENARIO_WINDOW)]
-    records: list[ScenarioDistributionRecord] = []
+def _seed_timeseries(session: Session, dates: Sequence[date], rics: Sequence[str], levels: np.ndarray) -> None:
+    """Write the VaR series of every RIC and the portfolio (last row of ``levels``) and their realised P/L."""
 
-    for definition in ASSET_DEFINITIONS:
-        generator = rng_cache.setdefault(
-            definition["ric"], Random(sum(ord(ch) for ch in definition["ric"]))
+    values = np.round(levels, 3)
+    changes = np.round(np.diff(values, axis=1), 3)
+    rows: list[dict[str, Any]] = []
+    for ric, row, change_row in zip([*rics, PORTFOLIO_AGGREGATE_RIC], values.tolist(), changes.tolist()):
+        rows.extend(
+            {"ric": ric, "point_date": point_date, "value": value, "change": change}
+            for point_date, value, change in zip(dates, row, [None, *change_row])
         )
-        values = _build_scenario_series(definition["base_amount"], definition["volatility"], generator)
-        for idx, value in enumerate(values):
-            records.append(
-                ScenarioDistributionRecord(
-                    ric=definition["ric"],
-                    scenario_index=idx,
-                    value=value,
-                )
-            )
-            portfolio_accumulator[idx] += value * 0.6
+    bulk_insert(session, VaRTimeSeriesRecord, rows)
 
-    for idx, value in enumerate(portfolio_accumulator):
-        records.append(
-            ScenarioDistributionRecord(
-                ric=PORTFOLIO_AGGREGATE_RIC,
-                scenario_index=idx,
-                value=round(value, 3),
-            )
-        )
+    pnl = simulate_realized_pnl(np.random.default_rng([SCENARIO_SEED, 1]), values[:-1])
+    bulk_insert(
+        session,
+        RealizedPnLRecord,
+        realized_pnl_rows([*rics, PORTFOLIO_AGGREGATE_RIC], dates, np.vstack([pnl, pnl.sum(axis=0)])),
+    )
 
-    session.add_all(records)
 
+def simulate_realized_pnl(rng: np.random.Generator, levels: np.ndarray) -> np.ndarray:
+    """Return daily P/L whose 99% loss quantile is roughly the previous day's VaR in ``levels``.
 
-def _build_scenario_series(base_amount: float, volatility: float, rng: Random) -> list[float]:
-    """Return pseudo Gaussian loss samples to mimic正規分布寄りのシナリオPL."""
+    The first day is scaled by its own VaR, since no earlier forecast exists.
+    """
 
-    values: list[float] = []
-    mean_scale = base_amount * 0.12
-    drift_amplitude = max(0.2, volatility * 0.35)
-    shock_scale = max(0.25, base_amount * 0.03)
+    previous = np.concatenate([levels[:, :1], levels[:, :-1]], axis=1)
+    shocks = rng.standard_t(REALIZED_PNL_DF, levels.shape) * np.sqrt((REALIZED_PNL_DF - 2) / REALIZED_PNL_DF)
+    return np.round(previous / STANDARD_NORMAL_Q99 * shocks, 3)
 
-    for idx in range(SCENARIO_WINDOW):
-        seasonal = sin((idx + base_amount) / 32) * drift_amplitude
-        gaussian = rng.gauss(0, 1)
-        value = round(-(mean_scale + seasonal + gaussian * shock_scale), 3)
-        values.append(value)
 
-    return values
+def realized_pnl_rows(rics: Sequence[str], dates: Sequence[date], pnl: np.ndarray) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    for ric, values in zip(rics, pnl.tolist()):
+        rows.extend({"ric": ric, "pnl_date": pnl_date, "pnl": value} for pnl_date, value in zip(dates, values))
+    return rows
+
+
+def _seed_scenario_vectors(
+    session: Session, windows: dict[date, np.ndarray], assets: Sequence[dict[str, Any]]
+) -> None:
+    # Row storage has no as_of dimension, so only the latest window is kept there.
+    as_of_dates = sorted(windows) if uses_columnar_storage() else [max(windows)]
+    for as_of in as_of_dates:
+        pnl = windows[as_of]
+        vectors = {definition["ric"]: np.round(row, 3) for definition, row in zip(assets, pnl)}
+        vectors[PORTFOLIO_AGGREGATE_RIC] = np.round(pnl.sum(axis=0), 3)
+        save_scenario_vectors(session, as_of, vectors)
+        save_ewma_states(session, as_of, vectors)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
     init_db()
@@ -1,9 +1,17 @@
 """Database engine and session management."""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from ..core.config import settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
 connect_args = {}
 if settings.database_url.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
@@ -11,8 +19,38 @@ if settings.database_url.startswith("sqlite"):
 engine = create_engine(settings.database_url, connect_args=connect_args, future=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
 
 def get_session():
     """Provide a transactional scope around a series of operations."""
 
     return SessionLocal()
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (aiosqlite / asyncpg)."""
+
+    scheme, separator, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {dialect!r} URLs")
+    return f"{ASYNC_DRIVERS[dialect]}{separator}{rest}"
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """Create the async engine on first use so the async drivers stay optional."""
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(settings.async_database_url or to_async_url(settings.database_url))
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Return the ``AsyncSession`` factory bound to :func:`get_async_engine`."""
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    return async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
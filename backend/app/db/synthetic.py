@@ -0,0 +1,379 @@
+"""Deterministic, chunked synthetic data for production-sized portfolios.
+
+``python -m app.db.synthetic --assets 10000 --snapshot-days 20 --history-days 250``
+rebuilds the schema and fills every table the API reads. Scenario P/L follows
+a market + category factor model. Assets are generated and written
+``chunk_size`` at a time through :func:`~app.db.bulk.bulk_insert`, so memory
+depends on the chunk size rather than on the number of assets. The same
+:class:`SyntheticConfig` always produces the same data.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from time import perf_counter
+from typing import Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..core.constants import PORTFOLIO_AGGREGATE_RIC, SCENARIO_WINDOW, VAR_CONFIDENCE
+from ..engine import attribute_roll, compute_tail_measures, euler_allocation, round_to_total, var_tail_weights
+from .aggregates import SnapshotAggregates
+from .bulk import bulk_insert
+from .ewma_store import save_ewma_states
+from .models import AssetVaRRecord, RealizedPnLRecord, RiskMeasureRecord, VaRSnapshot, VaRTimeSeriesRecord
+from .risk_measures import risk_measure_rows
+from .scenario_store import save_scenario_vectors, uses_columnar_storage
+from .schema import bump_data_version, reset_schema
+from .seed import (
+    STANDARD_NORMAL_Q99,
+    realized_pnl_rows,
+    seed_market_context,
+    simulate_realized_pnl,
+)
+from .session import SessionLocal
+
+CATEGORY_CODES = {"株式": "EQ", "金利": "IR", "クレジット": "CR", "モーゲージ": "MBS", "コモディティ": "CMD"}
+CATEGORIES = tuple(CATEGORY_CODES)
+REGIME_PERSISTENCE = 0.97
+REGIME_VOLATILITY = 0.04
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    """Scale and seed of a synthetic dataset."""
+
+    assets: int = 10_000
+    snapshot_days: int = 5
+    history_days: int = 250
+    window: int = SCENARIO_WINDOW
+    seed: int = 20240401
+    chunk_size: int = 500
+    end_date: date | None = None
+
+
+@dataclass(frozen=True)
+class SyntheticSummary:
+    """What :func:`generate_synthetic_data` wrote."""
+
+    assets: int
+    snapshot_dates: tuple[date, ...]
+    rows: dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def synthetic_ric(index: int) -> str:
+    """Return the RIC of the ``index``-th synthetic asset."""
+
+    return f"SYN_{CATEGORY_CODES[CATEGORIES[index % len(CATEGORIES)]]}_{index:06d}"
+
+
+def generate_synthetic_data(session: Session, config: SyntheticConfig = SyntheticConfig()) -> SyntheticSummary:
+    """Stream a synthetic dataset into ``session`` and commit it.
+
+    Snapshots are inserted first to obtain their ids. The portfolio figures are
+    filled in at the end from P/L accumulated across chunks.
+    """
+
+    if config.assets < 1 or config.snapshot_days < 1 or config.history_days < 1:
+        raise ValueError("assets, snapshot_days and history_days must be positive")
+    started = perf_counter()
+    end = config.end_date or date.today()
+    as_of_dates = [end - timedelta(days=offset) for offset in range(config.snapshot_days - 1, -1, -1)]
+    series_dates = [end - timedelta(days=offset) for offset in range(config.history_days - 1, -1, -1)]
+    days, window = config.snapshot_days, config.window
+    # One extra leading day gives the first snapshot a previous window to explain against.
+    length = window + days
+
+    factor_rng = np.random.default_rng([config.seed, 0])
+    market = factor_rng.standard_normal(length)
+    category_factors = factor_rng.standard_normal((len(CATEGORIES), length))
+    regimes = _regime_paths(factor_rng, len(CATEGORIES), config.history_days)
+
+    snapshots = [
+        VaRSnapshot(
+            as_of=as_of,
+            portfolio_total=0.0,
+            portfolio_change_amount=0.0,
+            portfolio_change_pct=0.0,
+            diversification_effect=0.0,
+        )
+        for as_of in as_of_dates
+    ]
+    session.add_all(snapshots)
+    session.flush()
+
+    portfolio_pnl = np.zeros((days, window))
+    standalone = np.zeros(days)
+    latest_standalone = 0.0
+    aggregates = [SnapshotAggregates() for _ in range(days)]
+    leaders: list[tuple[float, str, str]] = [(-np.inf, "主要資産", "ポートフォリオ")] * days
+    series_total = np.zeros(config.history_days)
+    realized_total = np.zeros(config.history_days)
+    rows: dict[str, int] = {}
+    keep_dates = range(days) if uses_columnar_storage() else [days - 1]
+    chunks = range(0, config.assets, config.chunk_size)
+
+    def chunk_inputs(chunk_index: int) -> tuple[np.random.Generator, dict[str, Any], np.ndarray, np.ndarray]:
+        start = chunks[chunk_index]
+        stop = min(config.assets, start + config.chunk_size)
+        rng = np.random.default_rng([config.seed, 1, chunk_index])
+        universe = _asset_universe(rng, start, stop)
+        history = _scenario_history(rng, universe, market, category_factors)
+        phases = rng.uniform(0, 2 * np.pi, stop - start)
+        positions = np.stack(
+            [
+                1.0 + universe["position_amplitude"] * np.sin(as_of.toordinal() / 5 + phases)
+                for as_of in [as_of_dates[0] - timedelta(days=1), *as_of_dates]
+            ],
+            axis=1,
+        )
+        return rng, universe, history, positions
+
+    # Euler allocation needs the whole book's VaR scenario before any chunk is
+    # written, so a cheap first pass regenerates each chunk only to sum its P/L.
+    for chunk_index in range(len(chunks)):
+        _, _, history, positions = chunk_inputs(chunk_index)
+        for day in range(days):
+            portfolio_pnl[day] += positions[:, day + 1] @ history[:, day + 1 : day + 1 + window]
+    tails = [var_tail_weights(portfolio_pnl[day]) for day in range(days)]
+
+    for chunk_index in range(len(chunks)):
+        rng, universe, history, positions = chunk_inputs(chunk_index)
+        asset_rows: list[dict[str, Any]] = []
+        measure_rows: list[dict[str, Any]] = []
+        for day in range(days):
+            attribution = attribute_roll(
+                history[:, day : day + window], history[:, day + window], positions[:, day], positions[:, day + 1]
+            )
+            previous = attribution.var - attribution.total
+            amounts = np.round(attribution.var, 2)
+            change_pct = np.divide(
+                attribution.var - previous, previous, out=np.zeros_like(previous), where=previous != 0
+            )
+            drivers = np.stack(
+                [attribution.window_drop, attribution.window_add, attribution.position_change, attribution.ranking_shift],
+                axis=1,
+            ).round(3)
+            pnl = history[:, day + 1 : day + 1 + window] * positions[:, day + 1, None]
+            allocation = euler_allocation(pnl, positions[:, day + 1], tail=tails[day])
+            components = round_to_total(allocation.component_var)
+            for ric, name, category, amount, change, pct, driver, component, marginal, position in zip(
+                universe["ric"],
+                universe["name"],
+                universe["category"],
+                amounts.tolist(),
+                np.round(attribution.var - previous, 2).tolist(),
+                np.round(change_pct * 100, 2).tolist(),
+                drivers.tolist(),
+                components.tolist(),
+                allocation.marginal_var.round(4).tolist(),
+                positions[:, day + 1].tolist(),
+            ):
+                asset_rows.append(
+                    {
+                        "snapshot_id": snapshots[day].id,
+                        "ric": ric,
+                        "name": name,
+                        "category": category,
+                        "amount": amount,
+                        "change_amount": change,
+                        "change_pct": pct,
+                        "window_drop_contribution": driver[0],
+                        "window_add_contribution": driver[1],
+                        "position_change_contribution": driver[2],
+                        "ranking_shift_contribution": driver[3],
+                        "component_var": component,
+                        "marginal_var": marginal,
+                        "position": position,
+                        "diversification_benefit": round(amount - component, 2),
+                    }
+                )
+            standalone[day] += amounts.sum()
+            aggregates[day].add(universe["ric"], universe["category"], amounts, drivers)
+            leader = int(np.argmax(amounts))
+            if amounts[leader] > leaders[day][0]:
+                leaders[day] = (float(amounts[leader]), universe["name"][leader], universe["category"][leader])
+
+            measure_rows.extend(risk_measure_rows(snapshots[day].id, universe["ric"], compute_tail_measures(pnl)))
+            if day in keep_dates:
+                vectors = dict(zip(universe["ric"], np.round(pnl, 3)))
+                report = save_scenario_vectors(session, as_of_dates[day], vectors)
+                _count(rows, report.table, report.rows)
+                report = save_ewma_states(session, as_of_dates[day], vectors)
+                _count(rows, report.table, report.rows)
+
+        latest_var = attribution.var
+        latest_standalone += float(latest_var.sum())
+        series = _timeseries_levels(rng, latest_var, regimes[universe["category_index"]])
+        series_total += series.sum(axis=0)
+        realized = simulate_realized_pnl(np.random.default_rng([config.seed, 2, chunk_index]), series)
+        realized_total += realized.sum(axis=0)
+        report = bulk_insert(session, AssetVaRRecord, asset_rows)
+        _count(rows, report.table, report.rows)
+        report = bulk_insert(session, RiskMeasureRecord, measure_rows)
+        _count(rows, report.table, report.rows)
+        report = bulk_insert(session, VaRTimeSeriesRecord, _series_rows(universe["ric"], series_dates, series))
+        _count(rows, report.table, report.rows)
+        report = bulk_insert(session, RealizedPnLRecord, realized_pnl_rows(universe["ric"], series_dates, realized))
+        _count(rows, report.table, report.rows)
+        logger.info("synthetic chunk %d/%d written (%d assets)", chunk_index + 1, len(chunks), len(universe["ric"]))
+
+    contexts: list[dict[str, Any]] = []
+    portfolio_rows: list[dict[str, Any]] = []
+    previous_total: float | None = None
+    for day, snapshot in enumerate(snapshots):
+        measures = compute_tail_measures(portfolio_pnl[day])
+        portfolio_var = float(measures.at(VAR_CONFIDENCE)[0][0])
+        portfolio_rows.extend(risk_measure_rows(snapshot.id, [PORTFOLIO_AGGREGATE_RIC], measures))
+        total = round(portfolio_var, 2)
+        change_amount = 0.0 if previous_total is None else round(total - previous_total, 2)
+        change_pct = round(change_amount / previous_total * 100, 2) if previous_total else 0.0
+        previous_total = total
+        snapshot.portfolio_total = total
+        snapshot.portfolio_change_amount = change_amount
+        snapshot.portfolio_change_pct = change_pct
+        snapshot.diversification_effect = round(total - standalone[day], 2)
+        for column, value in aggregates[day].columns().items():
+            setattr(snapshot, column, value)
+        contexts.append(
+            {
+                "as_of": snapshot.as_of,
+                "driver_totals": aggregates[day].driver_dict(),
+                "leading_asset": leaders[day][1],
+                "leading_category": leaders[day][2],
+                "portfolio_change_pct": change_pct,
+                "portfolio_total": total,
+                "diversification_effect": snapshot.diversification_effect,
+            }
+        )
+        if day in keep_dates:
+            report = save_scenario_vectors(
+                session, snapshot.as_of, {PORTFOLIO_AGGREGATE_RIC: np.round(portfolio_pnl[day], 3)}
+            )
+            _count(rows, report.table, report.rows)
+
+    report = bulk_insert(session, RiskMeasureRecord, portfolio_rows)
+    _count(rows, report.table, report.rows)
+    diversification_ratio = portfolio_var / latest_standalone if latest_standalone else 1.0
+    report = bulk_insert(
+        session,
+        VaRTimeSeriesRecord,
+        _series_rows([PORTFOLIO_AGGREGATE_RIC], series_dates, series_total[None, :] * diversification_ratio),
+    )
+    _count(rows, report.table, report.rows)
+    report = bulk_insert(
+        session, RealizedPnLRecord, realized_pnl_rows([PORTFOLIO_AGGREGATE_RIC], series_dates, realized_total[None, :])
+    )
+    _count(rows, report.table, report.rows)
+    seed_market_context(session, contexts)
+    _count(rows, VaRSnapshot.__tablename__, len(snapshots))
+    bump_data_version(session)
+    session.commit()
+
+    summary = SyntheticSummary(
+        assets=config.assets,
+        snapshot_dates=tuple(as_of_dates),
+        rows=rows,
+        seconds=perf_counter() - started,
+    )
+    logger.info("synthetic data: %d assets, %s in %.1fs", summary.assets, summary.rows, summary.seconds)
+    return summary
+
+
+def _asset_universe(rng: np.random.Generator, start: int, stop: int) -> dict[str, Any]:
+    """Return per-asset attributes for asset indices ``[start, stop)``."""
+
+    size = stop - start
+    category_index = np.arange(start, stop) % len(CATEGORIES)
+    categories = [CATEGORIES[idx] for idx in category_index]
+    volatility = rng.uniform(0.1, 0.45, size)
+    return {
+        "ric": [synthetic_ric(index) for index in range(start, stop)],
+        "name": [f"合成{category} #{index}" for index, category in zip(range(start, stop), categories)],
+        "category": categories,
+        "category_index": category_index,
+        "base_amount": rng.uniform(2.0, 11.0, size),
+        "market_loading": rng.uniform(0.45, 0.85, size),
+        "category_loading": rng.uniform(0.2, 0.5, size),
+        "position_amplitude": volatility * 0.5,
+    }
+
+
+def _scenario_history(
+    rng: np.random.Generator,
+    universe: dict[str, Any],
+    market: np.ndarray,
+    category_factors: np.ndarray,
+) -> np.ndarray:
+    """Return unit P/L (assets x days) scaled so each asset's 99% VaR is near its base amount."""
+
+    market_loading = universe["market_loading"][:, None]
+    category_loading = universe["category_loading"][:, None]
+    idiosyncratic = rng.standard_normal((len(universe["ric"]), market.size))
+    shocks = (
+        market_loading * market
+        + category_loading * category_factors[universe["category_index"]]
+        + np.sqrt(1.0 - market_loading**2 - category_loading**2) * idiosyncratic
+    )
+    return np.round(universe["base_amount"][:, None] / STANDARD_NORMAL_Q99 * shocks, 3)
+
+
+def _regime_paths(rng: np.random.Generator, count: int, length: int) -> np.ndarray:
+    """Return AR(1) log-level paths per category, ending at zero on the latest day."""
+
+    paths = np.zeros((count, length))
+    noise = rng.standard_normal((count, length)) * REGIME_VOLATILITY
+    for day in range(1, length):
+        paths[:, day] = REGIME_PERSISTENCE * paths[:, day - 1] + noise[:, day]
+    return paths - paths[:, -1:]
+
+
+def _timeseries_levels(rng: np.random.Generator, latest_var: np.ndarray, regimes: np.ndarray) -> np.ndarray:
+    """Return a VaR history per asset that ends at its latest computed VaR."""
+
+    noise = 1.0 + rng.standard_normal(regimes.shape) * 0.01
+    noise[:, -1] = 1.0
+    return latest_var[:, None] * np.exp(regimes) * noise
+
+
+def _series_rows(rics: list[str], series_dates: list[date], levels: np.ndarray) -> list[dict[str, Any]]:
+    values = np.round(levels, 3)
+    changes = np.round(np.diff(values, axis=1), 3)
+    rows: list[dict[str, Any]] = []
+    for ric, row, change_row in zip(rics, values.tolist(), changes.tolist()):
+        rows.extend(
+            {"ric": ric, "point_date": point_date, "value": value, "change": change}
+            for point_date, value, change in zip(series_dates, row, [None, *change_row])
+        )
+    return rows
+
+
+def _count(rows: dict[str, int], table: str, count: int) -> None:
+    rows[table] = rows.get(table, 0) + count
+
+
+def main(argv: list[str] | None = None) -> SyntheticSummary:
+    defaults = SyntheticConfig()
+    parser = argparse.ArgumentParser(description="Rebuild the schema and load synthetic VaR data.")
+    parser.add_argument("--assets", type=int, default=defaults.assets)
+    parser.add_argument("--snapshot-days", type=int, default=defaults.snapshot_days)
+    parser.add_argument("--history-days", type=int, default=defaults.history_days)
+    parser.add_argument("--window", type=int, default=defaults.window)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    args = parser.parse_args(argv)
+
+    reset_schema()
+    with SessionLocal() as session:
+        return generate_synthetic_data(session, SyntheticConfig(**vars(args)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    main()
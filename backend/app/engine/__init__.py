@@ -0,0 +1,71 @@
+"""Vectorised risk engine computing VaR figures from scenario P/L matrices."""
+from .allocation import EulerAllocation, TailWeights, euler_allocation, round_to_total, var_tail_weights
+from .backtest import NO_DATA_ZONE, ZONES, BacktestResult, backtest_var, binomial_cdf, traffic_light_zones
+from .distribution import DistributionSummary, summarise_distribution
+from .ewma import EwmaState
+from .hierarchy import DESKS, HIERARCHY_LEVELS, AggregationTree, DrillDown, group_labels
+from .historical import (
+    HistoricalVaRResult,
+    TailMeasures,
+    compute_historical_var,
+    compute_tail_measures,
+    tail_count,
+)
+from .incremental import (
+    BatchAttribution,
+    DriverAttribution,
+    IncrementalVaREngine,
+    IncrementalVaRTracker,
+    TailOrderStatistic,
+    attribute_roll,
+)
+from .montecarlo import MonteCarloModel, MonteCarloResult, StreamingTail, monte_carlo_var
+from .stress import FACTORS, STRESS_FACTORS, StressBook, StressResult, StressScenario, run_stress, shock_matrix
+from .whatif import BookScenarios, WhatIfResult, what_if
+
+__all__ = [
+    "AggregationTree",
+    "BacktestResult",
+    "BatchAttribution",
+    "BookScenarios",
+    "DESKS",
+    "DistributionSummary",
+    "DrillDown",
+    "DriverAttribution",
+    "EulerAllocation",
+    "EwmaState",
+    "FACTORS",
+    "HIERARCHY_LEVELS",
+    "HistoricalVaRResult",
+    "IncrementalVaREngine",
+    "IncrementalVaRTracker",
+    "MonteCarloModel",
+    "MonteCarloResult",
+    "NO_DATA_ZONE",
+    "STRESS_FACTORS",
+    "StreamingTail",
+    "StressBook",
+    "StressResult",
+    "StressScenario",
+    "TailMeasures",
+    "TailOrderStatistic",
+    "TailWeights",
+    "ZONES",
+    "WhatIfResult",
+    "attribute_roll",
+    "backtest_var",
+    "binomial_cdf",
+    "compute_historical_var",
+    "compute_tail_measures",
+    "euler_allocation",
+    "group_labels",
+    "monte_carlo_var",
+    "round_to_total",
+    "run_stress",
+    "shock_matrix",
+    "summarise_distribution",
+    "tail_count",
+    "traffic_light_zones",
+    "var_tail_weights",
+    "what_if",
+]
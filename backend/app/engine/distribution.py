@@ -0,0 +1,49 @@
+"""Histogram and quantile summaries of scenario P/L vectors."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ..core.constants import REPORTED_CONFIDENCE_LEVELS
+from .historical import TailMeasures, compute_tail_measures
+
+
+@dataclass(frozen=True)
+class DistributionSummary:
+    """Binned counts plus the statistics needed for box plots and VaR lines."""
+
+    edges: np.ndarray
+    counts: np.ndarray
+    minimum: float
+    maximum: float
+    quartiles: np.ndarray
+    tail: TailMeasures
+
+
+def summarise_distribution(
+    values: ArrayLike,
+    bins: int,
+    confidences: tuple[float, ...] = REPORTED_CONFIDENCE_LEVELS,
+) -> DistributionSummary:
+    """Bin ``values`` into ``bins`` equal-width buckets and compute tail statistics."""
+
+    vector = np.asarray(values, dtype=np.float64)
+    if vector.ndim != 1 or not vector.size:
+        raise ValueError("values must be a non-empty 1-D vector")
+    if bins < 1:
+        raise ValueError("bins must be positive")
+
+    minimum, maximum = float(vector.min()), float(vector.max())
+    # match the dashboard's binning when every sample is identical
+    upper = maximum if maximum > minimum else minimum + 1.0
+    counts, edges = np.histogram(vector, bins=bins, range=(minimum, upper))
+    return DistributionSummary(
+        edges=edges,
+        counts=counts,
+        minimum=minimum,
+        maximum=maximum,
+        quartiles=np.quantile(vector, [0.25, 0.5, 0.75]),
+        tail=compute_tail_measures(vector, confidences),
+    )
@@ -0,0 +1,115 @@
+"""EWMA volatility filtering for filtered historical simulation (FHS).
+
+Each scenario P/L ``r_j`` is divided by the EWMA volatility forecast ``s_j``
+made the day before. The resulting standardised residuals are rescaled by
+today's forecast ``s_T``, i.e. ``r_j * s_T / s_j``. A calm window is inflated
+when volatility picks up (and deflated when it falls), while the shape of the
+window's tails is kept.
+
+:class:`EwmaState` holds the forecast variance and the residual window.
+Rolling it forward one day costs O(RICs), so loaders keep it up to date
+incrementally instead of re-filtering the whole history.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ..core.constants import EWMA_DECAY
+
+# Largest power of 1 / decay used when filtering a block of days at once.
+_MAX_GROWTH_EXPONENT = 300.0
+
+
+@dataclass(frozen=True)
+class EwmaState:
+    """Next-day forecast variance and RICs x window standardised residuals (oldest first)."""
+
+    variance: np.ndarray
+    residuals: np.ndarray
+    decay: float = EWMA_DECAY
+
+    @classmethod
+    def from_window(cls, pnl: ArrayLike, decay: float = EWMA_DECAY) -> EwmaState:
+        """Filter a full RICs x scenarios window; the recursion starts from its mean square."""
+
+        matrix = np.atleast_2d(np.asarray(pnl, dtype=np.float64))
+        if not 0.0 < decay < 1.0:
+            raise ValueError("decay must be between 0 and 1")
+        state = cls(variance=(matrix**2).mean(axis=1), residuals=np.empty((matrix.shape[0], 0)), decay=decay)
+        return state.roll(matrix, window=matrix.shape[1])
+
+    @property
+    def volatility(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def roll(self, observations: ArrayLike, window: int | None = None) -> EwmaState:
+        """Append the newest observation(s) per RIC and drop as many of the oldest residuals.
+
+        ``observations`` is a vector with one value per RIC, or a RICs x days
+        matrix that is applied day by day.
+        """
+
+        values = np.asarray(observations, dtype=np.float64).reshape(len(self.variance), -1)
+        forecasts = _forecast_path(self.variance, values**2, self.decay)
+        volatility = np.sqrt(forecasts[:, :-1])
+        added = np.divide(values, volatility, out=np.zeros_like(values), where=volatility > 0)
+        variance = forecasts[:, -1]
+        keep = self.residuals.shape[1] if window is None else window
+        residuals = np.concatenate([self.residuals, added], axis=1)[:, -keep:] if keep else added[:, :0]
+        return EwmaState(variance=variance, residuals=residuals, decay=self.decay)
+
+    def latest_observations(self, days: int) -> np.ndarray:
+        """Recover the newest ``days`` observations per RIC (oldest first) from the state alone.
+
+        Each step of the recursion multiplies the variance by ``decay + (1 -
+        decay) * residual**2``, so it can be run backwards. A day whose
+        forecast volatility was zero has a zero residual and recovers as zero.
+        """
+
+        residuals = self.residuals[:, self.residuals.shape[1] - days :]
+        variance = self.variance
+        observations = np.empty_like(residuals)
+        for column in range(residuals.shape[1] - 1, -1, -1):
+            residual = residuals[:, column]
+            variance = variance / (self.decay + (1.0 - self.decay) * residual**2)
+            observations[:, column] = residual * np.sqrt(variance)
+        return observations
+
+    def rescaled(self, scale: ArrayLike) -> EwmaState:
+        """Return the state of the same window multiplied by ``scale`` per RIC.
+
+        Residuals are scale-free, so only the variance changes. Loaders use this
+        when a position change rescales the whole stored window.
+        """
+
+        factor = np.asarray(scale, dtype=np.float64)
+        return EwmaState(variance=self.variance * factor**2, residuals=self.residuals, decay=self.decay)
+
+    def filtered(self) -> np.ndarray:
+        """Return the residuals rescaled to today's volatility (the FHS scenario matrix)."""
+
+        return self.residuals * self.volatility[:, None]
+
+
+def _forecast_path(variance: np.ndarray, squares: np.ndarray, decay: float) -> np.ndarray:
+    """Return the RICs x (days + 1) variance forecasts before each day and after the last one.
+
+    ``v[j] = decay**j * (v[0] + (1 - decay) * sum(decay**-(i + 1) * r[i]**2 for i < j))``
+    turns the recursion into a cumulative sum. Blocks of days keep
+    ``decay**-j`` within float range.
+    """
+
+    days = squares.shape[1]
+    path = np.empty((len(variance), days + 1))
+    path[:, 0] = variance
+    block = max(1, int(_MAX_GROWTH_EXPONENT / -math.log(decay)))
+    for start in range(0, days, block):
+        chunk = squares[:, start : start + block]
+        powers = decay ** np.arange(1, chunk.shape[1] + 1)
+        weighted = np.cumsum(chunk / powers, axis=1)
+        path[:, start + 1 : start + 1 + chunk.shape[1]] = powers * (path[:, start, None] + (1.0 - decay) * weighted)
+    return path
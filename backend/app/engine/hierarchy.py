@@ -0,0 +1,229 @@
+"""Hierarchical VaR aggregation: desk -> category -> RIC, or any other grouping depth.
+
+VaR is not additive, so a node's figure is read off the sum of its
+children's scenario P/L vectors rather than the sum of their VaRs. Every
+node vector is kept in the tree, and replacing leaves recomputes only the
+vectors on their paths to the root. Untouched vectors are shared with the
+previous tree, as are their cached tail measures.
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ..core.constants import VAR_CONFIDENCE
+from .allocation import var_tail_weights
+from .historical import compute_tail_measures
+
+# Desks are not persisted on assets, so each category is booked to a fixed desk.
+DESKS: dict[str, str] = {
+    "株式": "エクイティ",
+    "金利": "マクロ",
+    "コモディティ": "マクロ",
+    "クレジット": "スプレッド",
+    "モーゲージ": "スプレッド",
+}
+UNASSIGNED_DESK = "その他"
+HIERARCHY_LEVELS = ("desk", "category")
+
+Path = tuple[str, ...]
+
+
+def group_labels(level: str, categories: Sequence[str]) -> list[str]:
+    """Return each RIC's label at ``level`` (one of :data:`HIERARCHY_LEVELS`); raises ``KeyError`` otherwise."""
+
+    if level == "desk":
+        return [DESKS.get(category, UNASSIGNED_DESK) for category in categories]
+    if level == "category":
+        return list(categories)
+    raise KeyError(level)
+
+
+@dataclass(frozen=True)
+class DrillDown:
+    """One node with its direct children; child arrays follow ``labels``.
+
+    ``component_var`` splits the node's VaR across its children (Euler
+    allocation on the node vector), so it adds up to ``var``.
+    """
+
+    path: Path
+    var: float
+    es: float
+    labels: tuple[str, ...]
+    leaf: tuple[bool, ...]
+    leaf_counts: np.ndarray
+    child_var: np.ndarray
+    child_es: np.ndarray
+    component_var: np.ndarray
+
+    @property
+    def standalone_var(self) -> float:
+        return float(self.child_var.sum())
+
+    @property
+    def diversification_effect(self) -> float:
+        return self.var - self.standalone_var
+
+
+@dataclass(frozen=True)
+class AggregationTree:
+    """Scenario P/L vector of every node, keyed by its path from the root ``()``.
+
+    Leaves are RICs at depth ``len(levels) + 1``; their vectors are views into
+    the matrix the tree was built from. Tail measures are computed on first
+    access per node and kept for the lifetime of the tree. Cached trees are
+    read by several threads at once and ``_measures`` is their only mutable
+    state: each write is a single dict assignment of a value that depends
+    only on the immutable node vector, so a race at worst computes a node
+    twice and stores the same value.
+    """
+
+    levels: tuple[str, ...]
+    children: Mapping[Path, tuple[str, ...]]
+    vectors: Mapping[Path, np.ndarray]
+    leaf_paths: Mapping[str, Path]
+    leaf_counts: Mapping[Path, int]
+    confidence: float = VAR_CONFIDENCE
+    _measures: dict[Path, tuple[float, float]] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_leaves(
+        cls,
+        rics: Sequence[str],
+        groups: Sequence[Sequence[str]],
+        pnl: ArrayLike,
+        levels: Sequence[str],
+        confidence: float = VAR_CONFIDENCE,
+    ) -> AggregationTree:
+        """Build the tree from a RICs x scenarios matrix and one label per level and RIC.
+
+        ``groups[i]`` holds the labels of ``rics[i]`` from the top level down.
+        Leaves are sorted by path so every node covers a contiguous block of
+        rows, and each level is summed with one ``np.add.reduceat``.
+        """
+
+        matrix = np.asarray(pnl, dtype=np.float64)
+        if matrix.ndim != 2 or matrix.shape[0] != len(rics):
+            raise ValueError("pnl must be a 2-D RICs x scenarios matrix with one row per RIC")
+        depth = len(levels)
+        paths = [(*map(str, labels), ric) for labels, ric in zip(groups, rics)]
+        if any(len(path) != depth + 1 for path in paths):
+            raise ValueError("every RIC needs one label per level")
+        if len(set(rics)) != len(rics):
+            raise ValueError("RICs must be unique")
+
+        order = sorted(range(len(paths)), key=paths.__getitem__)
+        paths = [paths[row] for row in order]
+        vectors: dict[Path, np.ndarray] = {path: matrix[row] for path, row in zip(paths, order)}
+        leaf_counts: dict[Path, int] = dict.fromkeys(paths, 1)
+        children: dict[Path, tuple[str, ...]] = {}
+        # Each level is summed from the level below it, not from the leaves.
+        nodes, block = paths, matrix[order] if order else np.zeros((0, matrix.shape[1]))
+        for level in range(depth, -1, -1):
+            starts = [row for row, node in enumerate(nodes) if row == 0 or node[:level] != nodes[row - 1][:level]]
+            parents = [nodes[start][:level] for start in starts]
+            for parent, start, stop in zip(parents, starts, [*starts[1:], len(nodes)]):
+                children[parent] = tuple(node[-1] for node in nodes[start:stop])
+                leaf_counts[parent] = sum(leaf_counts[node] for node in nodes[start:stop])
+            block = np.add.reduceat(block, starts, axis=0) if starts else block
+            vectors.update(zip(parents, block))
+            nodes = parents
+        if () not in vectors:
+            vectors[()] = np.zeros(matrix.shape[1])
+            leaf_counts[()] = 0
+        return cls(
+            levels=tuple(levels),
+            children=children,
+            vectors=vectors,
+            leaf_paths={path[-1]: path for path in paths},
+            leaf_counts=leaf_counts,
+            confidence=confidence,
+        )
+
+    def is_leaf(self, path: Path) -> bool:
+        return len(path) == len(self.levels) + 1 and path in self.vectors
+
+    def measures(self, path: Path) -> tuple[float, float]:
+        """Return ``(var, es)`` of a node; raises ``KeyError`` for unknown paths."""
+
+        cached = self._measures.get(path)
+        if cached is None:
+            tail = compute_tail_measures(self.vectors[path], (self.confidence,))
+            cached = self._measures[path] = (float(tail.var[0, 0]), float(tail.es[0, 0]))
+        return cached
+
+    def drill_down(self, path: Sequence[str] = ()) -> DrillDown:
+        """Return the node at ``path`` and its direct children; raises ``KeyError`` for unknown paths."""
+
+        path = tuple(path)
+        vector = self.vectors[path]
+        var, es = self.measures(path)
+        labels = self.children.get(path, ())
+        child_paths = [(*path, label) for label in labels]
+        if child_paths:
+            stack = np.vstack([self.vectors[child] for child in child_paths])
+            tail = var_tail_weights(vector, self.confidence)
+            component = -(stack @ tail.weights) * tail.scale
+            # Children not seen yet share one partition call.
+            missing = [row for row, child in enumerate(child_paths) if child not in self._measures]
+            if missing:
+                measures = compute_tail_measures(stack[missing], (self.confidence,))
+                for row, child_var, child_es in zip(missing, measures.var[:, 0].tolist(), measures.es[:, 0].tolist()):
+                    self._measures[child_paths[row]] = (child_var, child_es)
+        else:
+            component = np.empty(0)
+        child_measures = [self.measures(child) for child in child_paths]
+        return DrillDown(
+            path=path,
+            var=var,
+            es=es,
+            labels=labels,
+            leaf=tuple(self.is_leaf(child) for child in child_paths),
+            leaf_counts=np.array([self.leaf_counts[child] for child in child_paths], dtype=np.int64),
+            child_var=np.array([measure[0] for measure in child_measures]),
+            child_es=np.array([measure[1] for measure in child_measures]),
+            component_var=component,
+        )
+
+    def replace_leaf(self, ric: str, pnl: ArrayLike) -> AggregationTree:
+        """Return a tree with ``ric``'s scenario vector replaced; see :meth:`replace_leaves`."""
+
+        return self.replace_leaves({ric: pnl})
+
+    def replace_leaves(self, pnl: Mapping[str, ArrayLike]) -> AggregationTree:
+        """Return a tree with the given RICs' scenario vectors replaced; raises ``KeyError`` for unknown RICs.
+
+        Each ancestor moves once by the summed change of its replaced leaves,
+        so the vector work is O(replaced leaves x depth x scenarios). The
+        node mappings are copied once per call, which is O(nodes) reference
+        copies; every other vector and cached measure is shared with this tree.
+        """
+
+        vectors = dict(self.vectors)
+        changes: dict[Path, np.ndarray] = {}
+        for ric, values in pnl.items():
+            path = self.leaf_paths[ric]
+            vector = np.asarray(values, dtype=np.float64)
+            if vector.shape != self.vectors[path].shape:
+                raise ValueError("replacement vector must match the scenario window")
+            change = vector - self.vectors[path]
+            vectors[path] = vector
+            for depth in range(len(path)):
+                ancestor = path[:depth]
+                changes[ancestor] = changes[ancestor] + change if ancestor in changes else change
+        for ancestor, change in changes.items():
+            vectors[ancestor] = self.vectors[ancestor] + change
+        stale = changes.keys() | {self.leaf_paths[ric] for ric in pnl}
+        return AggregationTree(
+            levels=self.levels,
+            children=self.children,
+            vectors=vectors,
+            leaf_paths=self.leaf_paths,
+            leaf_counts=self.leaf_counts,
+            confidence=self.confidence,
+            _measures={node: value for node, value in self._measures.items() if node not in stale},
+        )
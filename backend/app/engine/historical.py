@@ -0,0 +1,125 @@
+"""Historical-simulation VaR computed in a single batched NumPy pass."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import ceil
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ..core.constants import REPORTED_CONFIDENCE_LEVELS, VAR_CONFIDENCE
+
+
+@dataclass(frozen=True)
+class HistoricalVaRResult:
+    """VaR/ES figures for every asset plus the aggregated portfolio.
+
+    Losses are reported as positive amounts, matching ``AssetVaRRecord.amount``.
+    """
+
+    asset_var: np.ndarray
+    asset_es: np.ndarray
+    portfolio_var: float
+    portfolio_es: float
+    portfolio_pnl: np.ndarray
+
+    @property
+    def standalone_total(self) -> float:
+        """Sum of the standalone asset VaR figures."""
+
+        return float(self.asset_var.sum())
+
+    @property
+    def diversification_effect(self) -> float:
+        """Portfolio VaR minus the sum of standalone VaR (negative when diversified)."""
+
+        return self.portfolio_var - self.standalone_total
+
+
+def tail_count(n_scenarios: int, confidence: float = VAR_CONFIDENCE) -> int:
+    """Return the number of scenarios in the loss tail for ``confidence``."""
+
+    if not 0.0 < confidence < 1.0:
+        raise ValueError("confidence must be between 0 and 1")
+    if n_scenarios <= 0:
+        raise ValueError("at least one scenario is required")
+    return min(n_scenarios, max(1, ceil(round(n_scenarios * (1.0 - confidence), 9))))
+
+
+def compute_historical_var(pnl: ArrayLike, confidence: float = VAR_CONFIDENCE) -> HistoricalVaRResult:
+    """Compute asset and portfolio VaR/ES from a positions x scenarios P/L matrix.
+
+    The portfolio vector is appended as an extra row so that a single
+    ``np.partition`` call yields the tail of every asset and of the portfolio.
+    VaR is the ``k``-th worst loss and ES the mean of the ``k`` worst losses,
+    where ``k`` is :func:`tail_count`.
+    """
+
+    matrix = np.asarray(pnl, dtype=np.float64)
+    if matrix.ndim != 2:
+        raise ValueError("pnl must be a 2-D positions x scenarios matrix")
+
+    k = tail_count(matrix.shape[1], confidence)
+    portfolio_pnl = matrix.sum(axis=0)
+    stacked = np.vstack([matrix, portfolio_pnl])
+    partitioned = np.partition(stacked, k - 1, axis=1)
+
+    var = -partitioned[:, k - 1]
+    es = -partitioned[:, :k].mean(axis=1)
+    return HistoricalVaRResult(
+        asset_var=var[:-1],
+        asset_es=es[:-1],
+        portfolio_var=float(var[-1]),
+        portfolio_es=float(es[-1]),
+        portfolio_pnl=portfolio_pnl,
+    )
+
+
+@dataclass(frozen=True)
+class TailMeasures:
+    """VaR/ES per row for several confidence levels (columns follow ``confidences``)."""
+
+    confidences: tuple[float, ...]
+    var: np.ndarray
+    es: np.ndarray
+    horizon_days: int = 1
+
+    def at(self, confidence: float) -> tuple[np.ndarray, np.ndarray]:
+        """Return the ``(var, es)`` columns for one of ``confidences``."""
+
+        column = self.confidences.index(confidence)
+        return self.var[:, column], self.es[:, column]
+
+    def scaled_to(self, horizon_days: int) -> TailMeasures:
+        """Square-root-of-time scaling to ``horizon_days`` (i.i.d. daily P/L)."""
+
+        factor = np.sqrt(horizon_days / self.horizon_days)
+        return TailMeasures(self.confidences, self.var * factor, self.es * factor, horizon_days)
+
+
+def compute_tail_measures(
+    pnl: ArrayLike,
+    confidences: tuple[float, ...] = REPORTED_CONFIDENCE_LEVELS,
+) -> TailMeasures:
+    """Derive VaR/ES at every confidence level from one partition per row.
+
+    ``np.partition`` is called once with all tail indices, which places each
+    ``k``-th order statistic and leaves the ``k`` smallest values in front of
+    it; a cumulative sum over the deepest tail then yields every ES.
+    """
+
+    matrix = np.atleast_2d(np.asarray(pnl, dtype=np.float64))
+    if matrix.ndim != 2:
+        raise ValueError("pnl must be a vector or a 2-D rows x scenarios matrix")
+    if not confidences:
+        raise ValueError("at least one confidence level is required")
+
+    ks = np.array([tail_count(matrix.shape[1], confidence) for confidence in confidences])
+    partitioned = np.partition(matrix, np.unique(ks - 1), axis=1)
+    tail_sums = np.cumsum(partitioned[:, : ks.max()], axis=1)
+
+    return TailMeasures(
+        confidences=tuple(confidences),
+        var=-partitioned[:, ks - 1],
+        es=-tail_sums[:, ks - 1] / ks,
+    )
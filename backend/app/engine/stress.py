@@ -0,0 +1,119 @@
+"""Stress testing: revalue a whole book under user-defined factor shocks in one batch.
+
+Each RIC is mapped to the risk factor of its ``category`` with a linear
+sensitivity (P/L per unit of factor move). A sensitivity matrix
+(RICs x factors) multiplied by a shock matrix (factors x scenarios) gives the
+P/L of every RIC under every scenario in a single BLAS call, so hundreds of
+scenarios over thousands of RICs cost milliseconds.
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+# Risk factor of each category: the unit its shocks are quoted in, the typical
+# one-day move in that unit and the P/L sign of a long position for a rise.
+STRESS_FACTORS: dict[str, tuple[str, float, float]] = {
+    "株式": ("pct", 1.2, 1.0),
+    "金利": ("bp", 6.0, -1.0),
+    "クレジット": ("bp", 4.0, -1.0),
+    "モーゲージ": ("bp", 5.0, -1.0),
+    "コモディティ": ("pct", 1.5, 1.0),
+}
+FACTORS = tuple(STRESS_FACTORS)
+
+
+@dataclass(frozen=True)
+class StressScenario:
+    """A named set of factor shocks, e.g. ``{"金利": 100, "株式": -20}`` (bp / %)."""
+
+    name: str
+    shocks: Mapping[str, float]
+
+
+@dataclass(frozen=True)
+class StressBook:
+    """Sensitivities of a book's RICs to :data:`FACTORS`, built once per snapshot.
+
+    Shared read-only between requests like :class:`~app.engine.whatif.BookScenarios`.
+    """
+
+    rics: tuple[str, ...]
+    sensitivities: np.ndarray
+    factors: tuple[str, ...] = FACTORS
+
+    @classmethod
+    def from_scenarios(
+        cls, rics: Sequence[str], categories: Sequence[str], pnl: ArrayLike
+    ) -> StressBook:
+        """Derive sensitivities from each RIC's scenario P/L volatility.
+
+        A RIC whose daily P/L standard deviation is ``s`` is given
+        ``sign * s / daily_move`` to its category's factor, so a one-day typical
+        factor move reproduces a one-sigma day. Unknown categories get no exposure.
+        """
+
+        volatility = np.asarray(pnl, dtype=np.float64).std(axis=1)
+        columns = {factor: column for column, factor in enumerate(FACTORS)}
+        per_unit = np.array([sign / move for _, move, sign in STRESS_FACTORS.values()])
+        rows = np.array([row for row, category in enumerate(categories) if category in columns], dtype=np.intp)
+        factor_columns = np.array([columns[categories[row]] for row in rows.tolist()], dtype=np.intp)
+
+        sensitivities = np.zeros((len(rics), len(FACTORS)))
+        sensitivities[rows, factor_columns] = volatility[rows] * per_unit[factor_columns]
+        sensitivities.setflags(write=False)
+        return cls(rics=tuple(rics), sensitivities=sensitivities)
+
+
+@dataclass(frozen=True)
+class StressResult:
+    """P/L of every RIC under every scenario; columns follow the input scenario order."""
+
+    scenarios: tuple[str, ...]
+    pnl: np.ndarray
+    totals: np.ndarray
+    factor_pnl: np.ndarray
+
+    def ranking(self) -> np.ndarray:
+        """Scenario indices from the largest loss to the largest gain (stable on ties)."""
+
+        return np.argsort(self.totals, kind="stable")
+
+    def worst_assets(self, count: int) -> np.ndarray:
+        """Row indices of the ``count`` largest losses per scenario, as a count x scenarios array."""
+
+        count = min(count, self.pnl.shape[0])
+        if count == 0:
+            return np.empty((0, self.pnl.shape[1]), dtype=np.intp)
+        candidates = np.argpartition(self.pnl, count - 1, axis=0)[:count]
+        order = np.argsort(np.take_along_axis(self.pnl, candidates, axis=0), axis=0, kind="stable")
+        return np.take_along_axis(candidates, order, axis=0)
+
+
+def shock_matrix(scenarios: Sequence[StressScenario], factors: Sequence[str] = FACTORS) -> np.ndarray:
+    """Return the factors x scenarios shock matrix; raises ``KeyError`` for unknown factors."""
+
+    columns = {factor: row for row, factor in enumerate(factors)}
+    matrix = np.zeros((len(factors), len(scenarios)))
+    for column, scenario in enumerate(scenarios):
+        for factor, shock in scenario.shocks.items():
+            matrix[columns[factor], column] = shock
+    return matrix
+
+
+def run_stress(book: StressBook, scenarios: Sequence[StressScenario]) -> StressResult:
+    """Revalue ``book`` under every scenario with one sensitivity x shock product."""
+
+    shocks = shock_matrix(scenarios, book.factors)
+    pnl = book.sensitivities @ shocks
+    # Linear in the shocks, so each factor's P/L only needs its column sum of sensitivities.
+    factor_pnl = book.sensitivities.sum(axis=0)[:, None] * shocks
+    return StressResult(
+        scenarios=tuple(scenario.name for scenario in scenarios),
+        pnl=pnl,
+        totals=pnl.sum(axis=0),
+        factor_pnl=factor_pnl,
+    )
@@ -0,0 +1,86 @@
+"""What-if revaluation of portfolio VaR for hypothetical position changes."""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from ..core.constants import VAR_CONFIDENCE
+from .allocation import euler_allocation, var_tail_weights
+
+
+@dataclass(frozen=True)
+class BookScenarios:
+    """A book's scenario matrix with its portfolio vector and base allocation.
+
+    Built once per ``(as_of, data_version)`` and shared read-only between
+    requests; :func:`what_if` never copies ``pnl``.
+    """
+
+    rics: tuple[str, ...]
+    pnl: np.ndarray
+    portfolio_pnl: np.ndarray
+    base_var: float
+    base_component_var: np.ndarray
+    confidence: float = VAR_CONFIDENCE
+    index: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_matrix(
+        cls, rics: Sequence[str], pnl: ArrayLike, confidence: float = VAR_CONFIDENCE
+    ) -> BookScenarios:
+        matrix = np.array(pnl, dtype=np.float64)
+        matrix.setflags(write=False)
+        portfolio = matrix.sum(axis=0)
+        portfolio.setflags(write=False)
+        allocation = euler_allocation(matrix, confidence=confidence)
+        return cls(
+            rics=tuple(rics),
+            pnl=matrix,
+            portfolio_pnl=portfolio,
+            base_var=allocation.portfolio_var,
+            base_component_var=allocation.component_var,
+            confidence=confidence,
+            index={ric: row for row, ric in enumerate(rics)},
+        )
+
+
+@dataclass(frozen=True)
+class WhatIfResult:
+    """Portfolio VaR and per-RIC component VaR after applying position deltas."""
+
+    base_var: float
+    new_var: float
+    position_scale: np.ndarray
+    component_var: np.ndarray
+
+    @property
+    def incremental_var(self) -> float:
+        return self.new_var - self.base_var
+
+
+def what_if(book: BookScenarios, deltas: Mapping[str, float]) -> WhatIfResult:
+    """Revalue ``book`` with ``deltas`` (fractions of current exposure per RIC).
+
+    Scaling RIC ``i`` by ``1 + delta`` moves the portfolio vector by
+    ``delta * pnl[i]``, so only the touched rows are read (one rank-1 update
+    per delta). Components come from one matrix-vector product against the new
+    tail weights. Raises ``KeyError`` for RICs outside the book.
+    """
+
+    rows = np.array([book.index[ric] for ric in deltas], dtype=np.intp)
+    changes = np.fromiter(deltas.values(), dtype=np.float64, count=len(rows))
+    scale = np.ones(len(book.rics))
+    np.add.at(scale, rows, changes)
+
+    portfolio = book.portfolio_pnl + changes @ book.pnl[rows] if rows.size else book.portfolio_pnl
+    tail = var_tail_weights(portfolio, book.confidence)
+    component = -(book.pnl @ tail.weights) * scale * tail.scale
+    return WhatIfResult(
+        base_var=book.base_var,
+        new_var=tail.portfolio_var,
+        position_scale=scale,
+        component_var=component,
+    )
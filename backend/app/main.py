@@ -2,9 +2,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .api.async_routes import with_async_overrides
+from .api.middleware import CompressionMiddleware, ConditionalGetMiddleware
 from .api.routes import router as api_router
+from .api.stream import router as stream_router
 from .core.config import settings
-from .db.seed import init_db
+from .db.seed import ensure_db
 
 app = FastAPI(title=settings.app_name)
 
@@ -15,8 +18,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last = outermost: compression wraps the conditional-GET layer so ETags get per-encoding suffixes.
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    cache_size=settings.compression_cache_size,
+)
 
-app.include_router(api_router, prefix=settings.api_v1_str)
+app.include_router(
+    with_async_overrides(api_router) if settings.db_async else api_router,
+    prefix=settings.api_v1_str,
+)
+app.include_router(stream_router, prefix=settings.api_v1_str)
 
 
 @app.get("/health", tags=["system"])
@@ -28,6 +42,6 @@ def healthcheck() -> dict[str, str]:
 
 @app.on_event("startup")
 def on_startup() -> None:
-    """Ensure database schema and demo data are ready."""
+    """Ensure the database schema is current; seed only an empty database."""
 
-    init_db()
+    ensure_db()
@@ -1,10 +1,14 @@
 """Pydantic models for Value at Risk domain objects."""
 from datetime import date
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
 
+# historical: equal-weighted scenario window; fhs: EWMA filtered historical simulation.
+Methodology = Literal["historical", "fhs"]
+
+
 class DriverBreakdown(BaseModel):
     """Quantifies contribution of each driver category."""
 
@@ -14,6 +18,20 @@ class DriverBreakdown(BaseModel):
     ranking_shift: float = 0.0
 
 
+class TailMeasure(BaseModel):
+    """VaR and expected shortfall (positive losses) at one confidence level."""
+
+    confidence: float
+    var: float
+    expected_shortfall: float
+
+
+class RiskMeasure(TailMeasure):
+    """Tail measure for a holding period; multi-day figures are square-root-of-time scaled."""
+
+    horizon_days: int = 1
+
+
 class AssetVaR(BaseModel):
     """VaR value at asset level."""
 
@@ -24,6 +42,10 @@ class AssetVaR(BaseModel):
     change_amount: float
     change_pct: float
     contributions: DriverBreakdown
+    component_var: float = Field(0.0, description="Euler contribution to portfolio VaR; sums to the total")
+    marginal_var: float = Field(0.0, description="Portfolio VaR change per unit of position")
+    diversification_benefit: float = Field(0.0, description="Standalone VaR minus component VaR")
+    risk_measures: List[RiskMeasure] = Field(default_factory=list)
 
 
 class PortfolioVaR(BaseModel):
@@ -35,6 +57,7 @@ class PortfolioVaR(BaseModel):
     diversification_effect: float = Field(
         ..., description="Difference between sum of asset VaR and portfolio VaR"
     )
+    risk_measures: List[RiskMeasure] = Field(default_factory=list)
 
 
 class MarketSignal(BaseModel):
@@ -61,8 +84,14 @@ class VaRSummaryResponse(BaseModel):
     as_of: date
     portfolio: PortfolioVaR
     assets: List[AssetVaR]
+    asset_count: int = Field(0, description="Assets in the snapshot (``assets`` may be limited by ``top``)")
+    category_counts: Dict[str, int] = Field(default_factory=dict)
+    top_rics: List[str] = Field(default_factory=list, description="RICs ranked by descending VaR amount")
     market_signal: MarketSignal
     driver_commentary: DriverCommentary
+    methodology: Methodology = Field(
+        "historical", description="fhs: VaR figures from EWMA-filtered scenarios; drivers stay historical"
+    )
 
 
 class VaRTimeSeriesPoint(BaseModel):
@@ -80,6 +109,24 @@ class VaRTimeSeriesResponse(BaseModel):
     points: List[VaRTimeSeriesPoint]
 
 
+class VaRTimeSeriesColumns(BaseModel):
+    """Column-wise time series returned for ``Accept: application/vnd.var.columns+json`` / msgpack."""
+
+    ric: str
+    dates: List[date]
+    values: List[float]
+    changes: List[Optional[float]]
+
+
+class VaRTimeSeriesBatchResponse(BaseModel):
+    """Columnar time series for several RICs sharing one date axis."""
+
+    dates: List[date]
+    series: Dict[str, List[Optional[float]]] = Field(
+        ..., description="RIC -> values aligned with dates (null where the RIC has no point)"
+    )
+
+
 class NewsItem(BaseModel):
     """News headline related to VaR movements."""
 
@@ -95,3 +142,185 @@ class ScenarioDistributionResponse(BaseModel):
 
     ric: str
     values: List[float]
+    methodology: Methodology = "historical"
+
+
+class ScenarioHistogramResponse(BaseModel):
+    """Server-side binned scenario distribution with box-plot and tail statistics."""
+
+    ric: str
+    as_of: Optional[date] = None
+    sample_count: int
+    edges: List[float] = Field(..., description="Bucket boundaries (bins + 1 values)")
+    counts: List[int]
+    minimum: float
+    maximum: float
+    quartiles: List[float] = Field(..., description="25th, 50th and 75th percentiles")
+    tail_measures: List[TailMeasure]
+    methodology: Methodology = "historical"
+
+
+class WhatIfRequest(BaseModel):
+    """Hypothetical position changes to revalue against the cached scenario matrix."""
+
+    as_of: Optional[date] = None
+    deltas: Dict[str, float] = Field(
+        ..., description="RIC -> relative exposure change (0.1 = +10%, -1 = close out)"
+    )
+
+
+class WhatIfAsset(BaseModel):
+    """Component VaR of one RIC before and after the hypothetical trade."""
+
+    ric: str
+    position_scale: float
+    base_component_var: float
+    component_var: float
+
+
+class WhatIfResponse(BaseModel):
+    """Portfolio VaR before and after applying ``WhatIfRequest.deltas``."""
+
+    as_of: Optional[date] = None
+    base_var: float
+    new_var: float
+    incremental_var: float
+    assets: List[WhatIfAsset]
+
+
+class BacktestRicResult(BaseModel):
+    """Exceptions, traffic-light zone and coverage tests of one RIC's VaR forecasts."""
+
+    ric: str
+    observations: int
+    exceptions: int
+    exception_rate: float
+    zone: Optional[Literal["green", "yellow", "red"]] = Field(
+        description="Basel traffic light; null without observations in the window"
+    )
+    kupiec_lr: Optional[float]
+    kupiec_pvalue: Optional[float]
+    independence_lr: Optional[float] = Field(description="Christoffersen independence likelihood ratio")
+    independence_pvalue: Optional[float]
+    conditional_coverage_lr: Optional[float]
+    conditional_coverage_pvalue: Optional[float]
+    exception_dates: List[date]
+
+
+class BacktestResponse(BaseModel):
+    """Backtest of every requested RIC over the latest ``days`` realised P/L dates."""
+
+    confidence: float
+    start: date
+    end: date
+    days: int
+    zone_counts: Dict[str, int]
+    results: List[BacktestRicResult] = Field(description="Worst first: red zone, then most exceptions")
+
+
+class MonteCarloAsset(BaseModel):
+    ric: str
+    component_var: float
+
+
+class MonteCarloVaRResponse(BaseModel):
+    """Simulated portfolio VaR/ES with each RIC's component VaR at ``confidence``.
+
+    Each RIC keeps its historical scenario distribution; ``method`` names the
+    correlation factor that ties the RICs together.
+    """
+
+    as_of: Optional[date] = None
+    paths: int
+    seed: int
+    method: Literal["cholesky", "scenario"] = Field(
+        description="cholesky: Cholesky factor of the correlation; "
+        "scenario: standardised centred scenarios (more RICs than scenarios)"
+    )
+    factor_rank: int
+    confidence: float
+    tail_measures: List[TailMeasure]
+    assets: List[MonteCarloAsset]
+
+
+class StressScenarioDefinition(BaseModel):
+    """Named factor shocks by category: bp for 金利/クレジット/モーゲージ, % for 株式/コモディティ."""
+
+    name: str
+    shocks: Dict[str, float] = Field(..., description='e.g. {"金利": 100, "株式": -20}')
+
+
+class StressRequest(BaseModel):
+    """Stress scenarios to revalue against the sensitivities of one snapshot."""
+
+    as_of: Optional[date] = None
+    scenarios: List[StressScenarioDefinition] = Field(..., min_length=1, max_length=1000)
+    top: int = Field(5, ge=0, le=100, description="Largest-loss RICs returned per scenario")
+
+
+class StressAssetPnL(BaseModel):
+    ric: str
+    pnl: float
+
+
+class StressScenarioResult(BaseModel):
+    """Book P/L of one scenario with its per-factor split and largest-loss RICs."""
+
+    name: str
+    rank: int
+    total_pnl: float
+    factor_pnl: Dict[str, float]
+    worst_assets: List[StressAssetPnL]
+
+
+class StressResponse(BaseModel):
+    """Scenario results ranked from the largest loss to the largest gain."""
+
+    as_of: Optional[date] = None
+    asset_count: int
+    factor_units: Dict[str, str]
+    scenarios: List[StressScenarioResult]
+
+
+class HierarchyNode(BaseModel):
+    """A child node: its VaR/ES from its own aggregated scenarios and its share of the parent's VaR."""
+
+    label: str
+    path: List[str]
+    level: str = Field(description="desk / category / ric")
+    leaf_count: int
+    var: float
+    expected_shortfall: float
+    component_var: float = Field(description="Euler contribution to the parent's VaR; children sum to it")
+    has_children: bool
+
+
+class HierarchyResponse(BaseModel):
+    """One drill-down level: a node and its direct children ordered by VaR."""
+
+    as_of: Optional[date] = None
+    levels: List[str]
+    path: List[str]
+    var: float
+    expected_shortfall: float
+    standalone_var: float
+    diversification_effect: float
+    children: List[HierarchyNode]
+
+
+class SnapshotEvent(BaseModel):
+    """``snapshot`` stream event: dates whose VaR data changed."""
+
+    data_version: int
+    dates: List[date] = Field(
+        default_factory=list, description="Written as_of dates (empty when written by another process)"
+    )
+    latest: Optional[date] = None
+    portfolio: Optional[PortfolioVaR] = Field(None, description="Portfolio figures of ``latest`` (delta)")
+
+
+class NewsEvent(BaseModel):
+    """``news`` stream event carrying the inserted items."""
+
+    data_version: int
+    items: List[NewsItem]
@@ -0,0 +1 @@
+"""Load and latency benchmarks for the VaR API (``python -m benchmarks.run``)."""
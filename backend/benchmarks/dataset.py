@@ -0,0 +1,14 @@
+"""Seed a benchmark database at a configurable scale."""
+from __future__ import annotations
+
+from app.db.schema import reset_schema
+from app.db.session import SessionLocal
+from app.db.synthetic import SyntheticConfig, SyntheticSummary, generate_synthetic_data
+
+
+def seed_benchmark_db(config: SyntheticConfig) -> SyntheticSummary:
+    """Rebuild the schema and load synthetic data described by ``config``."""
+
+    reset_schema()
+    with SessionLocal() as session:
+        return generate_synthetic_data(session, config)
@@ -0,0 +1,50 @@
+"""Latency statistics and baseline comparison for benchmark runs."""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+import numpy as np
+
+#: Metrics compared against a baseline, and whether larger values are better.
+REGRESSION_METRICS = {"p50_ms": False, "p99_ms": False, "throughput_rps": True}
+
+
+def latency_summary(latencies: Sequence[float], errors: int, elapsed: float) -> dict[str, float | int]:
+    """Summarise per-request latencies (seconds) measured over ``elapsed`` seconds."""
+
+    samples = np.asarray(latencies, dtype=np.float64) * 1000.0
+    p50, p99 = np.percentile(samples, [50, 99]) if samples.size else (0.0, 0.0)
+    return {
+        "requests": int(samples.size),
+        "errors": errors,
+        "p50_ms": round(float(p50), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(samples.max()), 3) if samples.size else 0.0,
+        "throughput_rps": round(samples.size / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def find_regressions(
+    current: Mapping[str, Any], baseline: Mapping[str, Any], tolerance: float
+) -> list[str]:
+    """Return a message for every endpoint metric worse than ``baseline`` by ``tolerance``."""
+
+    messages: list[str] = []
+    if baseline.get("config") != current.get("config"):
+        messages.append("config differs from baseline; comparison is not like for like")
+    for endpoint, before in baseline.get("endpoints", {}).items():
+        after = current.get("endpoints", {}).get(endpoint)
+        if after is None:
+            messages.append(f"{endpoint}: missing from current run")
+            continue
+        if after.get("errors"):
+            messages.append(f"{endpoint}: {after['errors']} failed requests")
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                messages.append(f"{endpoint}: {metric} {old} -> {new} ({change:+.0%})")
+    return messages
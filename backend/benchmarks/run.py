@@ -0,0 +1,229 @@
+"""Drive the read endpoints with concurrent clients and report latency as JSON.
+
+Example::
+
+    uv run python -m benchmarks.run --assets 200 --snapshot-days 20 --clients 16 \\
+        --requests 500 --output bench.json --baseline bench-previous.json
+
+``--mode asgi`` (default) serves the app in-process through ``httpx.ASGITransport``;
+``--mode uvicorn`` starts a real server so sockets, workers and serialisation are
+all included. The exit status is 1 when ``--baseline`` shows a regression.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import httpx
+
+from .report import find_regressions, latency_summary
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+API_PREFIX = "/api/v1"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=1000, help="number of RICs to seed")
+    parser.add_argument("--snapshot-days", type=int, default=5, help="number of VaR snapshots")
+    parser.add_argument("--window", type=int, default=800, help="scenario window length (SCENARIO_WINDOW)")
+    parser.add_argument("--history-days", type=int, default=121, help="time series points per RIC")
+    parser.add_argument("--seed", type=int, default=20240401, help="synthetic data seed")
+    parser.add_argument("--chunk-size", type=int, default=500, help="assets generated per write chunk")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients per endpoint")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="benchmark database (default: temporary SQLite file)")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the data already in --database-url")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    return parser
+
+
+def endpoint_plan(rics: list[str]) -> dict[str, tuple[str, dict[str, Any]]]:
+    """Return ``name -> (path, query params)`` for every benchmarked endpoint."""
+
+    from app.core.constants import PORTFOLIO_AGGREGATE_RIC
+
+    return {
+        "summary": ("/var/summary", {}),
+        "timeseries": ("/var/timeseries", {"ric": PORTFOLIO_AGGREGATE_RIC, "days": 30}),
+        "timeseries_batch": ("/var/timeseries/batch", {"rics": ",".join(rics[:10]), "days": 30}),
+        "scenario_distribution": ("/var/scenario-distribution", {"ric": PORTFOLIO_AGGREGATE_RIC}),
+        "scenario_histogram": ("/var/scenario-distribution/histogram", {"ric": PORTFOLIO_AGGREGATE_RIC}),
+        "dates": ("/var/dates", {}),
+        "news": ("/news", {"limit": 10}),
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient, path: str, params: dict[str, Any], total: int, clients: int
+) -> tuple[list[float], int, float]:
+    """Issue ``total`` GETs from ``clients`` concurrent workers; return latencies, errors, elapsed."""
+
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, clients))))
+    return latencies, errors, time.perf_counter() - started
+
+
+@asynccontextmanager
+async def open_client(args: argparse.Namespace, database_url: str) -> AsyncIterator[httpx.AsyncClient]:
+    if args.mode == "asgi":
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url=f"http://bench{API_PREFIX}") as client:
+            yield client
+        return
+
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "SEED_ON_STARTUP": "false"}
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(port), "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(base_url=f"{base_url}{API_PREFIX}", limits=limits) as client:
+            await _wait_until_healthy(client, f"{base_url}/health", server)
+            yield client
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def _wait_until_healthy(
+    client: httpx.AsyncClient, url: str, server: subprocess.Popen, timeout: float = 60.0
+) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become healthy in time")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(mode: str) -> float:
+    """Peak RSS of this process (asgi) or of the reaped server processes (uvicorn)."""
+
+    who = resource.RUSAGE_SELF if mode == "asgi" else resource.RUSAGE_CHILDREN
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_benchmarks(args: argparse.Namespace, database_url: str, rics: list[str]) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    async with open_client(args, database_url) as client:
+        for name, (path, params) in endpoint_plan(rics).items():
+            await drive(client, path, params, args.warmup, args.clients)
+            latencies, errors, elapsed = await drive(client, path, params, args.requests, args.clients)
+            results[name] = {"path": path, **latency_summary(latencies, errors, elapsed)}
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    workdir = tempfile.TemporaryDirectory(prefix="var-bench-")
+    database_url = args.database_url or f"sqlite:///{Path(workdir.name) / 'bench.db'}"
+    # The engine is bound at import time, so the URL must be set before importing app modules.
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SEED_ON_STARTUP"] = "false"
+
+    from app.db.synthetic import SyntheticConfig, synthetic_ric
+
+    from .dataset import seed_benchmark_db
+
+    seed_seconds = None
+    if not args.skip_seed:
+        config = SyntheticConfig(
+            assets=args.assets,
+            snapshot_days=args.snapshot_days,
+            history_days=args.history_days,
+            window=args.window,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+        )
+        seed_seconds = round(seed_benchmark_db(config).seconds, 3)
+    rics = [synthetic_ric(index) for index in range(min(args.assets, 10))]
+
+    endpoints = asyncio.run(run_benchmarks(args, database_url, rics))
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "assets", "snapshot_days", "window", "history_days", "seed", "clients", "requests", "mode", "workers"
+            )
+        },
+        "seed_seconds": seed_seconds,
+        "peak_rss_mb": peak_rss_mb(args.mode),
+        "endpoints": endpoints,
+    }
+    workdir.cleanup()
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
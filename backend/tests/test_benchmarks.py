@@ -0,0 +1,47 @@
+"""Checks for the benchmark report helpers (no database required)."""
+from __future__ import annotations
+
+import unittest
+
+from benchmarks.report import find_regressions, latency_summary
+
+
+class BenchmarkReportTests(unittest.TestCase):
+    def test_latency_summary_percentiles(self) -> None:
+        latencies = [index / 1000 for index in range(1, 101)]
+        summary = latency_summary(latencies, errors=2, elapsed=2.0)
+
+        self.assertEqual(summary["requests"], 100)
+        self.assertEqual(summary["errors"], 2)
+        self.assertAlmostEqual(summary["p50_ms"], 50.5)
+        self.assertAlmostEqual(summary["p99_ms"], 99.01)
+        self.assertEqual(summary["max_ms"], 100.0)
+        self.assertEqual(summary["throughput_rps"], 50.0)
+
+    def test_latency_summary_empty(self) -> None:
+        summary = latency_summary([], errors=0, elapsed=0.0)
+        self.assertEqual(summary["requests"], 0)
+        self.assertEqual(summary["throughput_rps"], 0.0)
+
+    def test_find_regressions_respects_tolerance(self) -> None:
+        config = {"assets": 20}
+        baseline = {"config": config, "endpoints": {"summary": {"p50_ms": 10.0, "p99_ms": 20.0, "throughput_rps": 500.0}}}
+        within = {"config": config, "endpoints": {"summary": {"p50_ms": 11.0, "p99_ms": 24.0, "throughput_rps": 420.0, "errors": 0}}}
+        slower = {"config": config, "endpoints": {"summary": {"p50_ms": 10.0, "p99_ms": 30.0, "throughput_rps": 300.0, "errors": 0}}}
+
+        self.assertEqual(find_regressions(within, baseline, tolerance=0.25), [])
+        messages = find_regressions(slower, baseline, tolerance=0.25)
+        self.assertEqual(len(messages), 2)
+        self.assertTrue(messages[0].startswith("summary: p99_ms"))
+        self.assertIn("throughput_rps", messages[1])
+
+    def test_find_regressions_flags_missing_endpoints_and_config_changes(self) -> None:
+        baseline = {"config": {"assets": 20}, "endpoints": {"news": {"p50_ms": 1.0}}}
+        messages = find_regressions({"config": {"assets": 40}, "endpoints": {}}, baseline, tolerance=0.25)
+        self.assertEqual(len(messages), 2)
+        self.assertIn("config differs", messages[0])
+        self.assertIn("news: missing", messages[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
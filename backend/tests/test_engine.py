@@ -0,0 +1,561 @@
+"""Unit checks for the vectorised VaR engine."""
+from __future__ import annotations
+
+import math
+import unittest
+
+import numpy as np
+
+from app.core.constants import SCENARIO_WINDOW
+from app.engine import (
+    DESKS,
+    FACTORS,
+    NO_DATA_ZONE,
+    STRESS_FACTORS,
+    ZONES,
+    AggregationTree,
+    BookScenarios,
+    EwmaState,
+    IncrementalVaRTracker,
+    MonteCarloModel,
+    StreamingTail,
+    StressBook,
+    StressScenario,
+    TailOrderStatistic,
+    attribute_roll,
+    backtest_var,
+    binomial_cdf,
+    compute_historical_var,
+    compute_tail_measures,
+    euler_allocation,
+    group_labels,
+    monte_carlo_var,
+    round_to_total,
+    run_stress,
+    shock_matrix,
+    summarise_distribution,
+    tail_count,
+    var_tail_weights,
+    what_if,
+)
+
+
+class HistoricalVaRTests(unittest.TestCase):
+    """Compares the batched engine with a straightforward sort-based reference."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(7)
+        self.pnl = rng.standard_normal((12, SCENARIO_WINDOW)) * rng.uniform(0.5, 3.0, size=(12, 1))
+
+    def test_tail_count_matches_window(self) -> None:
+        self.assertEqual(tail_count(SCENARIO_WINDOW, 0.99), 8)
+        self.assertEqual(tail_count(SCENARIO_WINDOW, 0.975), 20)
+        self.assertEqual(tail_count(10, 0.999), 1)
+
+    def test_matches_sorted_reference(self) -> None:
+        result = compute_historical_var(self.pnl, confidence=0.99)
+        k = tail_count(SCENARIO_WINDOW, 0.99)
+        ordered = np.sort(self.pnl, axis=1)
+
+        np.testing.assert_allclose(result.asset_var, -ordered[:, k - 1])
+        np.testing.assert_allclose(result.asset_es, -ordered[:, :k].mean(axis=1))
+        portfolio_sorted = np.sort(self.pnl.sum(axis=0))
+        self.assertAlmostEqual(result.portfolio_var, -portfolio_sorted[k - 1])
+        self.assertAlmostEqual(result.portfolio_es, -portfolio_sorted[:k].mean())
+
+    def test_diversification_effect_is_not_positive_for_independent_assets(self) -> None:
+        result = compute_historical_var(self.pnl)
+        self.assertLess(result.diversification_effect, 0)
+        self.assertAlmostEqual(result.portfolio_var, result.standalone_total + result.diversification_effect)
+        self.assertTrue(np.all(result.asset_es >= result.asset_var))
+
+    def test_tail_measures_cover_every_level_in_one_pass(self) -> None:
+        levels = (0.95, 0.975, 0.99)
+        measures = compute_tail_measures(self.pnl, levels)
+        ordered = np.sort(self.pnl, axis=1)
+        for column, level in enumerate(levels):
+            k = tail_count(SCENARIO_WINDOW, level)
+            np.testing.assert_allclose(measures.var[:, column], -ordered[:, k - 1])
+            np.testing.assert_allclose(measures.es[:, column], -ordered[:, :k].mean(axis=1))
+
+    def test_tail_measures_select_levels_and_scale_horizons(self) -> None:
+        measures = compute_tail_measures(self.pnl)
+        var_99, es_99 = measures.at(0.99)
+        np.testing.assert_allclose(var_99, compute_historical_var(self.pnl).asset_var)
+        ten_day = measures.scaled_to(10)
+        self.assertEqual(ten_day.horizon_days, 10)
+        np.testing.assert_allclose(ten_day.at(0.99)[1], es_99 * np.sqrt(10))
+        np.testing.assert_allclose(ten_day.scaled_to(1).var, measures.var)
+
+    def test_distribution_summary_bins_every_sample(self) -> None:
+        summary = summarise_distribution(self.pnl[0], bins=24)
+        self.assertEqual(summary.counts.sum(), SCENARIO_WINDOW)
+        self.assertEqual(len(summary.edges), 25)
+        self.assertEqual(summary.edges[0], summary.minimum)
+        self.assertEqual(summary.edges[-1], summary.maximum)
+        self.assertTrue(summary.quartiles[0] <= summary.quartiles[1] <= summary.quartiles[2])
+
+    def test_rejects_invalid_input(self) -> None:
+        with self.assertRaises(ValueError):
+            compute_historical_var(np.zeros(SCENARIO_WINDOW))
+        with self.assertRaises(ValueError):
+            tail_count(SCENARIO_WINDOW, 1.5)
+
+
+class IncrementalVaRTests(unittest.TestCase):
+    """Checks the rolling tracker against full recomputation."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(11)
+        self.history = rng.standard_normal(SCENARIO_WINDOW + 60)
+        self.positions = 1.0 + 0.2 * np.sin(np.arange(61) / 3)
+
+    def test_order_statistic_tracks_sorted_window(self) -> None:
+        values = self.history[:50]
+        tracker = TailOrderStatistic.from_values(values.tolist(), 5)
+        for step in range(40):
+            tracker.remove(step)
+            tracker.insert(self.history[50 + step], 50 + step)
+            window = self.history[step + 1 : 51 + step]
+            self.assertEqual(tracker.kth()[0], np.sort(window)[4])
+        self.assertEqual(len(tracker), 50)
+
+    def test_roll_matches_full_recomputation(self) -> None:
+        tracker = IncrementalVaRTracker(self.history[:SCENARIO_WINDOW], self.positions[0])
+        for day in range(1, 61):
+            previous = tracker.var
+            attribution = tracker.roll(self.history[SCENARIO_WINDOW + day - 1], self.positions[day])
+            window = self.history[day : day + SCENARIO_WINDOW] * self.positions[day]
+            expected = compute_historical_var(window[None, :]).asset_var[0]
+            self.assertAlmostEqual(tracker.var, expected, places=12)
+            self.assertAlmostEqual(attribution.total, tracker.var - previous, places=12)
+            self.assertAlmostEqual(attribution.ranking_shift, 0.0, places=12)
+
+    def test_position_flip_attributes_ranking_shift(self) -> None:
+        tracker = IncrementalVaRTracker(self.history[:SCENARIO_WINDOW], 1.0)
+        attribution = tracker.roll(self.history[SCENARIO_WINDOW], -1.0)
+        expected = compute_historical_var(-self.history[None, 1 : SCENARIO_WINDOW + 1]).asset_var[0]
+        self.assertAlmostEqual(tracker.var, expected, places=12)
+        self.assertNotAlmostEqual(attribution.ranking_shift, 0.0)
+
+    def test_attribute_roll_matches_tracker(self) -> None:
+        rng = np.random.default_rng(5)
+        unit = rng.standard_normal((6, SCENARIO_WINDOW + 1))
+        old = np.array([1.0, 0.8, 1.3, -0.5, 1.0, -1.2])
+        new = np.array([1.1, 0.8, 0.9, -0.7, -1.0, 1.2])
+        batch = attribute_roll(unit[:, :SCENARIO_WINDOW], unit[:, SCENARIO_WINDOW], old, new)
+        for row in range(unit.shape[0]):
+            tracker = IncrementalVaRTracker(unit[row, :SCENARIO_WINDOW], old[row])
+            expected = tracker.roll(unit[row, SCENARIO_WINDOW], new[row])
+            self.assertAlmostEqual(batch.window_drop[row], expected.window_drop, places=12)
+            self.assertAlmostEqual(batch.window_add[row], expected.window_add, places=12)
+            self.assertAlmostEqual(batch.position_change[row], expected.position_change, places=12)
+            self.assertAlmostEqual(batch.ranking_shift[row], expected.ranking_shift, places=12)
+            self.assertAlmostEqual(batch.var[row], tracker.var, places=12)
+
+
+class EulerAllocationTests(unittest.TestCase):
+    """Component VaR must add up to the portfolio VaR for every weighting scheme."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(23)
+        market = rng.standard_normal(SCENARIO_WINDOW)
+        self.positions = rng.uniform(0.5, 2.0, 12)
+        unit = 0.7 * market + 0.7 * rng.standard_normal((12, SCENARIO_WINDOW))
+        unit[3] *= -1  # a hedge
+        self.pnl = unit * self.positions[:, None]
+        self.portfolio_var = compute_historical_var(self.pnl).portfolio_var
+
+    def test_components_sum_to_portfolio_var(self) -> None:
+        for kernel in (True, False):
+            allocation = euler_allocation(self.pnl, self.positions, kernel=kernel)
+            self.assertAlmostEqual(allocation.portfolio_var, self.portfolio_var, places=12)
+            self.assertAlmostEqual(allocation.component_var.sum(), self.portfolio_var, places=9)
+            self.assertAlmostEqual(
+                allocation.diversification_benefit.sum(),
+                allocation.standalone_var.sum() - self.portfolio_var,
+                places=9,
+            )
+            np.testing.assert_allclose(allocation.marginal_var * self.positions, allocation.component_var)
+        self.assertLess(allocation.component_var[3], allocation.standalone_var[3])
+
+    def test_point_estimate_uses_var_scenario(self) -> None:
+        portfolio = self.pnl.sum(axis=0)
+        scenario = int(np.argsort(portfolio)[tail_count(SCENARIO_WINDOW, 0.99) - 1])
+        allocation = euler_allocation(self.pnl, kernel=False)
+        np.testing.assert_allclose(allocation.component_var, -self.pnl[:, scenario])
+
+    def test_chunks_share_the_book_tail(self) -> None:
+        full = euler_allocation(self.pnl, self.positions)
+        tail = var_tail_weights(self.pnl.sum(axis=0))
+        parts = [
+            euler_allocation(self.pnl[rows], self.positions[rows], tail=tail).component_var
+            for rows in (slice(0, 5), slice(5, 12))
+        ]
+        np.testing.assert_allclose(np.concatenate(parts), full.component_var)
+
+    def test_round_to_total_preserves_sum(self) -> None:
+        values = np.array([1.004, 2.004, 3.004, -0.333])
+        rounded = round_to_total(values)
+        self.assertAlmostEqual(rounded.sum(), round(values.sum(), 2), places=9)
+        self.assertTrue(np.all(np.abs(rounded - values) < 0.01))
+
+
+class WhatIfTests(unittest.TestCase):
+    """Rank-1 what-if revaluation must match a full recomputation."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(31)
+        market = rng.standard_normal(SCENARIO_WINDOW)
+        self.pnl = 0.6 * market + 0.8 * rng.standard_normal((8, SCENARIO_WINDOW))
+        self.rics = [f"RIC{i}" for i in range(8)]
+        self.book = BookScenarios.from_matrix(self.rics, self.pnl)
+
+    def test_matches_full_recomputation(self) -> None:
+        result = what_if(self.book, {"RIC2": 0.5, "RIC5": -1.0})
+        scale = np.ones(8)
+        scale[2], scale[5] = 1.5, 0.0
+        expected = euler_allocation(self.pnl * scale[:, None])
+        self.assertAlmostEqual(result.new_var, expected.portfolio_var, places=9)
+        np.testing.assert_allclose(result.component_var, expected.component_var, atol=1e-9)
+        self.assertAlmostEqual(result.component_var.sum(), result.new_var, places=9)
+        self.assertEqual(result.component_var[5], 0.0)
+        self.assertAlmostEqual(result.incremental_var, result.new_var - self.book.base_var)
+
+    def test_empty_deltas_return_base(self) -> None:
+        result = what_if(self.book, {})
+        self.assertEqual(result.incremental_var, 0.0)
+        np.testing.assert_allclose(result.component_var, self.book.base_component_var)
+
+    def test_matrix_is_shared_read_only(self) -> None:
+        self.assertFalse(self.book.pnl.flags.writeable)
+        with self.assertRaises(KeyError):
+            what_if(self.book, {"UNKNOWN": 0.1})
+
+
+class BacktestTests(unittest.TestCase):
+    """Vectorised coverage tests agree with their textbook per-series forms."""
+
+    def test_kupiec_and_basel_zones(self) -> None:
+        forecasts = np.ones((4, 250))
+        realized = np.zeros((4, 250))
+        for row, exceptions in enumerate((4, 5, 9, 10)):
+            realized[row, :exceptions] = -2.0
+        result = backtest_var(forecasts, realized, confidence=0.99)
+
+        self.assertEqual(result.exception_counts.tolist(), [4, 5, 9, 10])
+        self.assertEqual([ZONES[zone] for zone in result.zones], ["green", "yellow", "yellow", "red"])
+        x, n, p = 4, 250, 0.01
+        expected = -2 * ((n - x) * math.log(1 - p) + x * math.log(p) - (n - x) * math.log(1 - x / n) - x * math.log(x / n))
+        self.assertAlmostEqual(result.kupiec_lr[0], expected)
+        self.assertAlmostEqual(result.kupiec_pvalue[0], math.erfc(math.sqrt(expected / 2)))
+
+    def test_independence_matches_transition_counts(self) -> None:
+        rng = np.random.default_rng(5)
+        forecasts = np.full((30, 200), 1.5)
+        realized = rng.standard_normal((30, 200))
+        realized[rng.random((30, 200)) < 0.05] = np.nan
+        result = backtest_var(forecasts, realized, confidence=0.9)
+
+        for row in range(30):
+            hits = [None if math.isnan(value) else value < -1.5 for value in realized[row]]
+            counts = {(a, b): 0 for a in (False, True) for b in (False, True)}
+            for previous, current in zip(hits, hits[1:]):
+                if previous is not None and current is not None:
+                    counts[previous, current] += 1
+            n00, n01, n10, n11 = (counts[key] for key in sorted(counts))
+            pi01, pi11 = n01 / (n00 + n01), (n11 / (n10 + n11) if n10 + n11 else 0.0)
+            pi = (n01 + n11) / (n00 + n01 + n10 + n11)
+
+            def xlogy(k: int, q: float) -> float:
+                return k * math.log(q) if k else 0.0
+
+            expected = -2 * (
+                xlogy(n00 + n10, 1 - pi)
+                + xlogy(n01 + n11, pi)
+                - xlogy(n00, 1 - pi01)
+                - xlogy(n01, pi01)
+                - xlogy(n10, 1 - pi11)
+                - xlogy(n11, pi11)
+            )
+            self.assertAlmostEqual(result.independence_lr[row], max(expected, 0.0), places=9)
+            self.assertEqual(result.observations[row], sum(hit is not None for hit in hits))
+        self.assertTrue(np.allclose(result.conditional_coverage_lr, result.kupiec_lr + result.independence_lr))
+
+    def test_binomial_cdf_is_a_distribution(self) -> None:
+        cdf = binomial_cdf(1000, 0.01)
+        self.assertAlmostEqual(cdf[-1], 1.0)
+        self.assertTrue(np.all(np.diff(cdf) >= 0))
+        self.assertAlmostEqual(cdf[0], 0.99**1000)
+
+
+    def test_ric_without_observations_has_no_zone(self) -> None:
+        forecasts = np.ones((2, 30))
+        realized = np.zeros((2, 30))
+        forecasts[1] = np.nan
+        result = backtest_var(forecasts, realized)
+        self.assertEqual(result.observations.tolist(), [30, 0])
+        self.assertEqual(result.zones.tolist(), [ZONES.index("green"), NO_DATA_ZONE])
+        self.assertFalse(np.isnan(result.kupiec_lr[0]))
+        for statistic in (result.kupiec_lr, result.independence_pvalue, result.conditional_coverage_pvalue):
+            self.assertTrue(np.isnan(statistic[1]))
+
+class StressTests(unittest.TestCase):
+    """One sensitivity x shock product must match per-scenario revaluation."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(17)
+        self.pnl = rng.standard_normal((12, SCENARIO_WINDOW)) * np.arange(1, 13)[:, None]
+        self.categories = [FACTORS[row % len(FACTORS)] for row in range(12)]
+        self.book = StressBook.from_scenarios([f"RIC{i}" for i in range(12)], self.categories, self.pnl)
+
+    def test_matches_per_asset_revaluation(self) -> None:
+        scenarios = [
+            StressScenario("rates up", {"金利": 100.0}),
+            StressScenario("equity crash", {"株式": -20.0, "クレジット": 150.0}),
+            StressScenario("flat", {}),
+        ]
+        result = run_stress(self.book, scenarios)
+
+        for column, scenario in enumerate(scenarios):
+            for row, category in enumerate(self.categories):
+                _, move, sign = STRESS_FACTORS[category]
+                expected = sign * self.pnl[row].std() / move * scenario.shocks.get(category, 0.0)
+                self.assertAlmostEqual(result.pnl[row, column], expected)
+        np.testing.assert_allclose(result.factor_pnl.sum(axis=0), result.totals)
+        self.assertEqual(result.totals[2], 0.0)
+        self.assertTrue(result.totals[0] < 0 and result.totals[1] < 0)
+        self.assertEqual(result.ranking()[-1], 2)
+
+    def test_worst_assets_are_sorted_losses(self) -> None:
+        rng = np.random.default_rng(3)
+        scenarios = [StressScenario(f"s{i}", dict(zip(FACTORS, rng.normal(0, 50, len(FACTORS))))) for i in range(40)]
+        result = run_stress(self.book, scenarios)
+        worst = result.worst_assets(3)
+        self.assertEqual(worst.shape, (3, 40))
+        for column in range(40):
+            expected = np.argsort(result.pnl[:, column], kind="stable")[:3]
+            np.testing.assert_array_equal(result.pnl[worst[:, column], column], result.pnl[expected, column])
+
+    def test_unknown_factor_is_rejected(self) -> None:
+        self.assertFalse(self.book.sensitivities.flags.writeable)
+        with self.assertRaises(KeyError):
+            shock_matrix([StressScenario("fx", {"為替": 10.0})])
+
+
+class MonteCarloTests(unittest.TestCase):
+    """Chunked simulation must keep each RIC's scenario distribution and their correlation."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(23)
+        market = rng.standard_normal(SCENARIO_WINDOW)
+        self.pnl = 0.7 * market + rng.standard_normal((6, SCENARIO_WINDOW)) * np.arange(1, 7)[:, None] * 0.3
+        self.model = MonteCarloModel.from_scenarios(self.pnl)
+
+    def test_streaming_tail_keeps_smallest_values(self) -> None:
+        values = np.random.default_rng(1).standard_normal(10_000)
+        tail = StreamingTail(150)
+        for chunk in np.array_split(values, 37):
+            tail.update(chunk)
+        self.assertEqual(tail.count, values.size)
+        np.testing.assert_array_equal(tail.smallest(), np.sort(values)[:150])
+        np.testing.assert_array_equal(tail.indices(), np.argsort(values, kind="stable")[:150])
+
+    def test_factor_reproduces_sample_correlation(self) -> None:
+        self.assertEqual(self.model.method, "cholesky")
+        np.testing.assert_allclose(self.model.factor @ self.model.factor.T, np.corrcoef(self.pnl), atol=1e-9)
+        wide = np.random.default_rng(2).standard_normal((40, 30))
+        model = MonteCarloModel.from_scenarios(wide)
+        self.assertEqual((model.method, model.rank), ("scenario", 30))
+        np.testing.assert_allclose(model.factor @ model.factor.T, np.corrcoef(wide), atol=1e-9)
+
+    def test_revalued_paths_follow_scenario_quantiles(self) -> None:
+        simulated = self.model.revalue(np.random.default_rng(8).standard_normal((200_000, self.model.rank)))
+        probabilities = [0.01, 0.05, 0.5, 0.95]
+        expected = np.quantile(self.pnl, probabilities, axis=1, method="hazen")
+        spread = self.pnl.std(axis=1, ddof=1)
+        np.testing.assert_array_less(np.abs(np.quantile(simulated, probabilities, axis=0) - expected) / spread, 0.05)
+        np.testing.assert_allclose(np.corrcoef(simulated.T), np.corrcoef(self.pnl), atol=0.02)
+
+    def test_var_converges_to_normal_quantile_for_normal_scenarios(self) -> None:
+        result = monte_carlo_var(self.model, 200_000, chunk_size=7_000, seed=4)
+        portfolio = self.pnl.sum(axis=0)
+        for confidence, z in ((0.95, 1.6449), (0.99, 2.3263)):
+            expected = z * portfolio.std(ddof=1) - portfolio.mean()
+            self.assertAlmostEqual(result.at(confidence)[0] / expected, 1.0, delta=0.03)
+        self.assertTrue(np.all(np.diff(result.var) > 0))
+        self.assertTrue(np.all(result.es > result.var))
+        self.assertAlmostEqual(result.component_var.sum(), result.at(0.99)[0], places=9)
+
+    def test_components_match_the_worst_simulated_paths(self) -> None:
+        paths, chunk_size = 30_000, 4_000
+        result = monte_carlo_var(self.model, paths, chunk_size=chunk_size, seed=2, workers=2)
+        pnl = np.vstack(
+            [
+                self.model.revalue(
+                    np.random.default_rng([2, chunk]).standard_normal((min(chunk_size, paths - start), self.model.rank))
+                )
+                for chunk, start in enumerate(range(0, paths, chunk_size))
+            ]
+        )
+        worst = np.argsort(pnl.sum(axis=1))[: tail_count(paths, 0.99)]
+        expected = pnl[worst].mean(axis=0)
+        np.testing.assert_allclose(result.component_var, -expected * result.at(0.99)[0] / -expected.sum())
+
+    def test_fat_tailed_scenarios_exceed_normal_var(self) -> None:
+        rng = np.random.default_rng(5)
+        pnl = 0.6 * rng.standard_t(3, SCENARIO_WINDOW) + 0.5 * rng.standard_t(3, (4, SCENARIO_WINDOW))
+        result = monte_carlo_var(MonteCarloModel.from_scenarios(pnl), 200_000, seed=1)
+        portfolio = pnl.sum(axis=0)
+        self.assertGreater(result.at(0.99)[0], 1.1 * (2.3263 * portfolio.std(ddof=1) - portfolio.mean()))
+
+    def test_constant_ric_revalues_to_its_constant(self) -> None:
+        pnl = np.vstack([self.pnl[:2], np.full(SCENARIO_WINDOW, -3.0)])
+        model = MonteCarloModel.from_scenarios(pnl)
+        simulated = model.revalue(np.random.default_rng(3).standard_normal((100, model.rank)))
+        np.testing.assert_array_equal(simulated[:, 2], -3.0)
+
+    def test_threads_do_not_change_results(self) -> None:
+        single = monte_carlo_var(self.model, 50_000, chunk_size=4_000, seed=9, workers=1)
+        pooled = monte_carlo_var(self.model, 50_000, chunk_size=4_000, seed=9, workers=3)
+        np.testing.assert_array_equal(single.var, pooled.var)
+        np.testing.assert_array_equal(single.component_var, pooled.component_var)
+
+
+class EwmaTests(unittest.TestCase):
+    """The stored filter state must reproduce the plain EWMA recursion."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(24)
+        self.pnl = rng.standard_normal((3, 40)) * np.linspace(0.5, 2.0, 40)
+
+    def test_window_matches_manual_recursion(self) -> None:
+        state = EwmaState.from_window(self.pnl, decay=0.9)
+        variance = (self.pnl**2).mean(axis=1)
+        forecasts = []
+        for column in self.pnl.T:
+            forecasts.append(np.sqrt(variance))
+            variance = 0.9 * variance + 0.1 * column**2
+        forecasts = np.array(forecasts).T
+        np.testing.assert_allclose(state.variance, variance)
+        np.testing.assert_allclose(state.residuals, self.pnl / forecasts)
+        np.testing.assert_allclose(state.filtered(), self.pnl * np.sqrt(variance)[:, None] / forecasts)
+
+    def test_daily_roll_matches_refiltering(self) -> None:
+        history = np.hstack([self.pnl, np.random.default_rng(5).standard_normal((3, 2))])
+        full = EwmaState.from_window(history[:, :-2]).roll(history[:, -2]).roll(history[:, -1])
+        batch = EwmaState.from_window(history[:, :-2]).roll(history[:, -2:])
+        self.assertEqual(full.residuals.shape, (3, 40))
+        np.testing.assert_allclose(full.residuals, batch.residuals)
+        np.testing.assert_allclose(full.variance, batch.variance)
+        np.testing.assert_allclose(full.residuals[:, :-2], EwmaState.from_window(history[:, :-2]).residuals[:, 2:])
+
+    def test_volatility_rise_scales_up_calm_scenarios(self) -> None:
+        calm = np.full((1, 30), 0.5) * np.where(np.arange(30) % 2, 1.0, -1.0)
+        state = EwmaState.from_window(calm).roll([5.0])
+        self.assertGreater(np.abs(state.filtered()[0, :10]).max(), 0.5)
+        with self.assertRaises(ValueError):
+            EwmaState.from_window(calm, decay=1.0)
+
+    def test_long_fast_decaying_window_matches_recursion(self) -> None:
+        pnl = np.random.default_rng(6).standard_normal((2, 250))
+        state = EwmaState.from_window(pnl, decay=0.05)
+        variance = (pnl**2).mean(axis=1)
+        for column in pnl.T:
+            variance = 0.05 * variance + 0.95 * column**2
+        np.testing.assert_allclose(state.variance, variance)
+
+    def test_latest_observations_recover_the_window(self) -> None:
+        state = EwmaState.from_window(self.pnl).rescaled([2.0, 0.5, 1.0])
+        expected = self.pnl[:, -3:] * np.array([2.0, 0.5, 1.0])[:, None]
+        np.testing.assert_allclose(state.latest_observations(3), expected)
+
+    def test_rescaled_matches_scaled_window(self) -> None:
+        scale = np.array([2.0, 0.5, 1.0])
+        rescaled = EwmaState.from_window(self.pnl).rescaled(scale)
+        direct = EwmaState.from_window(self.pnl * scale[:, None])
+        np.testing.assert_allclose(rescaled.residuals, direct.residuals)
+        np.testing.assert_allclose(rescaled.filtered(), direct.filtered())
+
+
+class AggregationTreeTests(unittest.TestCase):
+    """Node vectors are the sums of their leaves and only ancestors move on a leaf update."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(25)
+        self.categories = ["株式", "金利", "コモディティ", "クレジット", "株式", "モーゲージ", "金利"]
+        self.rics = [f"RIC{row}" for row in range(len(self.categories))]
+        self.pnl = rng.standard_normal((len(self.rics), SCENARIO_WINDOW))
+        groups = list(zip(group_labels("desk", self.categories), self.categories))
+        self.tree = AggregationTree.from_leaves(self.rics, groups, self.pnl, ("desk", "category"))
+
+    def test_nodes_sum_their_leaves(self) -> None:
+        np.testing.assert_allclose(self.tree.vectors[()], self.pnl.sum(axis=0))
+        macro = [row for row, category in enumerate(self.categories) if DESKS[category] == "マクロ"]
+        np.testing.assert_allclose(self.tree.vectors[("マクロ",)], self.pnl[macro].sum(axis=0))
+        self.assertEqual(self.tree.leaf_counts[("マクロ",)], len(macro))
+        self.assertEqual(self.tree.children[("マクロ",)], ("コモディティ", "金利"))
+        self.assertEqual(self.tree.leaf_paths["RIC1"], ("マクロ", "金利", "RIC1"))
+        self.assertIs(self.tree.vectors[("マクロ", "金利", "RIC1")].base, self.pnl)
+
+    def test_drill_down_splits_node_var(self) -> None:
+        root = self.tree.drill_down()
+        expected = compute_historical_var(self.pnl)
+        self.assertAlmostEqual(root.var, expected.portfolio_var, places=9)
+        self.assertAlmostEqual(root.component_var.sum(), root.var, places=9)
+        self.assertEqual(root.labels, ("エクイティ", "スプレッド", "マクロ"))
+        self.assertLess(root.diversification_effect, 0.0)
+
+        rates = self.tree.drill_down(("マクロ", "金利"))
+        self.assertEqual(rates.labels, ("RIC1", "RIC6"))
+        self.assertEqual(rates.leaf, (True, True))
+        np.testing.assert_allclose(rates.child_var, compute_historical_var(self.pnl[[1, 6]]).asset_var)
+        self.assertEqual(self.tree.drill_down(("マクロ", "金利", "RIC1")).labels, ())
+        with self.assertRaises(KeyError):
+            self.tree.drill_down(("マクロ", "株式"))
+
+    def test_replace_leaf_recomputes_ancestors_only(self) -> None:
+        self.tree.drill_down()
+        self.tree.drill_down(("エクイティ",))
+        replacement = self.pnl[0] * 3.0
+        updated = self.tree.replace_leaf("RIC1", replacement)
+
+        changed = [path for path, vector in updated.vectors.items() if vector is not self.tree.vectors[path]]
+        self.assertEqual(sorted(changed, key=len), [(), ("マクロ",), ("マクロ", "金利"), ("マクロ", "金利", "RIC1")])
+        self.assertIn(("エクイティ",), updated._measures)
+        self.assertNotIn((), updated._measures)
+
+        pnl = self.pnl.copy()
+        pnl[1] = replacement
+        rebuilt = AggregationTree.from_leaves(
+            self.rics, list(zip(group_labels("desk", self.categories), self.categories)), pnl, ("desk", "category")
+        )
+        for path in rebuilt.vectors:
+            np.testing.assert_allclose(updated.vectors[path], rebuilt.vectors[path])
+        self.assertAlmostEqual(updated.drill_down().var, rebuilt.drill_down().var, places=9)
+        with self.assertRaises(KeyError):
+            self.tree.replace_leaf("UNKNOWN", replacement)
+
+    def test_replace_leaves_matches_one_at_a_time(self) -> None:
+        replacements = {"RIC1": self.pnl[0] * 2.0, "RIC2": -self.pnl[3], "RIC5": self.pnl[6] + 1.0}
+        batched = self.tree.replace_leaves(replacements)
+        sequential = self.tree
+        for ric, vector in replacements.items():
+            sequential = sequential.replace_leaf(ric, vector)
+        self.assertEqual(batched.vectors.keys(), sequential.vectors.keys())
+        for path, vector in batched.vectors.items():
+            np.testing.assert_allclose(vector, sequential.vectors[path])
+        with self.assertRaises(ValueError):
+            self.tree.replace_leaves({"RIC1": self.pnl[0][:-1]})
+
+    def test_flat_tree_and_validation(self) -> None:
+        flat = AggregationTree.from_leaves(self.rics, [()] * len(self.rics), self.pnl, ())
+        self.assertEqual(flat.drill_down().labels, tuple(sorted(self.rics)))
+        with self.assertRaises(ValueError):
+            AggregationTree.from_leaves(self.rics, [("x",)] * len(self.rics), self.pnl, ("desk", "category"))
+        with self.assertRaises(KeyError):
+            group_labels("region", self.categories)
+
+
+if __name__ == "__main__":
+    unittest.main()
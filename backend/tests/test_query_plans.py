@@ -0,0 +1,136 @@
+"""Query-plan regression checks for the fastest-growing tables."""
+from __future__ import annotations
+
+import unittest
+from datetime import date, timedelta
+
+from sqlalchemy import Engine, create_engine, insert
+from sqlalchemy.sql import Select
+
+from app.core.constants import PORTFOLIO_AGGREGATE_RIC
+from app.db.base import Base
+from app.db.models import (
+    RealizedPnLRecord,
+    RiskMeasureRecord,
+    ScenarioDistributionRecord,
+    ScenarioVectorRecord,
+    VaRSnapshot,
+    VaRTimeSeriesRecord,
+)
+from app.db.queries import (
+    realized_dates_stmt,
+    risk_measures_stmt,
+    scenario_rows_stmt,
+    scenario_vector_stmt,
+    snapshot_assets_stmt,
+    timeseries_window_stmt,
+)
+
+
+def explain(engine: Engine, stmt: Select) -> str:
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+class QueryPlanTests(unittest.TestCase):
+    """The endpoints' statements must be index range scans without a sort step."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.engine = create_engine("sqlite://")
+        Base.metadata.create_all(cls.engine)
+        start = date(2024, 1, 1)
+        with cls.engine.begin() as connection:
+            connection.execute(
+                insert(VaRTimeSeriesRecord),
+                [
+                    {"ric": f"RIC{ric}", "point_date": start + timedelta(days=day), "value": 1.0, "change": None}
+                    for ric in range(20)
+                    for day in range(50)
+                ],
+            )
+            connection.execute(
+                insert(RealizedPnLRecord),
+                [
+                    {"ric": ric, "pnl_date": start + timedelta(days=day), "pnl": 0.1}
+                    for ric in [*(f"RIC{index}" for index in range(20)), PORTFOLIO_AGGREGATE_RIC]
+                    for day in range(50)
+                ],
+            )
+            connection.execute(
+                insert(ScenarioDistributionRecord),
+                [{"ric": f"RIC{ric}", "scenario_index": idx, "value": 0.5} for ric in range(20) for idx in range(50)],
+            )
+            connection.execute(
+                insert(VaRSnapshot),
+                [
+                    {
+                        "id": snapshot_id,
+                        "as_of": start + timedelta(days=snapshot_id),
+                        "portfolio_total": 1.0,
+                        "portfolio_change_amount": 0.0,
+                        "portfolio_change_pct": 0.0,
+                        "diversification_effect": 0.0,
+                    }
+                    for snapshot_id in range(1, 6)
+                ],
+            )
+            connection.execute(
+                insert(RiskMeasureRecord),
+                [
+                    {
+                        "snapshot_id": snapshot_id,
+                        "ric": f"RIC{ric}",
+                        "confidence": confidence,
+                        "horizon_days": horizon,
+                        "var": 1.0,
+                        "expected_shortfall": 1.2,
+                    }
+                    for snapshot_id in range(1, 6)
+                    for ric in range(20)
+                    for horizon in (1, 10)
+                    for confidence in (0.95, 0.975, 0.99)
+                ],
+            )
+            connection.exec_driver_sql("ANALYZE")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.engine.dispose()
+
+    def assertIndexRangeScan(self, plan: str, index_name: str) -> None:
+        self.assertIn(f"USING INDEX {index_name}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertNotIn("SCAN", plan.replace("SEARCH", ""))
+
+    def test_timeseries_window_uses_composite_index(self) -> None:
+        plan = explain(self.engine, timeseries_window_stmt("RIC3", 30))
+        self.assertIndexRangeScan(plan, "ix_var_timeseries_ric_point_date")
+
+    def test_scenario_rows_use_composite_index(self) -> None:
+        plan = explain(self.engine, scenario_rows_stmt("RIC3"))
+        self.assertIndexRangeScan(plan, "ix_scenario_distribution_ric_index")
+
+    def test_risk_measures_use_snapshot_index(self) -> None:
+        plan = explain(self.engine, risk_measures_stmt(3))
+        self.assertIndexRangeScan(plan, "ix_risk_measure_snapshot_ric")
+
+    def test_snapshot_assets_use_snapshot_index(self) -> None:
+        plan = explain(self.engine, snapshot_assets_stmt(3, ["RIC1", "RIC2"]))
+        self.assertIndexRangeScan(plan, "ix_asset_var_snapshot_ric")
+
+    def test_backtest_calendar_uses_realized_index(self) -> None:
+        plan = explain(self.engine, realized_dates_stmt(251))
+        self.assertIn("COVERING INDEX ix_realized_pnl_ric_date (ric=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_scenario_vector_lookup_uses_unique_constraint(self) -> None:
+        plan = explain(self.engine, scenario_vector_stmt("RIC3", date(2024, 1, 1)))
+        self.assertIn(f"USING INDEX sqlite_autoindex_{ScenarioVectorRecord.__tablename__}_1", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
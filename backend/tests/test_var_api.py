@@ -1,36 +1,134 @@
 """Regression-style API checks implemented with unittest (no external deps)."""
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import gzip
+import json
+import importlib.util
 import os
+import tempfile
+import threading
+import time
 import unittest
+from collections import Counter
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from fastapi import HTTPException, Request
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
 
 TEST_DB_PATH = Path(__file__).with_name("test_var_api.db")
 if TEST_DB_PATH.exists():
     TEST_DB_PATH.unlink()
 os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
 
-from app.api import routes  # noqa: E402
-from app.core.constants import PORTFOLIO_AGGREGATE_RIC, SCENARIO_WINDOW  # noqa: E402
-from app.db.seed import init_db  # noqa: E402
-from app.main import healthcheck  # noqa: E402
+from app.api import async_routes, routes, stream  # noqa: E402
+from app.core.constants import PORTFOLIO_AGGREGATE_RIC, SCENARIO_WINDOW, SUMMARY_TOP_N  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db.backfill import PROGRESS_FILE, BackfillConfig, run_backfill  # noqa: E402
+from app.db.aggregates import DRIVER_FIELDS  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.bulk import bulk_insert  # noqa: E402
+from app.api.cache import (  # noqa: E402
+    backtest_cache,
+    hierarchy_cache,
+    monte_carlo_cache,
+    scenario_cache,
+    stress_cache,
+    summary_cache,
+)
+from app.db.models import (  # noqa: E402
+    AssetVaRRecord,
+    NewsRecord,
+    RealizedPnLRecord,
+    RiskMeasureRecord,
+    ScenarioVectorRecord,
+    VaRSnapshot,
+    VaRTimeSeriesRecord,
+)
+from app.db.ewma_store import load_ewma_state, load_filtered_vector  # noqa: E402
+from app.db.notifications import mark_snapshot_written  # noqa: E402
+from app.db.scenario_store import (  # noqa: E402
+    decode_vector,
+    encode_vector,
+    latest_scenario_date,
+    load_scenario_matrix,
+    load_scenario_vector,
+    save_scenario_vectors,
+)
+from app.db.migrations import SchemaMigrationError  # noqa: E402
+from app.db.queries import snapshot_positions_stmt  # noqa: E402
+from app.db.schema import (  # noqa: E402
+    DATA_VERSION_KEY,
+    INIT_LOCK_KEY,
+    SCHEMA_VERSION,
+    SCHEMA_VERSION_KEY,
+    bump_data_version,
+    database_state,
+    initialisation_lock,
+    read_meta,
+    write_meta,
+)
+from app.db.seed import ensure_db, init_db  # noqa: E402
+from app.db.synthetic import SyntheticConfig, generate_synthetic_data, synthetic_ric  # noqa: E402
+from app.db.session import SessionLocal, get_async_engine, to_async_url  # noqa: E402
+from app.engine import compute_historical_var  # noqa: E402
+from app.api.middleware import negotiate_encoding  # noqa: E402
+from app.main import app, healthcheck  # noqa: E402
+from app.api.encoding import COLUMNS_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, negotiate  # noqa: E402
+from app.models.var import (  # noqa: E402
+    BacktestResponse,
+    MonteCarloVaRResponse,
+    ScenarioDistributionResponse,
+    ScenarioHistogramResponse,
+    StressRequest,
+    VaRSummaryResponse,
+    VaRTimeSeriesBatchResponse,
+    VaRTimeSeriesColumns,
+    WhatIfRequest,
+)
 
 init_db()
 
 
+def _summary(as_of=None) -> VaRSummaryResponse:
+    response = routes.get_var_summary(as_of=as_of)
+    return VaRSummaryResponse.model_validate_json(response.body)
+
+
+def _assert_materialised(case: unittest.TestCase, snapshot: VaRSnapshot) -> None:
+    """Check the aggregates persisted on ``snapshot`` against its asset rows."""
+
+    assets = snapshot.assets
+    case.assertEqual(snapshot.asset_count, len(assets))
+    case.assertEqual(snapshot.category_counts, dict(Counter(asset.category for asset in assets)))
+    for name in DRIVER_FIELDS:
+        total = sum(getattr(asset, f"{name}_contribution") for asset in assets)
+        case.assertAlmostEqual(getattr(snapshot, f"driver_{name}"), total, places=6)
+    ranked = sorted(assets, key=lambda asset: asset.amount, reverse=True)[:SUMMARY_TOP_N]
+    case.assertEqual(len(snapshot.top_rics), len(ranked))
+    case.assertEqual(
+        [asset.amount for asset in ranked], [next(a.amount for a in assets if a.ric == ric) for ric in snapshot.top_rics]
+    )
+
+
+def tearDownModule() -> None:
+    if TEST_DB_PATH.exists():
+        TEST_DB_PATH.unlink()
+
+
 class VarApiTests(unittest.TestCase):
     """Covers the public VaR endpoints by calling the route handlers directly."""
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        if TEST_DB_PATH.exists():
-            TEST_DB_PATH.unlink()
-
     def test_healthcheck_responds_ok(self) -> None:
         self.assertEqual(healthcheck(), {"status": "ok"})
 
     def test_var_summary_contains_assets(self) -> None:
-        payload = routes.get_var_summary(as_of=None)
+        payload = _summary()
 
         self.assertGreater(payload.portfolio.total, 0)
         self.assertGreaterEqual(len(payload.assets), 3)
@@ -48,8 +146,31 @@ class VarApiTests(unittest.TestCase):
             {"window_drop", "window_add", "position_change", "ranking_shift"},
         )
 
+    def test_component_var_adds_up_to_portfolio(self) -> None:
+        payload = _summary()
+        components = sum(asset.component_var for asset in payload.assets)
+        self.assertAlmostEqual(components, payload.portfolio.total, places=6)
+        benefits = sum(asset.diversification_benefit for asset in payload.assets)
+        self.assertAlmostEqual(benefits, -payload.portfolio.diversification_effect, delta=0.011)
+        for asset in payload.assets:
+            self.assertAlmostEqual(asset.component_var + asset.diversification_benefit, asset.amount, places=6)
+
+    def test_summary_reports_levels_and_horizons(self) -> None:
+        payload = _summary()
+        for holder, amount in [(payload.portfolio, payload.portfolio.total)] + [
+            (asset, asset.amount) for asset in payload.assets
+        ]:
+            measures = {(m.horizon_days, m.confidence): m for m in holder.risk_measures}
+            self.assertEqual(set(measures), {(h, c) for h in (1, 10) for c in (0.95, 0.975, 0.99)})
+            self.assertAlmostEqual(measures[(1, 0.99)].var, amount, delta=0.01)
+            self.assertLessEqual(measures[(1, 0.95)].var, measures[(1, 0.99)].var)
+            for (horizon, confidence), measure in measures.items():
+                self.assertGreaterEqual(measure.expected_shortfall, measure.var)
+                one_day = measures[(1, confidence)].var
+                self.assertAlmostEqual(measure.var, one_day * horizon**0.5, delta=0.01)
+
     def test_var_timeseries_returns_window(self) -> None:
-        summary = routes.get_var_summary(as_of=None)
+        summary = _summary()
         target_ric = summary.assets[0].ric
         payload = routes.get_var_timeseries(ric=target_ric, days=14)
 
@@ -58,6 +179,28 @@ class VarApiTests(unittest.TestCase):
         self.assertIsNone(payload.points[0].change)
         self.assertIsNotNone(payload.points[1].change)
 
+    def test_var_timeseries_ends_at_snapshot_var(self) -> None:
+        summary = _summary()
+        rics = [PORTFOLIO_AGGREGATE_RIC] + [asset.ric for asset in summary.assets]
+        payload = routes.get_var_timeseries_batch(rics=",".join(rics), days=3)
+
+        self.assertEqual(payload.dates[-1], summary.as_of)
+        self.assertAlmostEqual(payload.series[PORTFOLIO_AGGREGATE_RIC][-1], summary.portfolio.total, delta=0.01)
+        for asset in summary.assets:
+            self.assertAlmostEqual(payload.series[asset.ric][-1], asset.amount, delta=0.01)
+
+    def test_var_timeseries_batch_is_columnar(self) -> None:
+        summary = _summary()
+        rics = [PORTFOLIO_AGGREGATE_RIC] + [asset.ric for asset in summary.assets[:3]]
+        payload = routes.get_var_timeseries_batch(rics=",".join(rics + ["UNKNOWN_RIC"]), days=14)
+
+        self.assertEqual(len(payload.dates), 14)
+        self.assertEqual(payload.dates, sorted(payload.dates))
+        self.assertEqual(list(payload.series), rics)
+        single = routes.get_var_timeseries(ric=rics[1], days=14)
+        self.assertEqual(payload.series[rics[1]], [point.value for point in single.points])
+        self.assertEqual(payload.dates, [point.date for point in single.points])
+
     def test_news_endpoint_returns_seeded_items(self) -> None:
         payload = routes.get_news(limit=2)
         self.assertEqual(len(payload), 2)
@@ -74,7 +217,7 @@ class VarApiTests(unittest.TestCase):
     def test_var_summary_with_explicit_date(self) -> None:
         dates = routes.list_snapshot_dates()
         target = dates[-1]
-        payload = routes.get_var_summary(as_of=target)
+        payload = _summary(target)
         self.assertEqual(payload.as_of, target)
         self.assertEqual(payload.market_signal.as_of, target)
         self.assertEqual(payload.driver_commentary.as_of, target)
@@ -86,11 +229,1005 @@ class VarApiTests(unittest.TestCase):
         self.assertEqual(payload.ric, PORTFOLIO_AGGREGATE_RIC)
         self.assertEqual(len(payload.values), SCENARIO_WINDOW)
 
-        summary = routes.get_var_summary(as_of=None)
+        summary = _summary()
         target_ric = summary.assets[0].ric
         asset_payload = routes.get_scenario_distribution(ric=target_ric)
         self.assertEqual(asset_payload.ric, target_ric)
 
+    def test_scenario_distribution_for_past_date(self) -> None:
+        dates = routes.list_snapshot_dates()
+        latest = routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC, as_of=dates[0])
+        oldest = routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC, as_of=dates[-1])
+        self.assertEqual(len(oldest.values), SCENARIO_WINDOW)
+        self.assertNotEqual(latest.values, oldest.values)
+
+    def test_scenario_histogram_endpoint(self) -> None:
+        response = routes.get_scenario_histogram(ric=PORTFOLIO_AGGREGATE_RIC, bins=24)
+        payload = ScenarioHistogramResponse.model_validate_json(response.body)
+        raw = routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC)
+
+        self.assertEqual(payload.sample_count, SCENARIO_WINDOW)
+        self.assertEqual(sum(payload.counts), SCENARIO_WINDOW)
+        self.assertEqual(len(payload.edges), 25)
+        self.assertEqual(payload.minimum, min(raw.values))
+        self.assertEqual(payload.maximum, max(raw.values))
+        worst = sorted(raw.values)
+        var_99 = next(measure for measure in payload.tail_measures if measure.confidence == 0.99)
+        self.assertAlmostEqual(var_99.var, -worst[7])
+        self.assertLess(len(response.body) * 5, len(raw.model_dump_json()))
+
+        again = routes.get_scenario_histogram(
+            ric=PORTFOLIO_AGGREGATE_RIC, bins=24, if_none_match=response.headers["etag"]
+        )
+        self.assertEqual(again.status_code, 304)
+
+
+class SummaryCacheTests(unittest.TestCase):
+    """Summary responses are cached per as_of and revalidated with ETags."""
+
+    def test_repeated_poll_is_served_from_cache(self) -> None:
+        summary_cache.clear()
+        first = routes.get_var_summary(as_of=None)
+        self.assertEqual(len(summary_cache), 1)
+        second = routes.get_var_summary(as_of=None)
+        self.assertEqual(first.body, second.body)
+        self.assertEqual(first.headers["etag"], second.headers["etag"])
+        self.assertEqual(len(summary_cache), 1)
+
+    def test_matching_if_none_match_returns_304(self) -> None:
+        etag = routes.get_var_summary(as_of=None).headers["etag"]
+        response = routes.get_var_summary(as_of=None, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(response.headers["etag"], etag)
+
+        other_date = routes.list_snapshot_dates()[-1]
+        self.assertEqual(routes.get_var_summary(as_of=other_date, if_none_match=etag).status_code, 200)
+
+    def test_snapshot_write_invalidates_cached_date(self) -> None:
+        target = routes.list_snapshot_dates()[-1]
+        original = _summary(target).portfolio.total
+        with SessionLocal() as session:
+            snapshot = session.query(VaRSnapshot).filter_by(as_of=target).one()
+            snapshot.portfolio_total = original + 1.0
+            session.commit()
+        try:
+            self.assertAlmostEqual(_summary(target).portfolio.total, original + 1.0)
+        finally:
+            with SessionLocal() as session:
+                session.query(VaRSnapshot).filter_by(as_of=target).one().portfolio_total = original
+                session.commit()
+        self.assertAlmostEqual(_summary(target).portfolio.total, original)
+
+
+class SummaryMaterialisationTests(unittest.TestCase):
+    """Summary aggregates come from columns written once at load time."""
+
+    def test_seeded_snapshots_persist_aggregates(self) -> None:
+        with SessionLocal() as session:
+            snapshots = list(session.scalars(select(VaRSnapshot)).unique())
+            self.assertTrue(snapshots)
+            for snapshot in snapshots:
+                _assert_materialised(self, snapshot)
+
+    def test_summary_reports_persisted_aggregates(self) -> None:
+        payload = _summary()
+        self.assertEqual(payload.asset_count, len(payload.assets))
+        self.assertEqual(sum(payload.category_counts.values()), payload.asset_count)
+        totals = payload.driver_commentary.driver_totals
+        self.assertAlmostEqual(
+            totals.window_add, sum(asset.contributions.window_add for asset in payload.assets), places=6
+        )
+        amounts = {asset.ric: asset.amount for asset in payload.assets}
+        self.assertEqual(payload.top_rics, sorted(amounts, key=amounts.__getitem__, reverse=True)[:SUMMARY_TOP_N])
+
+    def test_top_loads_only_ranked_assets(self) -> None:
+        full = _summary()
+        response = routes.get_var_summary(top=3)
+        payload = VaRSummaryResponse.model_validate_json(response.body)
+        self.assertEqual([asset.ric for asset in payload.assets], full.top_rics[:3])
+        self.assertEqual(payload.asset_count, full.asset_count)
+        self.assertEqual(payload.driver_commentary, full.driver_commentary)
+        self.assertEqual(payload.portfolio, full.portfolio)
+        by_ric = {asset.ric: asset for asset in full.assets}
+        for asset in payload.assets:
+            self.assertEqual(asset, by_ric[asset.ric])
+        self.assertNotEqual(response.headers["etag"], routes.get_var_summary().headers["etag"])
+
+
+class BacktestApiTests(unittest.TestCase):
+    """Backtests stored VaR series against the seeded realised P/L."""
+
+    def test_every_ric_is_backtested_worst_first(self) -> None:
+        response = routes.get_var_backtest(days=100)
+        payload = BacktestResponse.model_validate_json(response.body)
+        self.assertEqual(payload.days, 100)
+        self.assertEqual(len(payload.results), len(_summary().assets) + 1)
+        self.assertEqual(sum(payload.zone_counts.values()), len(payload.results))
+        severity = [("green", "yellow", "red").index(result.zone) for result in payload.results]
+        self.assertEqual(severity, sorted(severity, reverse=True))
+        for result in payload.results:
+            self.assertEqual(result.observations, 100)
+            self.assertEqual(len(result.exception_dates), result.exceptions)
+            self.assertTrue(all(payload.start <= day <= payload.end for day in result.exception_dates))
+
+        again = routes.get_var_backtest(days=100, if_none_match=response.headers["etag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_exceptions_compare_pnl_with_previous_day_var(self) -> None:
+        ric = _summary().assets[0].ric
+        payload = BacktestResponse.model_validate_json(routes.get_var_backtest(rics=ric, days=60).body)
+        (result,) = payload.results
+        with SessionLocal() as session:
+            forecasts = dict(
+                session.execute(
+                    select(VaRTimeSeriesRecord.point_date, VaRTimeSeriesRecord.value).where(VaRTimeSeriesRecord.ric == ric)
+                ).all()
+            )
+            realized = session.execute(
+                select(RealizedPnLRecord.pnl_date, RealizedPnLRecord.pnl)
+                .where(RealizedPnLRecord.ric == ric, RealizedPnLRecord.pnl_date >= payload.start)
+                .order_by(RealizedPnLRecord.pnl_date)
+            ).all()
+        expected = [day for day, pnl in realized if -pnl > forecasts[day - timedelta(days=1)]]
+        self.assertEqual(result.exception_dates, expected)
+
+    def test_snapshot_write_inside_window_invalidates_backtest(self) -> None:
+        backtest_cache.clear()
+        payload = BacktestResponse.model_validate_json(routes.get_var_backtest(days=60).body)
+        routes.get_var_backtest(days=20)
+        self.assertEqual(len(backtest_cache), 2)
+        # Inside the 60-day window only; the 20-day window shares its end date and is dropped too.
+        written = next(day for day in routes.list_snapshot_dates() if payload.start <= day < payload.end)
+        with SessionLocal() as session:
+            mark_snapshot_written(session, written)
+            session.commit()
+        self.assertEqual(len(backtest_cache), 0)
+
+    def test_unknown_rics_are_skipped(self) -> None:
+        with self.assertRaises(HTTPException) as ctx:
+            routes.get_var_backtest(rics="NOT_A_RIC")
+        self.assertEqual(ctx.exception.status_code, 404)
+
+
+class WhatIfApiTests(unittest.TestCase):
+    """What-if requests reuse the cached scenario matrix of the snapshot."""
+
+    def test_no_change_reproduces_summary(self) -> None:
+        summary = _summary(None)
+        response = routes.post_var_what_if(WhatIfRequest(deltas={}))
+        self.assertEqual(response.as_of, summary.as_of)
+        self.assertAlmostEqual(response.base_var, summary.portfolio.total, places=2)
+        self.assertEqual(response.incremental_var, 0.0)
+        components = {asset.ric: asset.component_var for asset in summary.assets}
+        for asset in response.assets:
+            # Stored components are rounded to add up to the total, so each may be a cent off.
+            self.assertAlmostEqual(asset.base_component_var, components[asset.ric], delta=0.01)
+
+    def test_closing_a_position_reuses_cached_matrix(self) -> None:
+        scenario_cache.clear()
+        ric = _summary(None).assets[0].ric
+        response = routes.post_var_what_if(WhatIfRequest(deltas={ric: -1.0}))
+        self.assertEqual(len(scenario_cache), 1)
+        closed = next(asset for asset in response.assets if asset.ric == ric)
+        self.assertEqual(closed.position_scale, 0.0)
+        self.assertEqual(closed.component_var, 0.0)
+        self.assertAlmostEqual(sum(asset.component_var for asset in response.assets), response.new_var)
+        self.assertAlmostEqual(response.incremental_var, response.new_var - response.base_var)
+
+        routes.post_var_what_if(WhatIfRequest(deltas={ric: 0.5}))
+        self.assertEqual(len(scenario_cache), 1)
+
+    def test_unknown_ric_is_rejected(self) -> None:
+        with self.assertRaises(HTTPException) as ctx:
+            routes.post_var_what_if(WhatIfRequest(deltas={"NOT_A_RIC": 0.1}))
+        self.assertEqual(ctx.exception.status_code, 422)
+
+
+class MonteCarloApiTests(unittest.TestCase):
+    """Monte Carlo responses are simulated once per key and revalidated by ETag."""
+
+    def test_tail_measures_and_components(self) -> None:
+        monte_carlo_cache.clear()
+        response = routes.get_var_monte_carlo(paths=20_000, seed=3)
+        body = MonteCarloVaRResponse.model_validate_json(response.body)
+        summary = _summary(None)
+
+        self.assertEqual(body.as_of, summary.as_of)
+        self.assertEqual(body.method, "cholesky")
+        self.assertEqual(body.factor_rank, len(summary.assets))
+        self.assertEqual([measure.confidence for measure in body.tail_measures], [0.95, 0.975, 0.99])
+        var_99 = body.tail_measures[-1].var
+        self.assertAlmostEqual(sum(asset.component_var for asset in body.assets), var_99, places=6)
+        # Same marginals and correlation as the historical scenarios, so the two VaRs should be of similar size.
+        self.assertLess(abs(var_99 / summary.portfolio.total - 1.0), 0.5)
+
+        cached = routes.get_var_monte_carlo(paths=20_000, seed=3, if_none_match=response.headers["etag"])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len(monte_carlo_cache), 1)
+
+    def test_unknown_date_is_404(self) -> None:
+        with self.assertRaises(HTTPException) as ctx:
+            routes.get_var_monte_carlo(as_of=date(1999, 1, 1), paths=1_000)
+        self.assertEqual(ctx.exception.status_code, 404)
+
+
+class FilteredHistoricalTests(unittest.TestCase):
+    """FHS figures come from the stored EWMA state, rolled forward once per snapshot date."""
+
+    def test_summary_uses_filtered_scenarios(self) -> None:
+        summary_cache.clear()
+        historical = _summary()
+        response = routes.get_var_summary(methodology="fhs")
+        body = VaRSummaryResponse.model_validate_json(response.body)
+        self.assertEqual((historical.methodology, body.methodology), ("historical", "fhs"))
+        self.assertNotEqual(response.headers["etag"], routes.get_var_summary().headers["etag"])
+        self.assertEqual(body.driver_commentary, historical.driver_commentary)
+
+        rics = [asset.ric for asset in body.assets]
+        with SessionLocal() as session:
+            expected = compute_historical_var(load_ewma_state(session, rics, body.as_of).filtered())
+        self.assertAlmostEqual(body.portfolio.total, expected.portfolio_var, places=2)
+        self.assertAlmostEqual(sum(asset.component_var for asset in body.assets), body.portfolio.total, places=2)
+        self.assertEqual(body.top_rics[0], rics[int(expected.asset_var.argmax())])
+
+        top = VaRSummaryResponse.model_validate_json(routes.get_var_summary(top=2, methodology="fhs").body)
+        self.assertEqual([asset.ric for asset in top.assets], body.top_rics[:2])
+
+    def test_marginal_var_is_per_stored_position(self) -> None:
+        body = VaRSummaryResponse.model_validate_json(routes.get_var_summary(methodology="fhs").body)
+        with SessionLocal() as session:
+            positions = dict(session.execute(snapshot_positions_stmt(body.as_of)).all())
+        for asset in body.assets:
+            self.assertNotEqual(positions[asset.ric], 1.0)
+            self.assertAlmostEqual(asset.marginal_var, asset.component_var / positions[asset.ric], places=4)
+
+    def test_stored_state_is_rolled_daily(self) -> None:
+        first, second = sorted(routes.list_snapshot_dates())[-2:]
+        rics = [asset.ric for asset in _summary(second).assets]
+        with SessionLocal() as session:
+            rolled = load_ewma_state(session, rics, second)
+            previous = load_ewma_state(session, rics, first)
+            after = load_scenario_matrix(session, rics, second)
+            positions = [dict(session.execute(snapshot_positions_stmt(day)).all()) for day in (first, second)]
+        # The seeded windows are scaled by each day's positions.
+        scales = np.array([positions[1][ric] / positions[0][ric] for ric in rics])
+        expected = previous.rescaled(scales).roll(after[:, -1])
+        np.testing.assert_allclose(rolled.residuals, expected.residuals, rtol=1e-3, atol=1e-6)
+        np.testing.assert_allclose(rolled.variance, expected.variance, rtol=5e-3)
+        np.testing.assert_allclose(previous.latest_observations(3), after[:, -4:-1] / scales[:, None], atol=2e-3)
+
+    def test_scenario_distribution_methodology(self) -> None:
+        summary = _summary()
+        ric = summary.assets[0].ric
+        body = routes.get_scenario_distribution(ric=ric, methodology="fhs")
+        self.assertEqual(body.methodology, "fhs")
+        with SessionLocal() as session:
+            self.assertEqual(body.values, load_ewma_state(session, [ric]).filtered()[0].tolist())
+            total = load_filtered_vector(session, PORTFOLIO_AGGREGATE_RIC)
+            rics = [asset.ric for asset in summary.assets]
+            np.testing.assert_allclose(total, load_ewma_state(session, rics).filtered().sum(axis=0))
+
+        histogram = routes.get_scenario_histogram(ric=ric, bins=24, methodology="fhs")
+        self.assertEqual(ScenarioHistogramResponse.model_validate_json(histogram.body).methodology, "fhs")
+        self.assertNotEqual(histogram.headers["etag"], routes.get_scenario_histogram(ric=ric, bins=24).headers["etag"])
+
+
+class HierarchyApiTests(unittest.TestCase):
+    """Drill-down levels aggregate scenario vectors and share one cached tree per snapshot."""
+
+    def test_drill_down_levels(self) -> None:
+        hierarchy_cache.clear()
+        summary = _summary()
+        root = routes.get_var_hierarchy()
+        self.assertEqual((root.levels, root.path), (["desk", "category"], []))
+        self.assertAlmostEqual(root.var, summary.portfolio.total, places=2)
+        self.assertAlmostEqual(sum(child.component_var for child in root.children), root.var, places=5)
+        self.assertEqual(sum(child.leaf_count for child in root.children), len(summary.assets))
+        self.assertEqual({child.level for child in root.children}, {"desk"})
+        self.assertEqual([child.var for child in root.children], sorted((c.var for c in root.children), reverse=True))
+
+        desk = root.children[0]
+        categories = routes.get_var_hierarchy(path=desk.path)
+        self.assertEqual(categories.var, desk.var)
+        self.assertEqual({child.level for child in categories.children}, {"category"})
+        category = categories.children[0]
+        leaves = routes.get_var_hierarchy(path=category.path)
+        self.assertTrue(all(child.level == "ric" and not child.has_children for child in leaves.children))
+
+        rics = [child.label for child in leaves.children]
+        self.assertEqual(
+            {asset.ric for asset in summary.assets if asset.category == category.label}, set(rics)
+        )
+        with SessionLocal() as session:
+            expected = compute_historical_var(load_scenario_matrix(session, rics))
+        self.assertAlmostEqual(leaves.var, expected.portfolio_var, places=6)
+        self.assertLessEqual(leaves.var, leaves.standalone_var + 1e-9)
+        self.assertEqual(len(hierarchy_cache), 1)
+
+    def test_scenario_update_derives_cached_tree(self) -> None:
+        hierarchy_cache.clear()
+        before = routes.get_var_hierarchy()
+        routes.get_var_hierarchy(levels="category")
+        trees = dict(hierarchy_cache.items())
+        (as_of, version, _levels), tree = next(iter(trees.items()))
+        ric = sorted(tree.leaf_paths)[0]
+        original = tree.vectors[tree.leaf_paths[ric]].copy()
+        try:
+            with SessionLocal.begin() as session:
+                save_scenario_vectors(session, as_of, {ric: original * 3.0})
+                bump_data_version(session)
+            # Recorded on commit, applied on the next lookup.
+            self.assertEqual(dict(hierarchy_cache.items()), trees)
+            with mock.patch.object(routes, "load_scenario_matrix", wraps=routes.load_scenario_matrix) as load:
+                updated = routes.get_var_hierarchy()
+            load.assert_called_once()
+            self.assertEqual(list(load.call_args.args[1]), [ric])
+            for levels in (("desk", "category"), ("category",)):
+                derived = hierarchy_cache.get((as_of, version + 1, levels))
+                base = trees[(as_of, version, levels)]
+                np.testing.assert_allclose(derived.vectors[()], base.vectors[()] + 2.0 * original)
+                self.assertIs(derived.children, base.children)
+            self.assertNotAlmostEqual(updated.var, before.var, places=3)
+
+            hierarchy_cache.clear()
+            rebuilt = routes.get_var_hierarchy()
+            self.assertAlmostEqual(rebuilt.var, updated.var, places=5)
+            for ours, theirs in zip(updated.children, rebuilt.children):
+                self.assertEqual(ours.label, theirs.label)
+                self.assertAlmostEqual(ours.component_var, theirs.component_var, places=5)
+        finally:
+            with SessionLocal.begin() as session:
+                save_scenario_vectors(session, as_of, {ric: original})
+                bump_data_version(session)
+            hierarchy_cache.clear()
+
+    def test_untracked_version_rebuilds_tree(self) -> None:
+        hierarchy_cache.clear()
+        routes.get_var_hierarchy()
+        ((key, tree),) = hierarchy_cache.items()
+        with SessionLocal.begin() as session:
+            # Another process's write: the version moves but no commit is recorded here.
+            write_meta(session, DATA_VERSION_KEY, str(key[1] + 1))
+        routes.get_var_hierarchy()
+        rebuilt = hierarchy_cache.get((key[0], key[1] + 1, key[2]))
+        self.assertIsNotNone(rebuilt)
+        self.assertIsNot(rebuilt.children, tree.children)
+
+    def test_snapshot_write_evicts_cached_tree(self) -> None:
+        hierarchy_cache.clear()
+        routes.get_var_hierarchy()
+        ((key, _),) = hierarchy_cache.items()
+        with SessionLocal.begin() as session:
+            mark_snapshot_written(session, key[0])
+            bump_data_version(session)
+        self.assertEqual(len(hierarchy_cache), 0)
+
+    def test_levels_and_unknown_nodes(self) -> None:
+        flat = routes.get_var_hierarchy(levels="")
+        self.assertTrue(all(child.level == "ric" for child in flat.children))
+        by_category = routes.get_var_hierarchy(levels="category")
+        self.assertEqual({child.level for child in by_category.children}, {"category"})
+
+        with self.assertRaises(HTTPException) as ctx:
+            routes.get_var_hierarchy(path=["UNKNOWN_DESK"])
+        self.assertEqual(ctx.exception.status_code, 404)
+        with self.assertRaises(HTTPException) as ctx:
+            routes.get_var_hierarchy(levels="desk,region")
+        self.assertEqual(ctx.exception.status_code, 422)
+
+
+class StressApiTests(unittest.TestCase):
+    """Stress requests revalue the cached book and rank scenarios by P/L."""
+
+    def test_scenarios_are_ranked_by_loss(self) -> None:
+        stress_cache.clear()
+        request = StressRequest(
+            scenarios=[
+                {"name": "rates +100bp", "shocks": {"金利": 100}},
+                {"name": "rates +100bp, equities -20%", "shocks": {"金利": 100, "株式": -20}},
+                {"name": "rally", "shocks": {"株式": 10, "コモディティ": 5}},
+            ],
+            top=3,
+        )
+        response = routes.post_var_stress(request)
+        summary = _summary(None)
+
+        self.assertEqual(response.as_of, summary.as_of)
+        self.assertEqual(response.asset_count, len(summary.assets))
+        self.assertEqual([result.name for result in response.scenarios][0], "rates +100bp, equities -20%")
+        self.assertEqual([result.rank for result in response.scenarios], [1, 2, 3])
+        totals = [result.total_pnl for result in response.scenarios]
+        self.assertEqual(totals, sorted(totals))
+        self.assertGreater(response.scenarios[-1].total_pnl, 0)
+        self.assertEqual(response.factor_units["金利"], "bp")
+        categories = {asset.ric: asset.category for asset in summary.assets}
+        for result in response.scenarios:
+            self.assertAlmostEqual(sum(result.factor_pnl.values()), result.total_pnl, places=4)
+            self.assertLessEqual(len(result.worst_assets), 3)
+            losses = [asset.pnl for asset in result.worst_assets]
+            self.assertEqual(losses, sorted(losses))
+        rates_only = response.scenarios[1]
+        self.assertTrue(all(categories[asset.ric] == "金利" for asset in rates_only.worst_assets))
+
+        routes.post_var_stress(request)
+        self.assertEqual(len(stress_cache), 1)
+
+    def test_unknown_factor_is_rejected(self) -> None:
+        with self.assertRaises(HTTPException) as ctx:
+            routes.post_var_stress(StressRequest(scenarios=[{"name": "fx", "shocks": {"為替": 10}}]))
+        self.assertEqual(ctx.exception.status_code, 422)
+
+
+class FastEncodingTests(unittest.TestCase):
+    """Column encodings negotiated through Accept decode to the documented schemas."""
+
+    def test_negotiation_defaults_to_json(self) -> None:
+        self.assertEqual(negotiate(None), JSON_MEDIA_TYPE)
+        self.assertEqual(negotiate("text/html, */*;q=0.8"), JSON_MEDIA_TYPE)
+        self.assertEqual(negotiate(f"{COLUMNS_MEDIA_TYPE}, application/json;q=0.9"), COLUMNS_MEDIA_TYPE)
+        self.assertEqual(negotiate(f"application/json, {COLUMNS_MEDIA_TYPE};q=0.5"), JSON_MEDIA_TYPE)
+        self.assertEqual(negotiate(f"{COLUMNS_MEDIA_TYPE};q=0"), JSON_MEDIA_TYPE)
+
+    def test_timeseries_columns_match_default_json(self) -> None:
+        ric = _summary().assets[0].ric
+        default = routes.get_var_timeseries(ric=ric, days=14)
+        response = routes.get_var_timeseries(ric=ric, days=14, accept=COLUMNS_MEDIA_TYPE)
+        self.assertEqual(response.media_type, COLUMNS_MEDIA_TYPE)
+        self.assertEqual(response.headers["vary"], "Accept")
+
+        columns = VaRTimeSeriesColumns.model_validate_json(response.body)
+        self.assertEqual(columns.ric, ric)
+        self.assertEqual(columns.dates, [point.date for point in default.points])
+        self.assertEqual(columns.values, [point.value for point in default.points])
+        self.assertEqual(columns.changes, [point.change for point in default.points])
+
+    def test_batch_and_distribution_columns_match_default_json(self) -> None:
+        rics = [PORTFOLIO_AGGREGATE_RIC, _summary().assets[0].ric]
+        batch = routes.get_var_timeseries_batch(rics=",".join(rics), days=10, accept=COLUMNS_MEDIA_TYPE)
+        self.assertEqual(
+            VaRTimeSeriesBatchResponse.model_validate_json(batch.body),
+            routes.get_var_timeseries_batch(rics=",".join(rics), days=10),
+        )
+
+        response = routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC, accept=COLUMNS_MEDIA_TYPE)
+        self.assertEqual(
+            ScenarioDistributionResponse.model_validate_json(response.body),
+            routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC),
+        )
+
+    @unittest.skipUnless(importlib.util.find_spec("msgpack"), "msgpack not installed")
+    def test_msgpack_payloads_validate(self) -> None:
+        import msgpack
+
+        response = routes.get_var_timeseries(ric=PORTFOLIO_AGGREGATE_RIC, days=14, accept="application/x-msgpack")
+        self.assertEqual(response.media_type, MSGPACK_MEDIA_TYPE)
+        columns = VaRTimeSeriesColumns.model_validate(msgpack.unpackb(response.body))
+        self.assertEqual(len(columns.dates), 14)
+        self.assertIsNone(columns.changes[0])
+
+        response = routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC, accept=MSGPACK_MEDIA_TYPE)
+        distribution = ScenarioDistributionResponse.model_validate(msgpack.unpackb(response.body))
+        self.assertEqual(distribution, routes.get_scenario_distribution(ric=PORTFOLIO_AGGREGATE_RIC))
+
+
+class ScenarioStoreTests(unittest.TestCase):
+    """Round-trips scenario vectors through both storage modes."""
+
+    def test_blob_round_trip_is_lossless(self) -> None:
+        values = [-1.25, 0.5, 3.0e-9, 12345.678]
+        self.assertEqual(decode_vector(encode_vector(values)).tolist(), values)
+
+    def test_matrix_load_preserves_requested_order(self) -> None:
+        summary = _summary()
+        rics = [asset.ric for asset in summary.assets][:3][::-1]
+        with SessionLocal() as session:
+            matrix = load_scenario_matrix(session, rics)
+            self.assertEqual(matrix.shape, (3, SCENARIO_WINDOW))
+            self.assertEqual(matrix[0].tolist(), load_scenario_vector(session, rics[0]).tolist())
+            with self.assertRaises(KeyError):
+                load_scenario_matrix(session, ["UNKNOWN_RIC"])
+
+    def test_row_storage_mode(self) -> None:
+        original = settings.scenario_storage
+        settings.scenario_storage = "rows"
+        try:
+            with SessionLocal() as session:
+                save_scenario_vectors(session, routes.list_snapshot_dates()[0], {"ROW_TEST": [1.0, -2.0, 3.5]})
+                self.assertEqual(load_scenario_vector(session, "ROW_TEST").tolist(), [1.0, -2.0, 3.5])
+                session.rollback()
+        finally:
+            settings.scenario_storage = original
+
+    def test_row_storage_has_no_past_windows(self) -> None:
+        latest, past = routes.list_snapshot_dates()[:2]
+        original = settings.scenario_storage
+        settings.scenario_storage = "rows"
+        scenario_cache.clear()
+        try:
+            with SessionLocal() as session:
+                save_scenario_vectors(session, latest, {"ROW_TEST": [1.0, -2.0, 3.5]})
+                self.assertEqual(latest_scenario_date(session), latest)
+                self.assertEqual(load_scenario_vector(session, "ROW_TEST", latest).tolist(), [1.0, -2.0, 3.5])
+                self.assertIsNone(load_scenario_vector(session, "ROW_TEST", past))
+                with self.assertRaises(KeyError):
+                    load_scenario_matrix(session, ["ROW_TEST"], past)
+                # Past-date books must not be served (or cached) from the latest window.
+                self.assertIsNone(routes.book_scenarios(session, past))
+                self.assertEqual(len(scenario_cache), 0)
+                session.rollback()
+        finally:
+            settings.scenario_storage = original
+
+
+class BulkInsertTests(unittest.TestCase):
+    """Checks the chunked Core ingestion path used by the seeder."""
+
+    def test_bulk_insert_streams_generator_in_chunks(self) -> None:
+        start = routes.list_snapshot_dates()[0]
+        rows = (
+            {"ric": "BULK_TEST", "point_date": start - timedelta(days=idx), "value": float(idx), "change": None}
+            for idx in range(25)
+        )
+        with SessionLocal() as session:
+            report = bulk_insert(session, VaRTimeSeriesRecord, rows, chunk_size=10)
+            stored = session.query(VaRTimeSeriesRecord).filter_by(ric="BULK_TEST").count()
+            session.rollback()
+
+        self.assertEqual(report.table, VaRTimeSeriesRecord.__tablename__)
+        self.assertEqual(report.rows, 25)
+        self.assertEqual(stored, 25)
+        self.assertGreater(report.rows_per_second, 0)
+
+
+class SyntheticDataTests(unittest.TestCase):
+    """Generates small synthetic datasets into isolated in-memory databases."""
+
+    CONFIG = SyntheticConfig(
+        assets=23, snapshot_days=3, history_days=15, window=100, seed=7, chunk_size=10, end_date=date(2024, 5, 1)
+    )
+
+    def _generate(self) -> Session:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = Session(engine)
+        self.addCleanup(engine.dispose)
+        self.addCleanup(session.close)
+        self.summary = generate_synthetic_data(session, self.CONFIG)
+        return session
+
+    def test_row_counts_cover_every_table(self) -> None:
+        session = self._generate()
+        self.assertEqual(self.summary.snapshot_dates, (date(2024, 4, 29), date(2024, 4, 30), date(2024, 5, 1)))
+        self.assertEqual(self.summary.rows[AssetVaRRecord.__tablename__], 23 * 3)
+        self.assertEqual(self.summary.rows[VaRTimeSeriesRecord.__tablename__], 24 * 15)
+        self.assertEqual(self.summary.rows[ScenarioVectorRecord.__tablename__], 24 * 3)
+        self.assertEqual(self.summary.rows[RiskMeasureRecord.__tablename__], 24 * 3 * 6)
+        self.assertEqual(self.summary.rows[RealizedPnLRecord.__tablename__], 24 * 15)
+        self.assertEqual(session.query(AssetVaRRecord).filter_by(ric=synthetic_ric(22)).count(), 3)
+
+    def test_output_is_deterministic(self) -> None:
+        first, second = self._generate(), self._generate()
+        stmt = select(ScenarioVectorRecord.ric, ScenarioVectorRecord.as_of, ScenarioVectorRecord.payload).order_by(
+            ScenarioVectorRecord.ric, ScenarioVectorRecord.as_of
+        )
+        self.assertEqual(first.execute(stmt).all(), second.execute(stmt).all())
+        amounts = select(AssetVaRRecord.ric, AssetVaRRecord.amount).order_by(AssetVaRRecord.id)
+        self.assertEqual(first.execute(amounts).all(), second.execute(amounts).all())
+
+    def test_engine_reproduces_stored_figures(self) -> None:
+        session = self._generate()
+        snapshot = session.scalars(select(VaRSnapshot).where(VaRSnapshot.as_of == date(2024, 5, 1))).unique().one()
+        rics = [synthetic_ric(index) for index in range(self.CONFIG.assets)]
+        matrix = load_scenario_matrix(session, rics, snapshot.as_of)
+        result = compute_historical_var(matrix)
+        self.assertAlmostEqual(result.portfolio_var, snapshot.portfolio_total, delta=0.05)
+        self.assertLess(snapshot.diversification_effect, 0)
+        for asset in snapshot.assets:
+            drivers = (
+                asset.window_drop_contribution
+                + asset.window_add_contribution
+                + asset.position_change_contribution
+                + asset.ranking_shift_contribution
+            )
+            self.assertAlmostEqual(drivers, asset.change_amount, delta=0.02)
+
+    def test_aggregates_merge_across_chunks(self) -> None:
+        session = self._generate()
+        for snapshot in session.scalars(select(VaRSnapshot)).unique():
+            self.assertEqual(snapshot.asset_count, self.CONFIG.assets)
+            _assert_materialised(self, snapshot)
+
+
+class BackfillTests(unittest.TestCase):
+    """Recomputes a synthetic file database across a small process pool."""
+
+    def setUp(self) -> None:
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.workdir = Path(workdir.name)
+        self.url = f"sqlite:///{self.workdir / 'backfill.db'}"
+        engine = create_engine(self.url)
+        self.addCleanup(engine.dispose)
+        Base.metadata.create_all(engine)
+        self.session = Session(engine)
+        self.addCleanup(self.session.close)
+        generate_synthetic_data(self.session, SyntheticDataTests.CONFIG)
+
+    def _figures(self) -> dict[tuple[int, str], tuple[float, float]]:
+        self.session.expire_all()
+        stmt = select(AssetVaRRecord.snapshot_id, AssetVaRRecord.ric, AssetVaRRecord.amount, AssetVaRRecord.component_var)
+        return {(snapshot_id, ric): (amount, component) for snapshot_id, ric, amount, component in self.session.execute(stmt)}
+
+    def _backfill(self, **overrides) -> tuple[date, ...]:
+        config = BackfillConfig(workers=2, partition_size=7, workdir=self.workdir / "work", database_url=self.url)
+        return run_backfill(dataclasses.replace(config, **overrides)).dates
+
+    def test_recomputes_figures_from_scenario_vectors(self) -> None:
+        original = self._figures()
+        self.session.query(AssetVaRRecord).update({"amount": 0.0, "component_var": 0.0})
+        self.session.query(RiskMeasureRecord).delete()
+        self.session.commit()
+
+        self.assertEqual(len(self._backfill()), SyntheticDataTests.CONFIG.snapshot_days)
+        recomputed = self._figures()
+        for key, (amount, component) in original.items():
+            # Stored vectors are rounded to 3 decimals, so figures may move by a cent.
+            self.assertAlmostEqual(recomputed[key][0], amount, delta=0.011)
+            self.assertAlmostEqual(recomputed[key][1], component, delta=0.011)
+        for snapshot in self.session.scalars(select(VaRSnapshot)).unique():
+            components = sum(asset.component_var for asset in snapshot.assets)
+            self.assertAlmostEqual(components, snapshot.portfolio_total, places=6)
+            _assert_materialised(self, snapshot)
+        self.assertEqual(self.session.query(RiskMeasureRecord).count(), 24 * 3 * 6)
+        self.assertFalse((self.workdir / "work" / PROGRESS_FILE).exists())
+
+    def test_resume_skips_committed_dates(self) -> None:
+        done = SyntheticDataTests.CONFIG.end_date
+        (self.workdir / "work").mkdir()
+        (self.workdir / "work" / PROGRESS_FILE).write_text(f'{{"completed": ["{done}"]}}', encoding="utf-8")
+        self.assertEqual(self._backfill(), (date(2024, 4, 29), date(2024, 4, 30)))
+        self.assertEqual(self._backfill(start=done), (done,))
+
+
+def _asgi_get(path: str, headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+    """Send one GET through the full middleware stack and collect the response."""
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    messages: list[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    response_headers = {key.decode(): value.decode() for key, value in start["headers"]}
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], response_headers, body
+
+
+class HttpCachingTests(unittest.TestCase):
+    """Compression and conditional GETs applied by the app middleware."""
+
+    def test_encoding_negotiation(self) -> None:
+        self.assertIsNone(negotiate_encoding(None))
+        self.assertIsNone(negotiate_encoding("identity"))
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+
+    def test_summary_is_gzipped_and_revalidated_without_body(self) -> None:
+        status, headers, body = _asgi_get("/api/v1/var/summary", {"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", headers["vary"])
+        self.assertTrue(headers["etag"].endswith('-gzip"'))
+        plain = gzip.decompress(body)
+        self.assertEqual(VaRSummaryResponse.model_validate_json(plain), _summary())
+        self.assertLess(len(body) * 3, len(plain))
+
+        status, again, body = _asgi_get(
+            "/api/v1/var/summary", {"Accept-Encoding": "gzip", "If-None-Match": headers["etag"]}
+        )
+        self.assertEqual((status, body), (304, b""))
+        self.assertEqual(again["etag"], headers["etag"])
+        self.assertNotIn("content-length", again)
+
+    def test_routes_without_etag_get_body_hash(self) -> None:
+        path = f"/api/v1/var/timeseries?ric={PORTFOLIO_AGGREGATE_RIC}&days=30"
+        status, headers, body = _asgi_get(path, {})
+        self.assertEqual(status, 200)
+        self.assertNotIn("content-encoding", headers)
+        etag = headers["etag"]
+        self.assertEqual(_asgi_get(path, {"If-None-Match": etag})[:1], (304,))
+
+        status, encoded, body = _asgi_get(path, {"Accept-Encoding": "gzip"})
+        self.assertEqual(encoded["etag"], etag[:-1] + '-gzip"')
+        self.assertEqual(encoded["content-length"], str(len(body)))
+        status, _, _ = _asgi_get(path, {"Accept-Encoding": "gzip", "If-None-Match": encoded["etag"]})
+        self.assertEqual(status, 304)
+
+    def test_small_responses_are_not_compressed(self) -> None:
+        status, headers, body = _asgi_get("/health", {"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertNotIn("content-encoding", headers)
+        self.assertEqual(json.loads(body), {"status": "ok"})
+
+
+class StartupTests(unittest.TestCase):
+    """Warm starts must keep existing data instead of reseeding."""
+
+    def test_ensure_db_is_noop_on_current_schema(self) -> None:
+        before = database_state()
+        dates_before = routes.list_snapshot_dates()
+        ensure_db()
+        self.assertEqual(database_state(), before)
+        self.assertEqual(before, (SCHEMA_VERSION, True))
+        self.assertEqual(routes.list_snapshot_dates(), dates_before)
+
+    def test_stale_schema_is_migrated_in_place(self) -> None:
+        dates_before = routes.list_snapshot_dates()
+        with SessionLocal() as session:
+            positions = dict(session.execute(select(AssetVaRRecord.id, AssetVaRRecord.position)).all())
+        try:
+            with SessionLocal.begin() as session:
+                session.execute(text("DROP TABLE ewma_state_records"))
+                session.execute(text("ALTER TABLE asset_var_records DROP COLUMN position"))
+                session.execute(text("DROP INDEX ix_asset_var_snapshot_ric"))
+                session.execute(text("ALTER TABLE asset_var_records DROP COLUMN diversification_benefit"))
+                session.execute(text("UPDATE var_snapshots SET top_rics = '[]', asset_count = 0"))
+                write_meta(session, SCHEMA_VERSION_KEY, "3")
+            ensure_db()
+
+            self.assertEqual(database_state(), (SCHEMA_VERSION, True))
+            self.assertEqual(routes.list_snapshot_dates(), dates_before)
+            with SessionLocal() as session:
+                for snapshot in session.scalars(select(VaRSnapshot)).unique():
+                    _assert_materialised(self, snapshot)
+                self.assertEqual(
+                    session.scalars(select(AssetVaRRecord.diversification_benefit)).all()[:1], [0.0]
+                )
+                # Rows written before positions were stored get the position their allocation implied.
+                migrated = dict(session.execute(select(AssetVaRRecord.id, AssetVaRRecord.position)).all())
+                self.assertEqual(migrated.keys(), positions.keys())
+                for record_id, position in positions.items():
+                    self.assertAlmostEqual(migrated[record_id], position, delta=5e-3 * abs(position))
+                summary = _summary()
+                rics = [asset.ric for asset in summary.assets]
+                self.assertEqual(load_ewma_state(session, rics).residuals.shape, (len(rics), SCENARIO_WINDOW))
+        finally:
+            init_db()
+            summary_cache.clear()
+
+    def test_unknown_schema_version_refuses_to_start(self) -> None:
+        with SessionLocal.begin() as session:
+            write_meta(session, SCHEMA_VERSION_KEY, str(SCHEMA_VERSION + 1))
+        try:
+            with self.assertRaises(SchemaMigrationError):
+                ensure_db()
+            self.assertEqual(database_state(), (SCHEMA_VERSION + 1, True))
+        finally:
+            with SessionLocal.begin() as session:
+                write_meta(session, SCHEMA_VERSION_KEY, str(SCHEMA_VERSION))
+
+
+    def test_live_lock_holder_keeps_lock_past_waiter_timeout(self) -> None:
+        events: list[str] = []
+        held = threading.Event()
+
+        def hold() -> None:
+            with initialisation_lock(timeout=0.4, poll_interval=0.05):
+                held.set()
+                time.sleep(1.2)
+                events.append("released")
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        with initialisation_lock(timeout=0.4, poll_interval=0.05):
+            events.append("acquired")
+        holder.join()
+        self.assertEqual(events, ["released", "acquired"])
+
+    def test_stale_lock_row_is_taken_over(self) -> None:
+        with SessionLocal.begin() as session:
+            write_meta(session, INIT_LOCK_KEY, f"1-crashed {time.time() - 10:.3f}")
+        started = time.monotonic()
+        with initialisation_lock(timeout=1.0, poll_interval=0.05):
+            self.assertLess(time.monotonic() - started, 1.0)
+        with SessionLocal() as session:
+            self.assertIsNone(read_meta(session, INIT_LOCK_KEY))
+
+class StreamTests(unittest.TestCase):
+    """Commits reach SSE subscribers without any per-client polling."""
+
+    def _events(self, body, count: int) -> list[tuple[str, dict]]:
+        async def collect() -> list[tuple[str, dict]]:
+            events = []
+            while len(events) < count:
+                chunk = (await asyncio.wait_for(anext(body), 5)).decode()
+                fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines() if ": " in line)
+                if "event" in fields:
+                    events.append((fields["event"], json.loads(fields["data"])))
+            return events
+
+        return self.loop.run_until_complete(collect())
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self._close_loop)
+        stream.hub.poll_seconds = 0.05
+
+    def _close_loop(self) -> None:
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+
+    def _open(self, last_event_id: str | None = None):
+        async def open_stream():
+            return await stream.stream_events(Request({"type": "http"}), last_event_id=last_event_id)
+
+        body = self.loop.run_until_complete(open_stream()).body_iterator
+        self.addCleanup(lambda: self.loop.run_until_complete(body.aclose()))
+        return body
+
+    def test_news_and_snapshot_commits_are_pushed(self) -> None:
+        body = self._open(last_event_id="0")
+        self.assertEqual([name for name, _ in self._events(body, 2)], ["resync", "ready"])
+
+        with SessionLocal() as session:
+            record = NewsRecord(headline="stream test", published_at=datetime(2030, 1, 1), source="test")
+            session.add(record)
+            session.commit()
+            self.addCleanup(self._delete_news, record.id)
+        (name, payload), = self._events(body, 1)
+        self.assertEqual(name, "news")
+        self.assertEqual([item["headline"] for item in payload["items"]], ["stream test"])
+
+        target = routes.list_snapshot_dates()[0]
+        with SessionLocal() as session:
+            mark_snapshot_written(session, target)
+            session.commit()
+        (name, payload), = self._events(body, 1)
+        self.assertEqual(name, "snapshot")
+        self.assertEqual(payload["dates"], [target.isoformat()])
+        self.assertEqual(payload["latest"], target.isoformat())
+        self.assertIsNotNone(payload["portfolio"])
+
+    def test_writes_from_other_processes_are_polled_once(self) -> None:
+        body = self._open()
+        (name, ready), = self._events(body, 1)
+        self.assertEqual(name, "ready")
+        engine = create_engine(settings.database_url)
+        self.addCleanup(engine.dispose)
+        with Session(engine) as session:
+            bump_data_version(session)
+            session.commit()
+        (name, payload), = self._events(body, 1)
+        self.assertEqual(name, "snapshot")
+        self.assertEqual(payload["data_version"], ready["data_version"] + 1)
+        self.assertEqual(payload["dates"], [])
+
+    @staticmethod
+    def _delete_news(news_id: int) -> None:
+        with SessionLocal() as session:
+            session.query(NewsRecord).filter_by(id=news_id).delete()
+            session.commit()
+
+
+@unittest.skipUnless(importlib.util.find_spec("aiosqlite"), "aiosqlite is not installed")
+class AsyncRouteTests(unittest.TestCase):
+    """The async handlers must return exactly what the sync handlers return."""
+
+    @staticmethod
+    def _run(coroutine):
+        async def scoped():
+            try:
+                return await coroutine
+            finally:
+                await get_async_engine().dispose()
+
+        return asyncio.run(scoped())
+
+    def test_async_url_mapping(self) -> None:
+        self.assertEqual(to_async_url("sqlite:///./var.db"), "sqlite+aiosqlite:///./var.db")
+        self.assertEqual(
+            to_async_url("postgresql+psycopg://u:p@db/var"), "postgresql+asyncpg://u:p@db/var"
+        )
+        with self.assertRaises(ValueError):
+            to_async_url("mysql://db/var")
+
+    def test_async_handlers_match_sync(self) -> None:
+        summary = self._run(async_routes.get_var_summary())
+        self.assertEqual(summary.body, routes.get_var_summary().body)
+        self.assertEqual(
+            self._run(async_routes.get_var_timeseries(ric=PORTFOLIO_AGGREGATE_RIC, days=10)),
+            routes.get_var_timeseries(ric=PORTFOLIO_AGGREGATE_RIC, days=10),
+        )
+        self.assertEqual(self._run(async_routes.list_snapshot_dates()), routes.list_snapshot_dates())
+        self.assertEqual(self._run(async_routes.get_news(limit=3)), routes.get_news(limit=3))
+
+    def test_cpu_bound_handlers_run_off_the_event_loop(self) -> None:
+        threads: dict[str, int] = {}
+
+        def recorded(name, handler):
+            def call(*args):
+                threads[name] = threading.get_ident()
+                return handler(*args)
+
+            return mock.patch.object(routes, name, call)
+
+        async def loop_thread_and(coroutine):
+            threads["loop"] = threading.get_ident()
+            return await coroutine
+
+        with recorded("backtest_response", routes.backtest_response):
+            backtest = self._run(loop_thread_and(async_routes.get_var_backtest(days=60)))
+        self.assertEqual(backtest.body, routes.get_var_backtest(days=60).body)
+        self.assertNotEqual(threads["backtest_response"], threads["loop"])
+
+        request = StressRequest(scenarios=[{"name": "rates +100bp", "shocks": {"金利": 100}}])
+        with recorded("stress_response", routes.stress_response):
+            stress = self._run(loop_thread_and(async_routes.post_var_stress(request)))
+        self.assertEqual(stress, routes.post_var_stress(request))
+        self.assertNotEqual(threads["stress_response"], threads["loop"])
+
+        what_if = WhatIfRequest(deltas={})
+        with recorded("what_if_response", routes.what_if_response):
+            revalued = self._run(loop_thread_and(async_routes.post_var_what_if(what_if)))
+        self.assertEqual(revalued, routes.post_var_what_if(what_if))
+        self.assertNotEqual(threads["what_if_response"], threads["loop"])
+
+        fhs = {
+            "var_summary_response": lambda module: module.get_var_summary(methodology="fhs"),
+            "scenario_distribution_response": lambda module: module.get_scenario_distribution(methodology="fhs"),
+            "scenario_histogram_response": lambda module: module.get_scenario_histogram(
+                ric=PORTFOLIO_AGGREGATE_RIC, bins=24, methodology="fhs"
+            ),
+        }
+        for name, call in fhs.items():
+            with recorded(name, getattr(routes, name)):
+                filtered = self._run(loop_thread_and(call(async_routes)))
+            expected = call(routes)
+            self.assertEqual(getattr(filtered, "body", filtered), getattr(expected, "body", expected))
+            self.assertNotEqual(threads[name], threads["loop"])
+
+        with recorded("monte_carlo_response", routes.monte_carlo_response):
+            simulated = self._run(loop_thread_and(async_routes.get_var_monte_carlo(paths=2_000, seed=3)))
+        self.assertEqual(simulated.body, routes.get_var_monte_carlo(paths=2_000, seed=3).body)
+        self.assertNotEqual(threads["monte_carlo_response"], threads["loop"])
+
+        with recorded("hierarchy_response", routes.hierarchy_response):
+            tree = self._run(loop_thread_and(async_routes.get_var_hierarchy(path=[], levels="desk,category")))
+        self.assertEqual(tree, routes.get_var_hierarchy(path=[], levels="desk,category"))
+        self.assertNotEqual(threads["hierarchy_response"], threads["loop"])
+
+    def test_async_router_overrides_sync_routes(self) -> None:
+        combined = async_routes.with_async_overrides(routes.router)
+        paths = [route.path for route in combined.routes]
+        self.assertEqual(len(paths), len(set(paths)))
+        self.assertEqual({route.path for route in routes.router.routes}, set(paths))
+        summary = next(route for route in combined.routes if route.path == "/var/summary")
+        self.assertIs(summary.endpoint, async_routes.get_var_summary)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -9,18 +9,20 @@ import { VarChartCard } from '@/components/dashboard/VarChartCard'
 import { VarContributionChart } from '@/components/dashboard/VarContributionChart'
 import { AssetDetailsTable } from '@/components/dashboard/AssetDetailsTable'
 import { TimeseriesControls } from '@/components/dashboard/TimeseriesControls'
-import { ScenarioDistributionChart } from '@/components/dashboard/ScenarioDistributionChart'
+import { BUCKET_COUNT, ScenarioDistributionChart } from '@/components/dashboard/ScenarioDistributionChart'
 import { MarketSignalGauge } from '@/components/dashboard/MarketSignalGauge'
 import { DriverCommentaryPanel } from '@/components/dashboard/DriverCommentaryPanel'
 import { DashboardNavigation, DashboardMobileNav } from '@/components/dashboard/DashboardNavigation'
 import { Card } from '@/components/ui/card'
 import { buildMetrics } from '@/lib/metrics'
+import { useVarStream } from '@/hooks/useVarStream'
 import type { NewsItem, SummaryResponse, TimeSeriesResponse } from '@/types/var'
 import { AGGREGATE_RIC } from '@/types/var'
-import type { ScenarioDistributionResponse } from '@/types/var'
+import type { ScenarioHistogramResponse } from '@/types/var'
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE_URL ?? '/api/v1'
 const NEWS_LIMIT = Number.parseInt(process.env.NEXT_PUBLIC_NEWS_LIMIT ?? '5', 10)
+// Fallback polling interval, used only while the /stream push channel is disconnected
 const REFRESH_INTERVAL_MS = Number.parseInt(process.env.NEXT_PUBLIC_REFRESH_INTERVAL_MS ?? '60000', 10)
 
 type TabKey = 'dashboard' | 'assistant'
@@ -53,14 +55,26 @@ export default function DashboardPage() {
   const [news, setNews] = useState<NewsItem[]>([])
   const [loadingNews, setLoadingNews] = useState(true)
   const [scenarioRic, setScenarioRic] = useState(AGGREGATE_RIC)
-  const [scenarioValues, setScenarioValues] = useState<number[]>([])
+  const [scenarioHistogram, setScenarioHistogram] = useState<ScenarioHistogramResponse | null>(null)
   const [scenarioError, setScenarioError] = useState<string | null>(null)
   const [activeTab, setActiveTab] = useState<TabKey>('dashboard')
   const [pendingSection, setPendingSection] = useState<string | null>(null)
+  const { connected: streaming, snapshotRevision, newsRevision } = useVarStream(`${API_BASE}/stream`)
+  const [pollTick, setPollTick] = useState(0)
+
+  // Poll only while the push stream is down; connecting or disconnecting by itself does not refetch
+  useEffect(() => {
+    if (streaming) {
+      return
+    }
+    const intervalId = setInterval(() => setPollTick((tick) => tick + 1), REFRESH_INTERVAL_MS)
+    return () => clearInterval(intervalId)
+  }, [streaming])
 
   const fetchSummary = useCallback(async () => {
     const search = selectedDate ? `?as_of=${encodeURIComponent(selectedDate)}` : ''
-    const response = await fetch(`${API_BASE}/var/summary${search}`, { cache: 'no-store' })
+    // `no-cache` revalidates with the ETag so unchanged polls come back as 304
+    const response = await fetch(`${API_BASE}/var/summary${search}`, { cache: 'no-cache' })
     if (!response.ok) {
       throw new Error(`Failed summary request: ${response.status}`)
     }
@@ -99,13 +113,11 @@ export default function DashboardPage() {
     }
 
     load()
-    const intervalId = setInterval(load, REFRESH_INTERVAL_MS)
 
     return () => {
       active = false
-      clearInterval(intervalId)
     }
-  }, [fetchSummary, selectedDate])
+  }, [fetchSummary, selectedDate, snapshotRevision, pollTick])
 
   useEffect(() => {
     let cancelled = false
@@ -130,7 +142,7 @@ export default function DashboardPage() {
     return () => {
       cancelled = true
     }
-  }, [])
+  }, [snapshotRevision])
 
   // ensure selected RIC remains valid when summary updates
   useEffect(() => {
@@ -172,15 +184,13 @@ export default function DashboardPage() {
     }
 
     load()
-    const intervalId = setInterval(load, REFRESH_INTERVAL_MS)
 
     return () => {
       active = false
-      clearInterval(intervalId)
     }
-  }, [fetchSeries, selectedRic, windowDays])
+  }, [fetchSeries, selectedRic, windowDays, snapshotRevision, pollTick])
 
-  // fetch news once
+  // fetch news on load and whenever the stream reports new items
   useEffect(() => {
     let cancelled = false
     const fetchNews = async () => {
@@ -213,7 +223,7 @@ export default function DashboardPage() {
     return () => {
       cancelled = true
     }
-  }, [])
+  }, [newsRevision])
 
   const metrics = useMemo(() => (summary ? buildMetrics(summary) : []), [summary])
   const commonAssetOptions = useMemo(() => {
@@ -248,13 +258,13 @@ export default function DashboardPage() {
 
   const fetchScenarioDistribution = useCallback(async () => {
     const response = await fetch(
-      `${API_BASE}/var/scenario-distribution?ric=${encodeURIComponent(scenarioRic)}`,
-      { cache: 'no-store' },
+      `${API_BASE}/var/scenario-distribution/histogram?ric=${encodeURIComponent(scenarioRic)}&bins=${BUCKET_COUNT}`,
+      { cache: 'no-cache' },
     )
     if (!response.ok) {
       throw new Error(`Failed scenario distribution request: ${response.status}`)
     }
-    return (await response.json()) as ScenarioDistributionResponse
+    return (await response.json()) as ScenarioHistogramResponse
   }, [scenarioRic])
 
   useEffect(() => {
@@ -272,25 +282,23 @@ export default function DashboardPage() {
       try {
         const payload = await fetchScenarioDistribution()
         if (active) {
-          setScenarioValues(payload.values)
+          setScenarioHistogram(payload)
           setScenarioError(null)
         }
       } catch (error) {
         if (active) {
           console.error('シナリオ分布取得に失敗しました', error)
-          setScenarioValues([])
+          setScenarioHistogram(null)
           setScenarioError('シナリオPL分布の取得に失敗しました')
         }
       }
     }
 
     load()
-    const intervalId = setInterval(load, REFRESH_INTERVAL_MS)
     return () => {
       active = false
-      clearInterval(intervalId)
     }
-  }, [fetchScenarioDistribution, scenarioRic])
+  }, [fetchScenarioDistribution, scenarioRic, snapshotRevision, pollTick])
 
   useEffect(() => {
     if (!pendingSection || activeTab !== 'dashboard') {
@@ -301,7 +309,7 @@ export default function DashboardPage() {
       target.scrollIntoView({ behavior: 'smooth', block: 'start' })
       setPendingSection(null)
     }
-  }, [activeTab, pendingSection, summary, timeseries, news, scenarioValues])
+  }, [activeTab, pendingSection, summary, timeseries, news, scenarioHistogram])
 
   if (!summary) {
     return (
@@ -382,7 +390,7 @@ export default function DashboardPage() {
 
             <section id="scenario" className="scroll-mt-36">
               <ScenarioDistributionChart
-                values={scenarioValues}
+                histogram={scenarioHistogram}
                 selectedRic={scenarioRic}
                 onRicChange={(ric) => setScenarioRic(ric)}
                 options={scenarioOptions}
@@ -6,42 +6,33 @@ import type { ApexOptions } from 'apexcharts'
 import { Card } from '@/components/ui/card'
 import { Select } from '@/components/ui/select'
 import { SCENARIO_WINDOW } from '@/types/var'
+import type { ScenarioHistogramResponse } from '@/types/var'
 
 const ApexChart = dynamic(() => import('react-apexcharts'), { ssr: false })
 
 interface ScenarioDistributionChartProps {
-  values: number[]
+  histogram: ScenarioHistogramResponse | null
   selectedRic: string
   onRicChange: (ric: string) => void
   options: { value: string; label: string }[]
 }
 
-const BUCKET_COUNT = 24
+export const BUCKET_COUNT = 24
 
-export function ScenarioDistributionChart({ values, selectedRic, onRicChange, options }: ScenarioDistributionChartProps) {
+export function ScenarioDistributionChart({ histogram, selectedRic, onRicChange, options }: ScenarioDistributionChartProps) {
+  // bins are computed server-side; only the labels are derived here
   const { categories, frequencies } = useMemo(() => {
-    if (!values.length) {
+    if (!histogram || !histogram.counts.length) {
       return { categories: [], frequencies: [] }
     }
-    const min = Math.min(...values)
-    const max = Math.max(...values)
-    const safeRange = max - min || 1
-    const bucketSize = safeRange / BUCKET_COUNT
-    const counts = Array.from({ length: BUCKET_COUNT }, () => 0)
-
-    values.forEach((value) => {
-      const index = Math.min(BUCKET_COUNT - 1, Math.floor((value - min) / bucketSize))
-      counts[index] += 1
-    })
-
-    const labels = counts.map((_, idx) => {
-      const start = min + bucketSize * idx
-      const end = start + bucketSize
+    const labels = histogram.counts.map((_, idx) => {
+      const start = histogram.edges[idx]
+      const end = histogram.edges[idx + 1]
       return `${start.toFixed(2)} ~ ${end.toFixed(2)}`
     })
 
-    return { categories: labels, frequencies: counts }
-  }, [values])
+    return { categories: labels, frequencies: histogram.counts }
+  }, [histogram])
 
   const series = useMemo(
     () => [
@@ -94,7 +85,7 @@ export function ScenarioDistributionChart({ values, selectedRic, onRicChange, op
     [categories],
   )
 
-  const footer = `シナリオ件数: ${values.length}件 / ${SCENARIO_WINDOW}件`
+  const footer = `シナリオ件数: ${histogram?.sample_count ?? 0}件 / ${SCENARIO_WINDOW}件`
 
   return (
     <Card
@@ -17,6 +17,9 @@ const CATEGORY_ORDER = [
 ]
 const PORTFOLIO_LABEL = 'ポートフォリオVaR'
 
+// Euler component VaR adds up to the portfolio bar; fall back to standalone VaR for older payloads.
+const contributionOf = (asset: Asset) => asset.component_var ?? asset.amount
+
 interface VarContributionChartProps {
   assets: Asset[]
   diversificationEffect: number
@@ -39,7 +42,7 @@ export function VarContributionChart({
       CATEGORY_ORDER.map((category) => {
         const total = assets
           .filter((asset) => asset.category === category.key)
-          .reduce((sum, asset) => sum + asset.amount, 0)
+          .reduce((sum, asset) => sum + contributionOf(asset), 0)
         return { ...category, total }
       }),
     [assets],
@@ -68,7 +71,7 @@ export function VarContributionChart({
           if (!category || category.key !== asset.category) {
             return 0
           }
-          return Number(asset.amount.toFixed(2))
+          return Number(contributionOf(asset).toFixed(2))
         }),
       })),
     [assets, categories],
@@ -203,7 +206,7 @@ export function VarContributionChart({
 
   return (
     <Card
-      title="VaR比較：単独資産 vs ポートフォリオ"
+      title="VaR寄与：コンポーネントVaR vs ポートフォリオ"
       footer={`分散効果(億円): ${diversificationGain.toFixed(2)} (${diversificationEffect.toFixed(2)})`}
     >
       <div className="h-80">
@@ -0,0 +1,60 @@
+'use client'
+
+import { useEffect, useState } from 'react'
+import type { NewsEvent, SnapshotEvent } from '@/types/var'
+
+export interface VarStreamState {
+  /** True once the server has sent `ready`; callers poll only while this is false. */
+  connected: boolean
+  /** Incremented on every `snapshot` or `resync` event. */
+  snapshotRevision: number
+  /** Incremented on every `news` or `resync` event. */
+  newsRevision: number
+  lastSnapshot: SnapshotEvent | null
+  lastNews: NewsEvent | null
+}
+
+const INITIAL_STATE: VarStreamState = {
+  connected: false,
+  snapshotRevision: 0,
+  newsRevision: 0,
+  lastSnapshot: null,
+  lastNews: null,
+}
+
+/** Subscribes to the backend SSE channel (`/stream`); EventSource reconnects on its own. */
+export function useVarStream(url: string) {
+  const [state, setState] = useState<VarStreamState>(INITIAL_STATE)
+
+  useEffect(() => {
+    if (typeof window === 'undefined' || typeof EventSource === 'undefined') return
+    const source = new EventSource(url)
+
+    source.addEventListener('ready', () => {
+      setState((prev) => ({ ...prev, connected: true }))
+    })
+    source.addEventListener('snapshot', (event) => {
+      const payload = JSON.parse((event as MessageEvent<string>).data) as SnapshotEvent
+      setState((prev) => ({ ...prev, snapshotRevision: prev.snapshotRevision + 1, lastSnapshot: payload }))
+    })
+    source.addEventListener('news', (event) => {
+      const payload = JSON.parse((event as MessageEvent<string>).data) as NewsEvent
+      setState((prev) => ({ ...prev, newsRevision: prev.newsRevision + 1, lastNews: payload }))
+    })
+    // Missed events (reconnect or a slow client): refetch everything once.
+    source.addEventListener('resync', () => {
+      setState((prev) => ({
+        ...prev,
+        snapshotRevision: prev.snapshotRevision + 1,
+        newsRevision: prev.newsRevision + 1,
+      }))
+    })
+    source.onerror = () => {
+      setState((prev) => ({ ...prev, connected: false }))
+    }
+
+    return () => source.close()
+  }, [url])
+
+  return state
+}
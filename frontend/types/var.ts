@@ -5,6 +5,10 @@ export interface DriverContributions {
   ranking_shift: number
 }
 
+export interface RiskMeasure extends TailMeasure {
+  horizon_days: number
+}
+
 export interface Asset {
   ric: string
   name: string
@@ -13,6 +17,10 @@ export interface Asset {
   change_amount: number
   change_pct: number
   contributions: DriverContributions
+  component_var?: number
+  marginal_var?: number
+  diversification_benefit?: number
+  risk_measures?: RiskMeasure[]
 }
 
 export interface Portfolio {
@@ -20,6 +28,7 @@ export interface Portfolio {
   change_amount: number
   change_pct: number
   diversification_effect: number
+  risk_measures?: RiskMeasure[]
 }
 
 export interface MarketSignal {
@@ -36,12 +45,19 @@ export interface DriverCommentary {
   driver_totals: DriverContributions
 }
 
+/** `fhs`: VaR figures from EWMA-filtered scenarios (drivers stay historical). */
+export type Methodology = 'historical' | 'fhs'
+
 export interface SummaryResponse {
   as_of: string
   portfolio: Portfolio
   assets: Asset[]
+  asset_count: number
+  category_counts: Record<string, number>
+  top_rics: string[]
   market_signal: MarketSignal
   driver_commentary: DriverCommentary
+  methodology?: Methodology
 }
 
 export interface TimeSeriesPoint {
@@ -55,6 +71,11 @@ export interface TimeSeriesResponse {
   points: TimeSeriesPoint[]
 }
 
+export interface TimeSeriesBatchResponse {
+  dates: string[]
+  series: Record<string, (number | null)[]>
+}
+
 export interface NewsItem {
   id: string
   headline: string
@@ -63,10 +84,172 @@ export interface NewsItem {
   summary?: string
 }
 
+/** `Accept: application/vnd.var.columns+json` layout of `/var/timeseries`. */
+export interface VaRTimeSeriesColumns {
+  ric: string
+  dates: string[]
+  values: number[]
+  changes: (number | null)[]
+}
+
 export interface ScenarioDistributionResponse {
   ric: string
   values: number[]
+  methodology?: Methodology
+}
+
+export interface TailMeasure {
+  confidence: number
+  var: number
+  expected_shortfall: number
+}
+
+export interface ScenarioHistogramResponse {
+  ric: string
+  as_of?: string | null
+  sample_count: number
+  edges: number[]
+  counts: number[]
+  minimum: number
+  maximum: number
+  quartiles: number[]
+  tail_measures: TailMeasure[]
+  methodology?: Methodology
+}
+
+export interface WhatIfRequest {
+  as_of?: string | null
+  deltas: Record<string, number>
+}
+
+export interface WhatIfAsset {
+  ric: string
+  position_scale: number
+  base_component_var: number
+  component_var: number
+}
+
+export interface WhatIfResponse {
+  as_of?: string | null
+  base_var: number
+  new_var: number
+  incremental_var: number
+  assets: WhatIfAsset[]
+}
+
+export interface MonteCarloAsset {
+  ric: string
+  component_var: number
+}
+
+export interface MonteCarloVaRResponse {
+  as_of?: string | null
+  paths: number
+  seed: number
+  method: 'cholesky' | 'scenario'
+  factor_rank: number
+  confidence: number
+  tail_measures: TailMeasure[]
+  assets: MonteCarloAsset[]
+}
+
+export type StressFactor = '株式' | '金利' | 'クレジット' | 'モーゲージ' | 'コモディティ'
+
+export interface StressScenarioDefinition {
+  name: string
+  shocks: Partial<Record<StressFactor, number>>
+}
+
+export interface StressRequest {
+  as_of?: string | null
+  scenarios: StressScenarioDefinition[]
+  top?: number
+}
+
+export interface StressAssetPnL {
+  ric: string
+  pnl: number
+}
+
+export interface StressScenarioResult {
+  name: string
+  rank: number
+  total_pnl: number
+  factor_pnl: Record<StressFactor, number>
+  worst_assets: StressAssetPnL[]
+}
+
+export interface StressResponse {
+  as_of?: string | null
+  asset_count: number
+  factor_units: Record<StressFactor, 'bp' | 'pct'>
+  scenarios: StressScenarioResult[]
+}
+
+export type HierarchyLevel = 'desk' | 'category' | 'ric'
+
+export interface HierarchyNode {
+  label: string
+  path: string[]
+  level: HierarchyLevel
+  leaf_count: number
+  var: number
+  expected_shortfall: number
+  /** Euler share of the parent's VaR; siblings sum to it. */
+  component_var: number
+  has_children: boolean
+}
+
+/** One drill-down level of `/var/hierarchy`. */
+export interface HierarchyResponse {
+  as_of?: string | null
+  levels: HierarchyLevel[]
+  path: string[]
+  var: number
+  expected_shortfall: number
+  standalone_var: number
+  diversification_effect: number
+  children: HierarchyNode[]
+}
+
+export interface SnapshotEvent {
+  data_version: number
+  dates: string[]
+  latest?: string | null
+  portfolio?: Portfolio | null
+}
+
+export interface NewsEvent {
+  data_version: number
+  items: NewsItem[]
 }
 
 export const AGGREGATE_RIC = 'ALL_ASSETS'
 export const SCENARIO_WINDOW = 800
+
+export type BacktestZone = 'green' | 'yellow' | 'red'
+
+export interface BacktestRicResult {
+  ric: string
+  observations: number
+  exceptions: number
+  exception_rate: number
+  // null when the RIC has no observations in the window
+  zone: BacktestZone | null
+  kupiec_lr: number | null
+  kupiec_pvalue: number | null
+  independence_lr: number | null
+  independence_pvalue: number | null
+  conditional_coverage_lr: number | null
+  conditional_coverage_pvalue: number | null
+  exception_dates: string[]
+}
+
+export interface BacktestResponse {
+  confidence: number
+  start: string
+  end: string
+  days: number
+  zone_counts: Record<BacktestZone, number>
+  results: BacktestRicResult[]
+}